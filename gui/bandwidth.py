@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+bandwidth.py - ネットワークを使うステージの帯域スケジューリング
+
+動画のダウンロード（ytdl）、Whisperへのアップロード（whisper-remote）、
+リモートコンパイル（luatex-pdf）は同じ回線を使うが、互いに調整されていない。
+ここではステージごとに優先度とトークンバケットによる帯域予算を与え、
+ProcessSupervisor が実行中ジョブの転送量を計測して以下を行う。
+
+  - 優先度: より優先度の高いステージの転送が計測された間だけ、低いステージを
+    一時停止（数MBのfinalizeのアップロードが2GBの動画転送の後ろで待たされない。
+    リモートコンパイルの待ち時間のように何も転送していない間は止めない）
+  - 帯域予算: ステージの転送量がトークンバケットの残量を超えたら、
+    残量が回復するまで一時停止（平均転送速度を上限以下に保つ）
+  - 計測: ステージごとの転送速度（指数移動平均）・累計・一時停止時間
+
+優先度が効くのはステージが同時に走る場合、つまりデーモン（複数のURL・記録を
+並行して処理）だけである。GUIは1つのプロジェクトのステップを順に実行し、
+実行中はプロジェクトを切り替えられないため download と finalize は重ならない。
+GUIでは rate_budgets() で帯域上限と計測だけを使う。また、計測は1秒ごとなので、
+数秒で終わる転送は優先度が効く前に終わる。
+
+転送は外部コマンドの中で行われるため、データの流れに割り込むのではなく
+プロセスグループ単位の SIGSTOP / SIGCONT で制御する。転送量は ss -tinp
+（iproute2）のTCPソケットごとの送受信バイト数から求めるため、ファイルの
+読み書き（ytdl の ffmpeg による結合など）は含まれない。ss がない環境
+（macOSなど）では計測できないため、優先度・帯域上限は適用しない（一時停止しない）。
+
+設定（任意）: ~/.config/rehearsal-workflow/bandwidth.yaml
+  download: {priority: 2, rate_mb_s: 20}   # 0 = 上限なし
+  finalize: {priority: 0, rate_mb_s: 0}
+
+動作確認（帯域を絞ったローカルの代替サーバーを使用）:
+  python3 bandwidth.py --demo [--uplink 8] [--big 120] [--small 16]
+
+作成日: 2026-10-19
+バージョン: 1.0.0
+"""
+
+import os
+import re
+import sys
+import math
+import time
+import argparse
+import subprocess
+import tempfile
+import threading
+import yaml
+from pathlib import Path
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import BinaryIO, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+
+# ==============================================================================
+# 定数
+# ==============================================================================
+
+BANDWIDTH_CONFIG_FILE = Path.home() / ".config" / "rehearsal-workflow" / "bandwidth.yaml"
+
+# ステージごとの既定値（小さいほど優先、帯域上限なし）
+DEFAULT_BUDGETS = {
+    "finalize": {"priority": 0, "rate_mb_s": 0},   # luatex-pdf: 数MBのアップロード
+    "download": {"priority": 2, "rate_mb_s": 0},   # ytdl + whisper-remote: 数GB
+}
+
+# 転送中とみなす速度
+ACTIVE_THRESHOLD_BPS = 32 * 1024
+
+# ss -tinp の出力（ソケット行の使用プロセスと、続く情報行の送受信バイト数）
+SS_PID_PATTERN = re.compile(r'pid=(\d+)')
+SS_BYTES_PATTERN = re.compile(r'\bbytes_(?:sent|received):(\d+)')
+
+# 転送速度の指数移動平均の時定数
+EWMA_TIME_CONSTANT_S = 3.0
+
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+# ==============================================================================
+# トークンバケット・計測
+# ==============================================================================
+
+class TokenBucket:
+    """トークンバケット（rate バイト/秒で補充、capacity まで貯まる）
+
+    consume() は残量を超えても差し引く（負の残量 = 借り）。借りがある間は
+    一時停止し、残量が0に戻るまでの時間を delay() で求める。
+    """
+
+    def __init__(self, rate_bps: float, capacity: Optional[float] = None, now: Optional[float] = None):
+        self.rate = float(rate_bps)
+        self.capacity = float(capacity if capacity is not None else rate_bps)
+        self.tokens = self.capacity
+        self.updated = time.monotonic() if now is None else now
+        self.lock = threading.Lock()
+
+    def refill(self, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def consume(self, n: int, now: Optional[float] = None) -> float:
+        """n バイト分を差し引いて残量を返す"""
+        with self.lock:
+            self.refill(now)
+            self.tokens -= n
+            return self.tokens
+
+    def delay(self, n: int = 0, now: Optional[float] = None) -> float:
+        """残量が n 以上になるまでの秒数"""
+        with self.lock:
+            self.refill(now)
+            return max(0.0, (n - self.tokens) / self.rate) if self.rate > 0 else 0.0
+
+    def throttle(self, n: int):
+        """n バイトを送る前に、予算内に収まるまで待つ（スレッドから使用）"""
+        self.consume(n)
+        wait = self.delay()
+        if wait > 0:
+            time.sleep(wait)
+
+
+class ThroughputMeter:
+    """累計バイト数と転送速度（指数移動平均）"""
+
+    def __init__(self, time_constant_s: float = EWMA_TIME_CONSTANT_S):
+        self.time_constant_s = time_constant_s
+        self.total_bytes = 0
+        self.rate_bps = 0.0
+        self.updated: Optional[float] = None
+
+    def add(self, n: int, now: float):
+        self.total_bytes += n
+        if self.updated is None:
+            self.updated = now
+            return
+        dt = now - self.updated
+        if dt <= 0:
+            return
+        alpha = 1 - math.exp(-dt / self.time_constant_s)
+        self.rate_bps += alpha * (n / dt - self.rate_bps)
+        self.updated = now
+
+
+def copy_stream(src: BinaryIO, dst: BinaryIO, bucket: Optional[TokenBucket] = None,
+                chunk_size: int = COPY_CHUNK_SIZE) -> int:
+    """ストリームをコピー（bucket があれば帯域を制限）し、コピーしたバイト数を返す"""
+    total = 0
+    while True:
+        data = src.read(chunk_size)
+        if not data:
+            return total
+        if bucket is not None:
+            bucket.throttle(len(data))
+        dst.write(data)
+        total += len(data)
+
+
+def socket_snapshot() -> Optional[List[Tuple[FrozenSet[int], int]]]:
+    """TCPソケットごとの (使用中のPID, 送受信バイト数)。計測できない環境では None"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        output = subprocess.run(["ss", "-tinpH"], capture_output=True, text=True,
+                                timeout=5, check=True).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    sockets = []
+    owners: FrozenSet[int] = frozenset()
+    for line in output.splitlines():
+        if not line[:1].isspace():
+            owners = frozenset(int(pid) for pid in SS_PID_PATTERN.findall(line))
+        elif owners:
+            sockets.append((owners, sum(int(n) for n in SS_BYTES_PATTERN.findall(line))))
+    return sockets
+
+
+def transfer_measurable() -> bool:
+    """この環境で転送量を計測できるか（できなければ優先度・帯域上限は適用されない）"""
+    return socket_snapshot() is not None
+
+
+def read_transfer_bytes(pids: Iterable[int],
+                        sockets: Optional[List[Tuple[FrozenSet[int], int]]]) -> Optional[int]:
+    """プロセス群が使っているTCPソケットの送受信バイト数の合計。計測できない環境では None
+
+    ソケットのカウンタなので、ファイルの読み書きは含まれない。ソケットを閉じると
+    その分が合計から消えるため、呼び出し側は減少を0として扱う。
+    """
+    if sockets is None:
+        return None
+    members = set(pids)
+    return sum(n for owners, n in sockets if owners & members)
+
+
+# ==============================================================================
+# データモデル
+# ==============================================================================
+
+@dataclass
+class StageBudget:
+    """ステージの優先度と帯域予算"""
+    priority: int = 1          # 小さいほど優先
+    rate_bps: float = 0.0      # 0 = 上限なし
+    burst_s: float = 2.0       # バケット容量（上限速度の何秒分まで貯めるか）
+
+
+@dataclass
+class Flow:
+    """スケジューラが管理する転送（ジョブ1件）"""
+    key: str
+    stage: str
+    budget: StageBudget
+    started_at: float
+    meter: ThroughputMeter = field(default_factory=ThroughputMeter)
+    last_total: Optional[int] = None
+    measurable: bool = True
+    pause_reason: Optional[str] = None      # "priority" | "budget"
+    paused_since: float = 0.0
+    paused_seconds: float = 0.0
+
+
+@dataclass
+class StageMetrics:
+    """ステージごとの計測値"""
+    stage: str
+    priority: int
+    rate_limit_bps: float
+    flows: int = 0
+    paused: int = 0
+    rate_bps: float = 0.0
+    total_bytes: int = 0
+    paused_seconds: float = 0.0
+    measurable: bool = True
+
+    def summary(self) -> str:
+        if not self.measurable:
+            rate = "計測不可（優先度・上限は適用されません）"
+        else:
+            rate = f"{self.rate_bps / 1e6:.1f} MB/s（計 {self.total_bytes / 1e6:.0f} MB）"
+        limit = f" 上限 {self.rate_limit_bps / 1e6:.1f} MB/s" if self.rate_limit_bps else ""
+        paused = f" ⏸{self.paused}件" if self.paused else ""
+        return f"{self.stage}: {rate}{limit}{paused}"
+
+
+def load_budgets(path: Path = BANDWIDTH_CONFIG_FILE) -> Dict[str, StageBudget]:
+    """ステージごとの予算（設定ファイルがあれば既定値を上書き）"""
+    config = {stage: dict(values) for stage, values in DEFAULT_BUDGETS.items()}
+    try:
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                for stage, values in (yaml.safe_load(f) or {}).items():
+                    config.setdefault(stage, {}).update(values or {})
+    except Exception as e:
+        print(f"Error loading bandwidth settings: {e}")
+    return {
+        stage: StageBudget(priority=int(values.get('priority', 1)),
+                           rate_bps=float(values.get('rate_mb_s', 0)) * 1e6)
+        for stage, values in config.items()
+    }
+
+
+def rate_budgets(budgets: Dict[str, StageBudget]) -> Dict[str, StageBudget]:
+    """優先度を揃え、帯域上限だけを残した予算（ステージが重ならないGUI用）"""
+    return {stage: StageBudget(rate_bps=budget.rate_bps, burst_s=budget.burst_s)
+            for stage, budget in budgets.items()}
+
+
+# ==============================================================================
+# スケジューラ
+# ==============================================================================
+
+class BandwidthScheduler:
+    """ステージごとの優先度・帯域予算に基づき、一時停止すべき転送を決める"""
+
+    def __init__(self, budgets: Dict[str, StageBudget]):
+        self.budgets = dict(budgets)
+        self.buckets = {
+            stage: TokenBucket(b.rate_bps, b.rate_bps * b.burst_s)
+            for stage, b in self.budgets.items() if b.rate_bps > 0
+        }
+        self.stage_meters = {stage: ThroughputMeter() for stage in self.budgets}
+        self.flows: Dict[str, Flow] = {}
+
+    def add_flow(self, key: str, stage: str, now: Optional[float] = None) -> bool:
+        """転送を登録（予算のないステージは管理しない）"""
+        budget = self.budgets.get(stage)
+        if budget is None:
+            return False
+        now = time.monotonic() if now is None else now
+        self.flows[key] = Flow(key, stage, budget, started_at=now)
+        return True
+
+    def remove_flow(self, key: str):
+        self.flows.pop(key, None)
+
+    def has_flow(self, key: str) -> bool:
+        return key in self.flows
+
+    def observe(self, key: str, total_bytes: Optional[int], now: Optional[float] = None):
+        """転送の累計バイト数（計測値）を反映"""
+        flow = self.flows.get(key)
+        if flow is None:
+            return
+        now = time.monotonic() if now is None else now
+        if total_bytes is None:
+            flow.measurable = False
+            return
+        # 子プロセスが終了すると累計が減るので、その場合は基準だけ更新
+        delta = 0 if flow.last_total is None else max(0, total_bytes - flow.last_total)
+        flow.last_total = total_bytes
+        flow.meter.add(delta, now)
+        self.stage_meters[flow.stage].add(delta, now)
+        bucket = self.buckets.get(flow.stage)
+        if bucket is not None and delta:
+            bucket.consume(delta, now)
+
+    def is_active(self, flow: Flow) -> bool:
+        """回線を使っていると計測された転送か（計測できない転送では優先度を適用しない）"""
+        if flow.pause_reason or not flow.measurable:
+            return False
+        return flow.meter.rate_bps >= ACTIVE_THRESHOLD_BPS
+
+    def plan(self, now: Optional[float] = None) -> Dict[str, Optional[str]]:
+        """各転送の一時停止理由（None = 実行）を決める"""
+        now = time.monotonic() if now is None else now
+        active = [f.budget.priority for f in self.flows.values() if self.is_active(f)]
+
+        decisions = {}
+        for flow in self.flows.values():
+            reason = None
+            if any(priority < flow.budget.priority for priority in active):
+                reason = "priority"
+            bucket = self.buckets.get(flow.stage)
+            if bucket is not None and flow.measurable and bucket.delay(0, now) > 0:
+                reason = "budget"
+
+            if reason and not flow.pause_reason:
+                flow.paused_since = now
+            elif not reason and flow.pause_reason:
+                flow.paused_seconds += now - flow.paused_since
+            flow.pause_reason = reason
+            decisions[flow.key] = reason
+        return decisions
+
+    def metrics(self, now: Optional[float] = None) -> List[StageMetrics]:
+        """ステージごとの計測値（優先度順）"""
+        now = time.monotonic() if now is None else now
+        result = []
+        for stage, budget in sorted(self.budgets.items(), key=lambda item: item[1].priority):
+            flows = [f for f in self.flows.values() if f.stage == stage]
+            meter = self.stage_meters[stage]
+            result.append(StageMetrics(
+                stage=stage, priority=budget.priority, rate_limit_bps=budget.rate_bps,
+                flows=len(flows), paused=sum(1 for f in flows if f.pause_reason),
+                rate_bps=meter.rate_bps if flows else 0.0, total_bytes=meter.total_bytes,
+                paused_seconds=sum(f.paused_seconds + (now - f.paused_since if f.pause_reason else 0)
+                                   for f in flows),
+                measurable=all(f.measurable for f in flows),
+            ))
+        return result
+
+
+# ==============================================================================
+# 動作確認（帯域を絞ったローカルの代替サーバー）
+# ==============================================================================
+
+# 代替サーバーからダウンロードしてファイルに書き出すクライアント（子プロセス）
+FETCH_SCRIPT = (
+    "import sys, shutil, urllib.request\n"
+    "with urllib.request.urlopen(sys.argv[1]) as r, open(sys.argv[2], 'wb') as f:\n"
+    "    shutil.copyfileobj(r, f, 64 * 1024)\n"
+)
+
+
+class ZeroStream:
+    """指定バイト数の0を返す読み込みストリーム"""
+
+    def __init__(self, size: int):
+        self.remaining = size
+
+    def read(self, n: int) -> bytes:
+        n = min(n, self.remaining)
+        self.remaining -= n
+        return bytes(n)
+
+
+def start_standin_server(uplink_bps: float) -> ThreadingHTTPServer:
+    """GET /bytes/<N> に N バイトを返すサーバー（全接続で1本の回線 uplink_bps を共有）"""
+    uplink = TokenBucket(uplink_bps, uplink_bps * 0.25)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            size = int(self.path.rsplit('/', 1)[-1])
+            self.send_response(200)
+            self.send_header("Content-Length", str(size))
+            self.end_headers()
+            try:
+                copy_stream(ZeroStream(size), self.wfile, uplink)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_demo(uplink_mb_s: float, big_mb: int, small_mb: int):
+    """大きな download の途中で小さな finalize を始め、完了時間を比較"""
+    from PySide6.QtCore import QCoreApplication, QTimer
+    from process_supervisor import ProcessSupervisor, BANDWIDTH_SAMPLE_INTERVAL_MS
+
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+    server = start_standin_server(uplink_mb_s * 1e6)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/bytes/"
+    budgets = {
+        "finalize": StageBudget(priority=0),
+        "download": StageBudget(priority=2, rate_bps=uplink_mb_s * 1e6 * 0.75),
+    }
+    print(f"代替サーバー: 回線 {uplink_mb_s:.1f} MB/s / download {big_mb} MB / finalize {small_mb} MB")
+    if not transfer_measurable():
+        print("（ss がないため転送量を計測できません。優先度・帯域上限は適用されません）")
+
+    results: Dict[str, float] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, scheduler in (("スケジューラなし", None), ("スケジューラあり", BandwidthScheduler(budgets))):
+            print(f"\n[{label}]")
+            supervisor = ProcessSupervisor(max_concurrent=4, scheduler=scheduler)
+            durations: Dict[str, float] = {}
+
+            def finished(job):
+                durations[job.name] = job.wall_seconds
+                if len(durations) == 2:
+                    app.quit()
+
+            supervisor.job_finished.connect(finished)
+            supervisor.bandwidth_sampled.connect(
+                lambda metrics: print("  " + " / ".join(m.summary() for m in metrics)))
+            supervisor.submit("download", sys.executable,
+                              ["-c", FETCH_SCRIPT, f"{base_url}{big_mb * 1000000}", os.path.join(tmp, "big")])
+            QTimer.singleShot(2000, lambda: supervisor.submit(
+                "finalize", sys.executable,
+                ["-c", FETCH_SCRIPT, f"{base_url}{small_mb * 1000000}", os.path.join(tmp, "small")]))
+            app.exec()
+            print(f"  → finalize {durations['finalize']:.1f} s / download {durations['download']:.1f} s")
+            results[label] = durations['finalize']
+            supervisor.deleteLater()
+    server.shutdown()
+
+    before, after = results["スケジューラなし"], results["スケジューラあり"]
+    print(f"\nfinalize: {before:.1f} s → {after:.1f} s（{after - before:+.1f} s）")
+    if before < 3 * BANDWIDTH_SAMPLE_INTERVAL_MS / 1000:
+        print("（finalize の転送が計測間隔の数回分より短いため、優先度が効く前に終わります。--small を大きくしてください）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="帯域スケジューラの動作確認")
+    parser.add_argument("--demo", action="store_true", help="ローカルの代替サーバーで動作確認")
+    parser.add_argument("--uplink", type=float, default=8.0, help="代替サーバーの回線速度（MB/s）")
+    parser.add_argument("--big", type=int, default=120, help="download の転送量（MB）")
+    parser.add_argument("--small", type=int, default=16, help="finalize の転送量（MB）")
+    args = parser.parse_args()
+
+    if args.demo:
+        run_demo(args.uplink, args.big, args.small)
+    else:
+        for stage, budget in load_budgets().items():
+            limit = f"{budget.rate_bps / 1e6:.1f} MB/s" if budget.rate_bps else "上限なし"
+            print(f"{stage}: 優先度 {budget.priority} / {limit}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+cue_table.py - 列指向の字幕キュー表（長時間SRT向け）
+
+3時間を超えるYouTube自動字幕は数万個の短いキューになるため、
+SrtCue（dataclass）のリストではオブジェクト数とメモリが膨らむ。
+CueTable はキューを列ごとに保持する:
+
+  starts   int32[n]     開始時刻（ミリ秒、昇順）
+  ends     int32[n]     終了時刻（ミリ秒）
+  offsets  int64[n+1]   text 内の各キュー本文の開始位置
+  text     uint8[...]   全キュー本文を連結したUTF-8バッファ
+
+キャッシュファイルに保存すると、次回以降は np.memmap で開くだけになる
+（パース不要、ページは必要になった分だけ読み込まれる）。
+時間範囲の切り出しは searchsorted によるベクトル演算で行う。
+
+ベンチマーク:
+  python3 cue_table.py --bench <file.srt>
+  python3 cue_table.py --bench --synthetic 40000
+
+作成日: 2026-10-19
+バージョン: 1.0.0
+"""
+
+import os
+import re
+import sys
+import time
+import hashlib
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from subtitles import SrtCue, parse_srt, format_timestamp
+
+
+# ==============================================================================
+# 定数
+# ==============================================================================
+
+# キャッシュディレクトリ
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "rehearsal-workflow" / "cues"
+
+# キャッシュファイル形式
+CACHE_MAGIC = b"RWCUE01\0"
+HEADER_SIZE = 64  # magic(8) + n, text_len, src_size, src_mtime_ns (int64 x 4) + 予備
+
+# キュー1個分: タイミング行 + 本文（次の空行まで）
+CUE_PATTERN = re.compile(
+    rb'(\d+):(\d\d):(\d\d)[,.](\d{1,3})[ \t]*-->[ \t]*(\d+):(\d\d):(\d\d)[,.](\d{1,3})[^\n]*\n'
+    rb'((?:[ \t]*\S[^\n]*(?:\n|$))*)'
+)
+
+
+# ==============================================================================
+# ユーティリティ
+# ==============================================================================
+
+def _ms_columns(groups: List[Tuple[bytes, ...]]) -> Tuple[np.ndarray, np.ndarray]:
+    """正規表現のグループ（時・分・秒・ミリ秒 x 開始/終了）をミリ秒のint32配列に変換"""
+    # 数字を空白区切りで連結し、NumPyで一括して整数化する（ミリ秒は3桁に右詰め）
+    digits = b' '.join(
+        b'%s %s %s %s %s %s %s %s' % (g[0], g[1], g[2], g[3].ljust(3, b'0'),
+                                     g[4], g[5], g[6], g[7].ljust(3, b'0'))
+        for g in groups
+    )
+    fields = np.fromstring(digits.decode('ascii'), dtype=np.int64, sep=' ').reshape(-1, 8)
+    starts = ((fields[:, 0] * 60 + fields[:, 1]) * 60 + fields[:, 2]) * 1000 + fields[:, 3]
+    ends = ((fields[:, 4] * 60 + fields[:, 5]) * 60 + fields[:, 6]) * 1000 + fields[:, 7]
+    return starts.astype(np.int32), ends.astype(np.int32)
+
+
+def _cue_body(raw: bytes) -> bytes:
+    """本文の各行をstripして空白1個で連結（subtitles.parse_srt と同じ規則）"""
+    if b'\n' not in raw.rstrip(b'\n'):
+        return raw.strip()
+    return b' '.join(line.strip() for line in raw.split(b'\n') if line.strip())
+
+
+def cache_path_for(srt_path: Path, cache_dir: Path = DEFAULT_CACHE_DIR) -> Path:
+    """SRTファイルに対応するキャッシュファイルのパス"""
+    key = hashlib.sha1(str(Path(srt_path).resolve()).encode('utf-8')).hexdigest()
+    return Path(cache_dir) / f"{key}.cues"
+
+
+# ==============================================================================
+# キュー表
+# ==============================================================================
+
+class CueTable:
+    """列指向の字幕キュー表"""
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray,
+                 offsets: np.ndarray, text: np.ndarray):
+        self.starts = starts
+        self.ends = ends
+        self.offsets = offsets
+        self.text = text
+        self._max_end: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @property
+    def nbytes(self) -> int:
+        """配列の合計バイト数"""
+        return self.starts.nbytes + self.ends.nbytes + self.offsets.nbytes + self.text.nbytes
+
+    @property
+    def max_end(self) -> np.ndarray:
+        """終了時刻の累積最大（重なりのあるキューの範囲検索用）"""
+        if self._max_end is None:
+            self._max_end = np.maximum.accumulate(self.ends) if len(self) else self.ends
+        return self._max_end
+
+    @property
+    def duration_ms(self) -> int:
+        return int(self.max_end[-1]) if len(self) else 0
+
+    # --------------------------------------------------------------------------
+    # 構築
+    # --------------------------------------------------------------------------
+
+    @classmethod
+    def empty(cls) -> "CueTable":
+        return cls(np.zeros(0, np.int32), np.zeros(0, np.int32),
+                   np.zeros(1, np.int64), np.zeros(0, np.uint8))
+
+    @classmethod
+    def from_srt_bytes(cls, content: bytes) -> "CueTable":
+        """SRTのバイト列からキュー表を構築"""
+        content = content.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+        groups = CUE_PATTERN.findall(content)
+        if not groups:
+            return cls.empty()
+
+        bodies = [_cue_body(g[8]) for g in groups]
+        lengths = np.fromiter((len(b) for b in bodies), dtype=np.int64, count=len(bodies))
+        offsets = np.zeros(len(bodies) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        text = np.frombuffer(b''.join(bodies), dtype=np.uint8)
+
+        starts, ends = _ms_columns(groups)
+        table = cls(starts, ends, offsets, text)
+        if np.any(np.diff(table.starts) < 0):
+            table = table.take(np.argsort(table.starts, kind='stable'))
+        return table
+
+    @classmethod
+    def from_srt(cls, path: Path) -> "CueTable":
+        """SRTファイルからキュー表を構築"""
+        content = Path(path).read_bytes()
+        if content.startswith(b'\xef\xbb\xbf'):
+            content = content[3:]
+        return cls.from_srt_bytes(content)
+
+    @classmethod
+    def from_cues(cls, cues: List[SrtCue]) -> "CueTable":
+        """SrtCueのリストから構築"""
+        content = ''.join(
+            f"{c.index}\n{format_timestamp(c.start_ms)} --> {format_timestamp(c.end_ms)}\n{c.text}\n\n"
+            for c in cues
+        )
+        return cls.from_srt_bytes(content.encode('utf-8'))
+
+    def take(self, indices: np.ndarray) -> "CueTable":
+        """指定したキューだけを取り出した新しい表"""
+        indices = np.asarray(indices, dtype=np.int64)
+        lengths = self.offsets[indices + 1] - self.offsets[indices]
+        offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        if len(indices):
+            # 各キュー本文のバイト位置を一括で生成してgather
+            positions = np.repeat(self.offsets[indices] - offsets[:-1], lengths) + np.arange(offsets[-1])
+            text = self.text[positions]
+        else:
+            text = np.zeros(0, np.uint8)
+        return CueTable(np.ascontiguousarray(self.starts[indices]),
+                        np.ascontiguousarray(self.ends[indices]), offsets, text)
+
+    # --------------------------------------------------------------------------
+    # 参照
+    # --------------------------------------------------------------------------
+
+    def text_at(self, i: int) -> str:
+        """i番目のキュー本文"""
+        return self.text[self.offsets[i]:self.offsets[i + 1]].tobytes().decode('utf-8', errors='replace')
+
+    def texts(self, indices=None) -> List[str]:
+        """複数キューの本文"""
+        if indices is None:
+            indices = range(len(self))
+        return [self.text_at(int(i)) for i in indices]
+
+    def to_cues(self) -> List[SrtCue]:
+        """SrtCueのリストに変換"""
+        return [SrtCue(i + 1, int(self.starts[i]), int(self.ends[i]), self.text_at(i))
+                for i in range(len(self))]
+
+    def window(self, start_ms: int, end_ms: int) -> np.ndarray:
+        """[start_ms, end_ms) と重なるキューのインデックス"""
+        lo, hi = self.window_bounds(np.array([start_ms]), np.array([end_ms]))
+        lo, hi = int(lo[0]), int(hi[0])
+        candidates = np.arange(lo, hi)
+        return candidates[self.ends[lo:hi] > start_ms]
+
+    def window_bounds(self, start_ms: np.ndarray, end_ms: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """複数の時間範囲について候補キューの範囲 [lo, hi) を一括で求める
+
+        lo 以前のキューはすべて start_ms までに終了し、hi 以降は end_ms 以降に始まる。
+        """
+        lo = np.searchsorted(self.max_end, start_ms, side='right')
+        hi = np.searchsorted(self.starts, end_ms, side='left')
+        return lo, np.maximum(lo, hi)
+
+    def slice(self, start_ms: int, end_ms: int) -> "CueTable":
+        """[start_ms, end_ms) と重なるキューだけの表"""
+        return self.take(self.window(start_ms, end_ms))
+
+    # --------------------------------------------------------------------------
+    # キャッシュ（memmap）
+    # --------------------------------------------------------------------------
+
+    def save(self, path: Path, src_size: int = 0, src_mtime_ns: int = 0):
+        """キャッシュファイルに保存（一時ファイル経由で置き換え）"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        n = len(self)
+        header = CACHE_MAGIC + np.array([n, len(self.text), src_size, src_mtime_ns], dtype=np.int64).tobytes()
+        header = header.ljust(HEADER_SIZE, b'\0')
+
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(header)
+                f.write(np.ascontiguousarray(self.starts, dtype=np.int32).tobytes())
+                f.write(np.ascontiguousarray(self.ends, dtype=np.int32).tobytes())
+                if n % 2:
+                    f.write(b'\0' * 4)  # offsets を8バイト境界に揃える
+                f.write(np.ascontiguousarray(self.offsets, dtype=np.int64).tobytes())
+                f.write(np.ascontiguousarray(self.text, dtype=np.uint8).tobytes())
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    @staticmethod
+    def read_header(path: Path) -> Optional[Tuple[int, int, int, int]]:
+        """キャッシュのヘッダ (n, text_len, src_size, src_mtime_ns)。不正ならNone"""
+        try:
+            with open(path, 'rb') as f:
+                header = f.read(HEADER_SIZE)
+        except OSError:
+            return None
+        if len(header) < HEADER_SIZE or not header.startswith(CACHE_MAGIC):
+            return None
+        return tuple(int(v) for v in np.frombuffer(header[8:40], dtype=np.int64))
+
+    @classmethod
+    def open_cache(cls, path: Path) -> "CueTable":
+        """キャッシュファイルを memmap で開く（読み取り専用）"""
+        header = cls.read_header(path)
+        if header is None:
+            raise ValueError(f"invalid cue cache: {path}")
+        n, text_len = header[0], header[1]
+        if n == 0:
+            return cls.empty()
+
+        pos = HEADER_SIZE
+        starts = np.memmap(path, dtype=np.int32, mode='r', offset=pos, shape=(n,))
+        pos += 4 * n
+        ends = np.memmap(path, dtype=np.int32, mode='r', offset=pos, shape=(n,))
+        pos += 4 * n + (4 if n % 2 else 0)
+        offsets = np.memmap(path, dtype=np.int64, mode='r', offset=pos, shape=(n + 1,))
+        pos += 8 * (n + 1)
+        if text_len:
+            text = np.memmap(path, dtype=np.uint8, mode='r', offset=pos, shape=(text_len,))
+        else:
+            text = np.zeros(0, np.uint8)
+        return cls(starts, ends, offsets, text)
+
+
+def load_cues(srt_path: Path, cache_dir: Optional[Path] = DEFAULT_CACHE_DIR) -> CueTable:
+    """SRTをキュー表として読み込む（キャッシュが新しければmemmapで開く）"""
+    srt_path = Path(srt_path)
+    if cache_dir is None:
+        return CueTable.from_srt(srt_path)
+
+    st = srt_path.stat()
+    cache = cache_path_for(srt_path, cache_dir)
+    header = CueTable.read_header(cache)
+    if header and header[2] == st.st_size and header[3] == st.st_mtime_ns:
+        return CueTable.open_cache(cache)
+
+    table = CueTable.from_srt(srt_path)
+    try:
+        table.save(cache, st.st_size, st.st_mtime_ns)
+    except OSError:
+        return table
+    return CueTable.open_cache(cache)
+
+
+# ==============================================================================
+# ベンチマーク
+# ==============================================================================
+
+def write_synthetic_srt(path: Path, count: int):
+    """YouTube自動字幕に似た短いキューが続くSRTを生成"""
+    words = ["ホルン", "もう少し", "柔らかく", "ここから", "テンポ", "揃えて", "はい", "じゃあ", "音程", "弦"]
+    with open(path, 'w', encoding='utf-8') as f:
+        t = 0
+        for i in range(count):
+            text = ''.join(words[(i * 7 + k) % len(words)] for k in range(1 + i % 4))
+            f.write(f"{i + 1}\n{format_timestamp(t).replace('.', ',')} --> "
+                    f"{format_timestamp(t + 1800).replace('.', ',')}\n{text}\n\n")
+            t += 270
+
+
+def _measure(func, repeat: int):
+    """(最良の実行時間[s], 結果を保持したままのメモリ使用量[bytes])"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+        del result
+    tracemalloc.start()
+    result = func()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return best, current
+
+
+def benchmark(srt_path: Path, repeat: int = 3):
+    """list-of-dataclasses パーサとの比較（読み込み時間・メモリ）"""
+    cue_count = len(CueTable.from_srt(srt_path))
+    size_mb = srt_path.stat().st_size / 1e6
+    print(f"入力: {srt_path.name}（{cue_count}キュー, {size_mb:.1f} MB）")
+    print(f"{'方式':<28}{'読み込み':>12}{'メモリ':>14}")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        load_cues(srt_path, Path(cache_dir))  # キャッシュ作成
+        rows = [
+            ("parse_srt（SrtCueのlist）", lambda: parse_srt(srt_path)),
+            ("CueTable.from_srt", lambda: CueTable.from_srt(srt_path)),
+            ("load_cues（memmapキャッシュ）", lambda: load_cues(srt_path, Path(cache_dir))),
+        ]
+        for label, func in rows:
+            seconds, memory = _measure(func, repeat)
+            print(f"{label:<28}{seconds * 1000:>10.1f} ms{memory / 1024:>11.0f} KiB")
+
+        # 時間範囲の切り出し（1分間の窓を1000回）
+        table = load_cues(srt_path, Path(cache_dir))
+        cues = parse_srt(srt_path)
+        rng = np.random.default_rng(0)
+        windows = rng.integers(0, max(table.duration_ms - 60000, 1), size=1000)
+
+        started = time.perf_counter()
+        for a in windows:
+            table.window(int(a), int(a) + 60000)
+        vectorized = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for a in windows[:100]:
+            [c for c in cues if c.end_ms > a and c.start_ms < a + 60000]
+        naive = (time.perf_counter() - started) * 10
+
+        print(f"1分窓の切り出し x1000: CueTable {vectorized * 1000:.1f} ms / list走査 {naive * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="列指向キュー表のベンチマーク")
+    parser.add_argument("srt", nargs="?", help="SRTファイル")
+    parser.add_argument("--bench", action="store_true", help="ベンチマークを実行")
+    parser.add_argument("--synthetic", type=int, default=0, help="指定数のキューを持つ合成SRTで計測")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if not args.bench:
+        parser.print_help()
+        return
+
+    if args.synthetic:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "synthetic_yt.srt"
+            write_synthetic_srt(path, args.synthetic)
+            benchmark(path, args.repeat)
+    elif args.srt:
+        benchmark(Path(args.srt), args.repeat)
+    else:
+        print("SRTファイルまたは --synthetic を指定してください", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
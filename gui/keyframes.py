@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+keyframes.py - チャプターごとのキーフレーム（サムネイル）抽出
+
+リハーサル記録TeXの全チャプターのタイムスタンプについて、動画から
+キーフレームを1枚ずつ取り出す。チャプターごとにffmpegを起動するのではなく、
+1回のffmpeg実行で最初のチャプター位置にシークし、キーフレームだけを
+先頭から順にデコードしながら、各タイムスタンプ以降の最初のキーフレームを
+select フィルタで選ぶ（-skip_frame nokey により非キーフレームはデコードしない）。
+
+取り出したフレームは縮小して (動画ハッシュ, タイムスタンプ, 幅) をキーに
+キャッシュするため、再実行時はffmpegを起動しない。
+
+出力:
+  keyframes/<ハッシュ>_<ミリ秒>.jpg   - TeXと同じディレクトリに配置するサムネイル
+  <basename>_keyframes.tex            - \\input 用のサムネイル一覧
+
+使用方法（コマンドライン）:
+  python3 keyframes.py <リハーサル記録.tex> [--video file.mp4] [--width 320]
+
+作成日: 2026-10-19
+バージョン: 1.0.0
+"""
+
+import os
+import re
+import sys
+import shutil
+import argparse
+import tempfile
+import subprocess
+from bisect import bisect_left
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Dict, List
+
+from run_journal import file_digest
+from subtitles import format_timestamp
+from tex_record import TexSection, read_sections
+from transcript_index import video_for
+
+
+# ==============================================================================
+# 定数
+# ==============================================================================
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "rehearsal-workflow" / "keyframes"
+DEFAULT_WIDTH = 320
+
+# TeXと同じディレクトリに置く画像ディレクトリ（リモートコンパイル時に一緒に送る）
+KEYFRAME_DIR_NAME = "keyframes"
+
+# 最後のチャプター以降、キーフレームを探す長さ（秒）
+KEYFRAME_SEARCH_S = 30
+
+FFMPEG_TIMEOUT_S = 30 * 60
+
+# showinfo の出力: "n:   3 pts: 123456 pts_time:1234.56 ..."
+SHOWINFO_PATTERN = re.compile(r'\bn:\s*(\d+)\s+pts:\s*\S+\s+pts_time:\s*([-\d.]+)')
+
+
+# ==============================================================================
+# データモデル
+# ==============================================================================
+
+@dataclass
+class Keyframe:
+    """チャプター1件分のキーフレーム"""
+    target_ms: int      # チャプターのタイムスタンプ
+    path: Path          # キャッシュ内の画像
+    title: str = ""     # チャプター見出し（TeX）
+
+    @property
+    def caption(self) -> str:
+        return f"{format_timestamp(self.target_ms)[:8]} {self.title}"
+
+
+# ==============================================================================
+# キャッシュ
+# ==============================================================================
+
+def video_cache_dir(video: Path, cache_dir: Path = DEFAULT_CACHE_DIR) -> Path:
+    """動画ごとのキャッシュディレクトリ（内容のハッシュで識別）"""
+    return Path(cache_dir) / file_digest(Path(video))[:16]
+
+
+def cached_frame_path(frame_dir: Path, target_ms: int, width: int) -> Path:
+    return frame_dir / f"{target_ms:09d}_w{width}.jpg"
+
+
+def miss_marker_path(frame_dir: Path, target_ms: int, width: int) -> Path:
+    """キーフレームがなかった時刻（動画の終わりより後など）の印"""
+    return frame_dir / f"{target_ms:09d}_w{width}.none"
+
+
+def chapter_sections(tex_path: Path) -> List[TexSection]:
+    """タイムスタンプ付きの見出し（全レベル、同じ時刻は最初の1件）"""
+    seen = set()
+    sections = []
+    for section in read_sections(tex_path):
+        if section.start_ms is not None and section.start_ms not in seen:
+            seen.add(section.start_ms)
+            sections.append(section)
+    return sections
+
+
+# ==============================================================================
+# ffmpeg（1回のデコードで全チャプター）
+# ==============================================================================
+
+def build_select_expr(targets_s: List[float]) -> str:
+    """各時刻 Ti について「t >= Ti となる最初のフレーム」を選ぶ select 式
+
+    直前に選んだフレームが Ti より前（または未選択）で、t >= Ti のフレームを選ぶ。
+    キーフレームがまばらで複数のチャプターが同じフレームに当たる場合は1枚だけ出力する。
+    """
+    return '+'.join(
+        f"gte(t\\,{t:.3f})*(isnan(prev_selected_t)+lt(prev_selected_t\\,{t:.3f}))"
+        for t in targets_s
+    )
+
+
+def build_ffmpeg_command(video: Path, targets_ms: List[int], width: int, out_pattern: str) -> List[str]:
+    """キーフレーム抽出のffmpegコマンド（最初のチャプターへシーク、-copytsで時刻は動画基準）"""
+    targets_s = [ms / 1000 for ms in targets_ms]
+    start = targets_s[0]
+    duration = targets_s[-1] - start + KEYFRAME_SEARCH_S
+    return [
+        "ffmpeg", "-hide_banner", "-nostdin", "-loglevel", "info",
+        "-skip_frame", "nokey",
+        "-ss", f"{start:.3f}", "-t", f"{duration:.3f}", "-copyts",
+        "-i", str(video),
+        "-an", "-sn", "-dn",
+        "-vf", f"select={build_select_expr(targets_s)},showinfo,scale={width}:-2",
+        "-vsync", "vfr", "-q:v", "4",
+        out_pattern,
+    ]
+
+
+def extract_keyframes(video: Path, targets_ms: List[int], width: int = DEFAULT_WIDTH,
+                      cache_dir: Path = DEFAULT_CACHE_DIR) -> Dict[int, Path]:
+    """各タイムスタンプのキーフレームを取り出してキャッシュし、{ms: 画像} を返す
+
+    キャッシュ済みのタイムスタンプ（キーフレームがなかったものを含む）はffmpegに渡さない。
+    """
+    frame_dir = video_cache_dir(video, cache_dir)
+    frame_dir.mkdir(parents=True, exist_ok=True)
+
+    frames = {}
+    missing = []
+    for ms in sorted(set(targets_ms)):
+        path = cached_frame_path(frame_dir, ms, width)
+        if path.exists():
+            frames[ms] = path
+        elif not miss_marker_path(frame_dir, ms, width).exists():
+            missing.append(ms)
+    if not missing:
+        return frames
+
+    with tempfile.TemporaryDirectory(dir=frame_dir) as tmp:
+        command = build_ffmpeg_command(video, missing, width, os.path.join(tmp, "frame_%05d.jpg"))
+        result = subprocess.run(command, capture_output=True, text=True,
+                                errors='replace', timeout=FFMPEG_TIMEOUT_S)
+        if result.returncode != 0:
+            tail = "\n".join(result.stderr.strip().splitlines()[-5:])
+            raise RuntimeError(f"ffmpeg failed (exit {result.returncode}):\n{tail}")
+
+        # 出力フレームの時刻（showinfo の出現順 = 出力ファイルの連番）
+        frame_times = [float(m.group(2)) for m in SHOWINFO_PATTERN.finditer(result.stderr)]
+
+        for ms in missing:
+            k = bisect_left(frame_times, ms / 1000 - 0.0005)
+            source = Path(tmp) / f"frame_{k + 1:05d}.jpg"
+            if k < len(frame_times) and source.exists():
+                path = cached_frame_path(frame_dir, ms, width)
+                shutil.copyfile(source, path.with_suffix('.tmp'))
+                os.replace(path.with_suffix('.tmp'), path)
+                frames[ms] = path
+            else:
+                miss_marker_path(frame_dir, ms, width).touch()
+    return frames
+
+
+def cached_keyframes(video: Path, sections: List[TexSection], width: int = DEFAULT_WIDTH,
+                     cache_dir: Path = DEFAULT_CACHE_DIR) -> List[Keyframe]:
+    """キャッシュ済みのキーフレームだけを返す（ffmpegは起動しない）"""
+    frame_dir = video_cache_dir(video, cache_dir)
+    keyframes = []
+    for section in sections:
+        path = cached_frame_path(frame_dir, section.start_ms, width)
+        if path.exists():
+            keyframes.append(Keyframe(section.start_ms, path, section.title))
+    return keyframes
+
+
+# ==============================================================================
+# TeX出力
+# ==============================================================================
+
+def link_or_copy(source: Path, dest: Path):
+    """ハードリンク（別ファイルシステムならコピー）"""
+    if dest.exists():
+        dest.unlink()
+    try:
+        os.link(source, dest)
+    except OSError:
+        shutil.copyfile(source, dest)
+
+
+def write_tex_snippet(tex_path: Path, keyframes: List[Keyframe]) -> Path:
+    """サムネイル一覧の <basename>_keyframes.tex を書き出す
+
+    画像はTeXと同じディレクトリの keyframes/ に置く（ファイル名はASCIIのみ）。
+    """
+    tex_path = Path(tex_path)
+    image_dir = tex_path.parent / KEYFRAME_DIR_NAME
+    image_dir.mkdir(exist_ok=True)
+
+    lines = [
+        "% 自動生成: keyframes.py（チャプターのキーフレーム）",
+        "\\clearpage",
+        "\\section*{チャプター・サムネイル}",
+    ]
+    for frame in keyframes:
+        name = f"{frame.path.parent.name}_{frame.path.stem}.jpg"
+        link_or_copy(frame.path, image_dir / name)
+        lines += [
+            "\\noindent\\begin{minipage}{\\linewidth}",
+            f"\\includegraphics[width=0.45\\linewidth]{{{KEYFRAME_DIR_NAME}/{name}}}\\hfill",
+            "\\begin{minipage}[b]{0.52\\linewidth}\\small",
+            f"\\texttt{{{format_timestamp(frame.target_ms)[:8]}}}\\\\ {frame.title}",
+            "\\end{minipage}",
+            "\\end{minipage}\\par\\smallskip",
+        ]
+
+    snippet = tex_path.with_name(tex_path.stem + "_keyframes.tex")
+    snippet.write_text("\n".join(lines) + "\n", encoding='utf-8')
+    return snippet
+
+
+# ==============================================================================
+# コマンドライン
+# ==============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="チャプターごとのキーフレーム抽出")
+    parser.add_argument("tex", help="リハーサル記録（*.tex）")
+    parser.add_argument("--video", help="動画ファイル（既定: TeXと同じ日付の *.mp4）")
+    parser.add_argument("--width", type=int, default=DEFAULT_WIDTH, help="サムネイルの幅（px）")
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR))
+    args = parser.parse_args()
+
+    tex = Path(args.tex)
+    video = Path(args.video) if args.video else tex.parent / video_for(tex, 'tex')
+    if not tex.exists() or not video.is_file():
+        print(f"[ERROR] ファイルが見つかりません: {tex if not tex.exists() else video}")
+        sys.exit(1)
+
+    sections = chapter_sections(tex)
+    if not sections:
+        print("[WARN] タイムスタンプ付きの見出しがありません")
+        sys.exit(0)
+
+    print(f"[INFO] {len(sections)}チャプターのキーフレームを抽出: {video.name}")
+    cache_dir = Path(args.cache_dir)
+    try:
+        frames = extract_keyframes(video, [s.start_ms for s in sections], args.width, cache_dir)
+    except (OSError, RuntimeError, subprocess.TimeoutExpired) as e:
+        print(f"[ERROR] キーフレーム抽出に失敗しました: {e}")
+        sys.exit(1)
+
+    keyframes = cached_keyframes(video, sections, args.width, cache_dir)
+    for section in sections:
+        if section.start_ms not in frames:
+            print(f"[WARN] キーフレームなし: {format_timestamp(section.start_ms)} {section.title}")
+    snippet = write_tex_snippet(tex, keyframes)
+    print(f"[SUCCESS] {len(keyframes)}/{len(sections)}枚 → {snippet.name}（画像: {KEYFRAME_DIR_NAME}/）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+process_supervisor.py - 外部プロセスの監督（同時実行数・タイムアウト・中止）
+
+GUIから起動する zsh 関数（rehearsal-download, rehearsal-finalize）を
+QProcess で実行し、以下を一元管理する。
+
+  - 同時実行数の上限（超過分はキューで待機）
+  - ジョブごとのタイムアウト
+  - 中止（zsh → ytdl → ffmpeg などのプロセスツリー全体を終了）
+  - 終了したジョブの回収（QProcessの破棄、直近の履歴のみ保持）
+  - 子プロセスごとのリソース使用量（実行時間・最大RSS・CPU時間）
+  - 並列シャットダウン（全ジョブに同時にシグナルを送り、猶予は全体で1回）
+  - 帯域スケジューリング（任意。bandwidth.BandwidthScheduler の判断で
+    ジョブのプロセスグループを SIGSTOP / SIGCONT）
+
+プロセスツリーの終了:
+  各ジョブは新しいセッション（プロセスグループ）で起動するため、
+  os.killpg() でグループ全体にシグナルを送れる。グループが使えない場合は
+  ps の親子関係から子孫プロセスを列挙して個別に送信する。
+
+作成日: 2026-10-19
+バージョン: 1.0.0
+"""
+
+import os
+import sys
+import signal
+import subprocess
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Deque, Dict, List, Optional
+
+from PySide6.QtCore import QObject, QProcess, QTimer, Signal
+
+from bandwidth import BandwidthScheduler, read_transfer_bytes, socket_snapshot
+
+
+# ==============================================================================
+# 定数
+# ==============================================================================
+
+# 新しいセッションを作ってから目的のコマンドをexecするラッパー
+# （exec後もPIDは同じなので、PID == プロセスグループIDになる）
+SETSID_EXEC = (
+    "import os, sys\n"
+    "os.setsid()\n"
+    "try:\n"
+    "    os.execvp(sys.argv[1], sys.argv[1:])\n"
+    "except OSError as e:\n"
+    "    sys.exit(f'[ERROR] {sys.argv[1]}: {e.strerror}')\n"
+)
+
+# SIGTERMからSIGKILLまでの猶予
+DEFAULT_GRACE_MS = 3000
+
+# リソース使用量のサンプリング間隔
+USAGE_SAMPLE_INTERVAL_MS = 5000
+
+# 転送量の計測と帯域スケジューリングの間隔
+BANDWIDTH_SAMPLE_INTERVAL_MS = 1000
+
+
+# ==============================================================================
+# データモデル
+# ==============================================================================
+
+class JobState(Enum):
+    """ジョブの状態"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    FINISHED = "finished"      # 終了コード0
+    FAILED = "failed"          # 終了コード0以外
+    CANCELLED = "cancelled"    # ユーザーによる中止
+    TIMED_OUT = "timed_out"    # タイムアウト
+
+
+@dataclass
+class SupervisedJob:
+    """監督下のジョブ"""
+    name: str
+    program: str
+    args: List[str]
+    timeout_ms: int = 0          # 0 = 無制限
+    workdir: str = ""
+    state: JobState = JobState.QUEUED
+    pid: int = 0
+    exit_code: Optional[int] = None
+
+    # 時刻（time.monotonic）
+    queued_at: float = field(default_factory=time.monotonic)
+    started_at: float = 0.0
+    finished_at: float = 0.0
+
+    # リソース使用量（プロセスグループ合計）
+    peak_rss_kb: int = 0
+    cpu_seconds: float = 0.0
+
+    # 帯域スケジューラによる一時停止中（SIGSTOP）。停止中はタイムアウトを数えない
+    paused: bool = False
+    timeout_remaining_ms: int = 0
+
+    process: Optional[QProcess] = field(default=None, repr=False)
+    timeout_timer: Optional[QTimer] = field(default=None, repr=False)
+
+    @property
+    def is_active(self) -> bool:
+        return self.state in (JobState.QUEUED, JobState.RUNNING)
+
+    @property
+    def stage(self) -> str:
+        """ジョブ名のステージ部分（"download:<key>" → "download"）"""
+        return self.name.split(':', 1)[0]
+
+    @property
+    def wall_seconds(self) -> float:
+        if not self.started_at:
+            return 0.0
+        end = self.finished_at or time.monotonic()
+        return end - self.started_at
+
+    def usage_summary(self) -> str:
+        """リソース使用量の1行サマリー"""
+        return (f"実行時間 {self.wall_seconds:.1f} s / "
+                f"最大メモリ {self.peak_rss_kb / 1024:.0f} MB / "
+                f"CPU {self.cpu_seconds:.1f} s")
+
+
+# ==============================================================================
+# プロセスツリー操作
+# ==============================================================================
+
+def parse_cpu_time(text: str) -> float:
+    """ps の TIME 表記（[DD-]HH:MM:SS, MM:SS.ss など）を秒に変換"""
+    days = 0
+    if '-' in text:
+        d, text = text.split('-', 1)
+        days = int(d)
+    seconds = 0.0
+    for part in text.split(':'):
+        seconds = seconds * 60 + float(part)
+    return days * 86400 + seconds
+
+
+def snapshot_processes() -> List[tuple]:
+    """全プロセスの (pid, ppid, pgid, rss_kb, cpu_seconds) を取得"""
+    try:
+        out = subprocess.run(
+            ["ps", "-A", "-o", "pid=", "-o", "ppid=", "-o", "pgid=", "-o", "rss=", "-o", "time="],
+            capture_output=True, text=True, timeout=5
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return []
+
+    rows = []
+    for line in out.splitlines():
+        cols = line.split()
+        if len(cols) != 5:
+            continue
+        try:
+            rows.append((int(cols[0]), int(cols[1]), int(cols[2]), int(cols[3]), parse_cpu_time(cols[4])))
+        except ValueError:
+            continue
+    return rows
+
+
+def descendants(pid: int, rows: List[tuple]) -> List[int]:
+    """pid とその子孫のPID一覧"""
+    children: Dict[int, List[int]] = {}
+    for p, ppid, _, _, _ in rows:
+        children.setdefault(ppid, []).append(p)
+    result, stack = [], [pid]
+    while stack:
+        p = stack.pop()
+        result.append(p)
+        stack.extend(children.get(p, []))
+    return result
+
+
+def group_members(pid: int, rows: List[tuple]) -> List[int]:
+    """pid のプロセスグループと子孫のPID一覧"""
+    members = set(descendants(pid, rows))
+    members.update(r[0] for r in rows if r[2] == pid)
+    return sorted(members)
+
+
+def signal_tree(pid: int, sig: int):
+    """プロセスツリー全体にシグナルを送信"""
+    if pid <= 0:
+        return
+    try:
+        if os.getpgid(pid) == pid:
+            os.killpg(pid, sig)
+            return
+    except ProcessLookupError:
+        # リーダー（zsh）が先に終了していても、グループに残ったプロセスには送れる
+        try:
+            os.killpg(pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+        return
+    except PermissionError:
+        return
+    # プロセスグループが分かれていない場合は子孫を個別に
+    for p in reversed(descendants(pid, snapshot_processes())):
+        try:
+            os.kill(p, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+# ==============================================================================
+# スーパーバイザー
+# ==============================================================================
+
+class ProcessSupervisor(QObject):
+    """外部プロセスの起動・監視・終了を一元管理"""
+
+    # シグナル
+    job_started = Signal(object)        # SupervisedJob
+    job_output = Signal(object, str)    # SupervisedJob, 出力テキスト
+    job_finished = Signal(object)       # SupervisedJob
+    bandwidth_sampled = Signal(object)  # List[StageMetrics]
+
+    def __init__(self, max_concurrent: int = 2, history_size: int = 50,
+                 scheduler: Optional[BandwidthScheduler] = None, parent=None):
+        super().__init__(parent)
+        self.max_concurrent = max_concurrent
+        self.scheduler = scheduler
+        self.queue: Deque[SupervisedJob] = deque()
+        self.running: List[SupervisedJob] = []
+        self.history: Deque[SupervisedJob] = deque(maxlen=history_size)
+
+        # 実行中ジョブのリソース使用量を定期サンプリング
+        self.usage_timer = QTimer(self)
+        self.usage_timer.timeout.connect(self.sample_usage)
+
+        # 帯域スケジューリング（スケジューラがある場合のみ）
+        self.bandwidth_timer = QTimer(self)
+        self.bandwidth_timer.timeout.connect(self.sample_bandwidth)
+
+    # --------------------------------------------------------------------------
+    # 公開API
+    # --------------------------------------------------------------------------
+
+    def submit(self, name: str, program: str, args: List[str],
+               timeout_ms: int = 0, workdir: str = "") -> SupervisedJob:
+        """ジョブを登録（空きがあれば即時起動）"""
+        job = SupervisedJob(name=name, program=program, args=list(args),
+                            timeout_ms=timeout_ms, workdir=workdir)
+        self.queue.append(job)
+        self.start_pending()
+        return job
+
+    def active_jobs(self) -> List[SupervisedJob]:
+        """待機中・実行中のジョブ"""
+        return list(self.running) + list(self.queue)
+
+    def cancel(self, job: SupervisedJob, grace_ms: int = DEFAULT_GRACE_MS):
+        """ジョブを中止（プロセスツリー全体にSIGTERM、猶予後にSIGKILL）"""
+        if job.state == JobState.QUEUED:
+            self.queue.remove(job)
+            job.state = JobState.CANCELLED
+            self.reap(job)
+        elif job.state == JobState.RUNNING:
+            job.state = JobState.CANCELLED
+            self.terminate(job, grace_ms)
+
+    def cancel_all(self, grace_ms: int = DEFAULT_GRACE_MS):
+        """全ジョブを中止"""
+        for job in self.active_jobs():
+            self.cancel(job, grace_ms)
+
+    def shutdown(self, grace_ms: int = DEFAULT_GRACE_MS):
+        """全ジョブを並列に終了（待ち時間は全体で grace_ms まで）"""
+        for job in list(self.queue):
+            self.queue.remove(job)
+            job.state = JobState.CANCELLED
+
+        running = list(self.running)
+        for job in running:
+            job.state = JobState.CANCELLED
+            signal_tree(job.pid, signal.SIGTERM)
+            self.resume(job)
+
+        deadline = time.monotonic() + grace_ms / 1000
+        for job in running:
+            remaining = max(0, int((deadline - time.monotonic()) * 1000))
+            if job.process:
+                job.process.waitForFinished(remaining)
+            # リーダーが終了していてもSIGTERMを無視した子が残りうるため無条件に送る
+            signal_tree(job.pid, signal.SIGKILL)
+        for job in running:
+            if job.process:
+                job.process.waitForFinished(500)
+
+    # --------------------------------------------------------------------------
+    # 内部処理
+    # --------------------------------------------------------------------------
+
+    def start_pending(self):
+        """空きがある限りキューからジョブを起動"""
+        while self.queue and len(self.running) < self.max_concurrent:
+            self.launch(self.queue.popleft())
+
+    def launch(self, job: SupervisedJob):
+        """ジョブを新しいプロセスグループで起動"""
+        process = QProcess(self)
+        process.setProcessChannelMode(QProcess.ProcessChannelMode.MergedChannels)
+        if job.workdir:
+            process.setWorkingDirectory(job.workdir)
+        process.readyReadStandardOutput.connect(lambda: self.handle_output(job))
+        process.finished.connect(lambda exit_code, exit_status: self.handle_finished(job, exit_code))
+
+        job.process = process
+        job.state = JobState.RUNNING
+        job.started_at = time.monotonic()
+        process.start(sys.executable, ["-c", SETSID_EXEC, job.program] + job.args)
+        process.waitForStarted(5000)
+        job.pid = int(process.processId())
+
+        if job.timeout_ms > 0:
+            job.timeout_timer = QTimer(self)
+            job.timeout_timer.setSingleShot(True)
+            job.timeout_timer.timeout.connect(lambda: self.handle_timeout(job))
+            job.timeout_timer.start(job.timeout_ms)
+
+        self.running.append(job)
+        if not self.usage_timer.isActive():
+            self.usage_timer.start(USAGE_SAMPLE_INTERVAL_MS)
+        if self.scheduler and self.scheduler.add_flow(job.name, job.stage):
+            if not self.bandwidth_timer.isActive():
+                self.bandwidth_timer.start(BANDWIDTH_SAMPLE_INTERVAL_MS)
+            self.sample_bandwidth()     # 優先度の低い転送をすぐに一時停止
+        self.job_started.emit(job)
+
+        # 起動失敗（プログラムが見つからない等）
+        if process.state() == QProcess.ProcessState.NotRunning:
+            self.handle_finished(job, -1)
+
+    def terminate(self, job: SupervisedJob, grace_ms: int):
+        """SIGTERMを送り、猶予後も残っていればSIGKILL"""
+        signal_tree(job.pid, signal.SIGTERM)
+        self.resume(job)    # 一時停止中はSIGTERMを処理できないため再開
+
+        # zsh がSIGTERMで終了しても ytdl / ffmpeg が残っている場合があるため、
+        # リーダーの生死にかかわらずグループ全体に送る（空のグループへの送信は無害）
+        QTimer.singleShot(grace_ms, lambda: signal_tree(job.pid, signal.SIGKILL))
+
+    def handle_output(self, job: SupervisedJob):
+        if job.process is None:
+            return
+        output = job.process.readAllStandardOutput().data().decode('utf-8', errors='ignore')
+        if output:
+            self.job_output.emit(job, output)
+
+    def handle_timeout(self, job: SupervisedJob):
+        if job.state == JobState.RUNNING:
+            job.state = JobState.TIMED_OUT
+            self.terminate(job, DEFAULT_GRACE_MS)
+
+    def handle_finished(self, job: SupervisedJob, exit_code: int):
+        if job not in self.running:
+            return
+        self.handle_output(job)
+        self.sample_usage()
+
+        job.exit_code = exit_code
+        job.finished_at = time.monotonic()
+        if job.state == JobState.RUNNING:
+            job.state = JobState.FINISHED if exit_code == 0 else JobState.FAILED
+        self.running.remove(job)
+        job.paused = False
+        if self.scheduler and self.scheduler.has_flow(job.name):
+            self.scheduler.remove_flow(job.name)
+            self.sample_bandwidth()     # 一時停止していた転送をすぐに再開
+        self.reap(job)
+        self.start_pending()
+
+    def reap(self, job: SupervisedJob):
+        """終了したジョブのQtオブジェクトを破棄して履歴に移す"""
+        if job.timeout_timer:
+            job.timeout_timer.stop()
+            job.timeout_timer.deleteLater()
+            job.timeout_timer = None
+        if job.process:
+            job.process.deleteLater()
+            job.process = None
+        if not self.running:
+            self.usage_timer.stop()
+            self.bandwidth_timer.stop()
+        self.history.append(job)
+        self.job_finished.emit(job)
+
+    def sample_usage(self):
+        """実行中ジョブのプロセスグループのRSS・CPU時間を集計"""
+        if not self.running:
+            return
+        rows = snapshot_processes()
+        for job in self.running:
+            members = set(group_members(job.pid, rows))
+            rss = sum(r[3] for r in rows if r[0] in members)
+            cpu = sum(r[4] for r in rows if r[0] in members)
+            job.peak_rss_kb = max(job.peak_rss_kb, rss)
+            job.cpu_seconds = max(job.cpu_seconds, cpu)
+
+    def pause(self, job: SupervisedJob):
+        """プロセスグループを一時停止（SIGSTOP）し、タイムアウトの計時も止める"""
+        if not job.paused:
+            signal_tree(job.pid, signal.SIGSTOP)
+            job.paused = True
+            if job.timeout_timer and job.timeout_timer.isActive():
+                job.timeout_remaining_ms = max(1, job.timeout_timer.remainingTime())
+                job.timeout_timer.stop()
+
+    def resume(self, job: SupervisedJob):
+        """一時停止したプロセスグループを再開（SIGCONT）し、残りのタイムアウトから計時を再開"""
+        if job.paused:
+            signal_tree(job.pid, signal.SIGCONT)
+            job.paused = False
+            if job.timeout_timer and job.timeout_remaining_ms:
+                job.timeout_timer.start(job.timeout_remaining_ms)
+                job.timeout_remaining_ms = 0
+
+    def sample_bandwidth(self):
+        """実行中ジョブの転送量を計測し、スケジューラの判断で一時停止・再開"""
+        if not self.scheduler or not self.running:
+            return
+        rows = snapshot_processes()
+        sockets = socket_snapshot()
+        now = time.monotonic()
+        for job in self.running:
+            if self.scheduler.has_flow(job.name):
+                members = group_members(job.pid, rows)
+                self.scheduler.observe(job.name, read_transfer_bytes(members, sockets), now)
+
+        decisions = self.scheduler.plan(now)
+        for job in self.running:
+            if job.name not in decisions or job.state != JobState.RUNNING:
+                continue
+            if decisions[job.name]:
+                self.pause(job)
+            else:
+                self.resume(job)
+        self.bandwidth_sampled.emit(self.scheduler.metrics(now))
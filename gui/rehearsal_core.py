@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+rehearsal_core.py - ワークフローの共通定義（Qtに依存しない部分）
+
+GUI（rehearsal_gui.py）と常駐処理（rehearsal_daemon.py）が共有する
+データモデル・設定ファイルの読み書き・zsh関数の起動引数を定義する。
+ディスプレイのないサーバーでも import できるよう、Qtには依存しない。
+
+作成日: 2026-10-19
+バージョン: 1.0.0
+"""
+
+import shlex
+import yaml
+from pathlib import Path
+from dataclasses import dataclass, field, asdict
+from typing import Optional, List
+from datetime import datetime
+from enum import Enum
+
+
+# ==============================================================================
+# 定数
+# ==============================================================================
+
+# 設定ファイルのパス（ホームディレクトリ）
+CONFIG_FILE = Path.home() / ".config" / "rehearsal-workflow" / "settings.yaml"
+
+# プロジェクトごとのメタデータ（プロジェクトの作業ディレクトリ内）
+PROJECT_SETTINGS_NAME = Path(".rehearsal") / "project.yaml"
+
+# リハーサル1回ごとに異なる項目（新しいプロジェクトには引き継がない）
+REHEARSAL_FIELDS = ('youtube_url', 'rehearsal_date', 'piece_name')
+
+# 成果物の種類 -> RehearsalMetadataのフィールド名（ジャーナル記録・復元用）
+ARTIFACT_FIELDS = {
+    'video': 'video_file',
+    'yt_srt': 'yt_srt_file',
+    'wp_srt': 'wp_srt_file',
+    'tex': 'tex_file',
+    'pdf': 'pdf_file',
+    'youtube_ch': 'youtube_chapters',
+    'mv_ch': 'movieviewer_chapters',
+}
+
+# 外部プロセスの同時実行数とステップごとのタイムアウト
+MAX_CONCURRENT_PROCESSES = 2
+DOWNLOAD_TIMEOUT_MS = 2 * 60 * 60 * 1000   # Step 1: 2時間（動画ダウンロード + Whisper投入）
+FINALIZE_TIMEOUT_MS = 15 * 60 * 1000       # Step 3: 15分（リモートコンパイル 1〜3分）
+KEYFRAMES_TIMEOUT_MS = 30 * 60 * 1000      # キーフレーム抽出: 30分（動画を1回読み通す）
+STORE_TIMEOUT_MS = 30 * 60 * 1000          # 共有ストアへの取り込み: 30分（ハッシュのため動画を1回読み通す）
+
+# 字幕チェックで不適と判定され、AI分析（Step 2）を保留しているときのステップメッセージ
+PRECHECK_HOLD_MESSAGE = "字幕チェック: 分析に不適"
+
+# rehearsal-download がWhisperを起動した（または字幕が既にある）ことを示す出力
+WHISPER_LAUNCH_MARKERS = ("Whisper job submitted successfully!", "Whisper subtitle already exists")
+
+# キーフレーム抽出スクリプト（GUIを止めないよう別プロセスで実行）
+KEYFRAMES_SCRIPT = Path(__file__).resolve().parent / "keyframes.py"
+
+# 共有ストアへの取り込みスクリプト（動画全体のハッシュをGUIの外で計算）
+WORKSPACE_SCRIPT = Path(__file__).resolve().parent / "workspace.py"
+
+
+# ==============================================================================
+# データモデル
+# ==============================================================================
+
+class WorkflowStep(Enum):
+    """ワークフロー進行状況"""
+    IDLE = 0
+    DOWNLOADING = 1
+    WAITING_WHISPER = 2
+    ANALYZING = 3
+    FINALIZING = 4
+    COMPLETED = 5
+    ERROR = -1
+
+
+@dataclass
+class RehearsalMetadata:
+    """リハーサル記録メタデータ"""
+    # 必須情報
+    youtube_url: str = ""
+    rehearsal_date: str = ""  # YYYY-MM-DD
+    organization: str = "創価大学 新世紀管弦楽団"
+    conductor: str = "阪本正彦先生"
+    piece_name: str = ""
+    concert_date: str = ""  # YYYY-MM-DD
+    author: str = "ホルン奏者有志"
+
+    # ファイル情報（自動検出）
+    video_file: str = ""
+    yt_srt_file: str = ""
+    wp_srt_file: str = ""
+    tex_file: str = ""
+    pdf_file: str = ""
+    youtube_chapters: str = ""
+    movieviewer_chapters: str = ""
+
+    # ワークフロー状態
+    step: WorkflowStep = WorkflowStep.IDLE
+    step_message: str = ""
+
+    # Whisper設定
+    use_demucs: bool = True  # 音源分離（音楽が大きい場合）
+
+    # 生成時刻（JST）
+    generation_date: str = field(default_factory=lambda: datetime.now().strftime("%Y-%m-%d"))
+    generation_time: str = field(default_factory=lambda: datetime.now().strftime("%H:%M"))
+
+    def to_dict(self):
+        """設定保存用の辞書に変換（保存不要なフィールドを除外）"""
+        data = asdict(self)
+        # ファイル情報とワークフロー状態は保存しない
+        exclude_keys = [
+            'video_file', 'yt_srt_file', 'wp_srt_file',
+            'tex_file', 'pdf_file', 'youtube_chapters', 'movieviewer_chapters',
+            'step', 'step_message', 'generation_date', 'generation_time'
+        ]
+        for key in exclude_keys:
+            data.pop(key, None)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """辞書から復元"""
+        # stepはEnumなので特別に処理
+        if 'step' in data and isinstance(data['step'], int):
+            data['step'] = WorkflowStep(data['step'])
+        # 存在しないキーは無視
+        valid_keys = {f.name for f in cls.__dataclass_fields__.values()}
+        filtered_data = {k: v for k, v in data.items() if k in valid_keys}
+        return cls(**filtered_data)
+
+
+# ==============================================================================
+# 設定管理
+# ==============================================================================
+
+def save_settings(metadata: RehearsalMetadata, path: Path = CONFIG_FILE):
+    """設定をYAMLファイルに保存"""
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            yaml.dump(metadata.to_dict(), f, allow_unicode=True, default_flow_style=False)
+        return True
+    except Exception as e:
+        print(f"Error saving settings: {e}")
+        return False
+
+
+def load_settings(path: Path = CONFIG_FILE) -> Optional[RehearsalMetadata]:
+    """設定をYAMLファイルから読み込み"""
+    try:
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                data = yaml.safe_load(f)
+                if data:
+                    return RehearsalMetadata.from_dict(data)
+    except Exception as e:
+        print(f"Error loading settings: {e}")
+    return None
+
+
+def project_settings_file(workdir: Path) -> Path:
+    """プロジェクトごとのメタデータ（URL・日付・曲名など）の保存先"""
+    return Path(workdir) / PROJECT_SETTINGS_NAME
+
+
+def load_project_settings(workdir: Path) -> RehearsalMetadata:
+    """プロジェクトのメタデータを読み込む
+
+    未保存のプロジェクトでは共通設定（団体名・指揮者など）を引き継ぎ、
+    リハーサル固有の項目は空にする（別プロジェクトの動画を取り違えない）。
+    """
+    metadata = load_settings(project_settings_file(workdir))
+    if metadata:
+        return metadata
+    metadata = load_settings() or RehearsalMetadata()
+    for field_name in REHEARSAL_FIELDS:
+        setattr(metadata, field_name, "")
+    return metadata
+
+
+def build_zsh_command(cmd: List[str]) -> List[str]:
+    """zsh関数を実行するための zsh 起動引数を組み立てる
+
+    .zshenvでパス設定、ytdl/whisper-remote関数source、fpathとautoloadを手動設定
+    """
+    full_cmd = (
+        f"source ~/.config/zsh/.zshenv && "
+        f"source ~/.config/zsh/functions/ytdl-claude.zsh && "
+        f"source ~/.config/zsh/functions/whisper-remote.zsh && "
+        f"fpath=(~/.config/zsh/functions $fpath) && "
+        f"autoload -Uz rehearsal-download rehearsal-finalize tex2chapters && "
+        f"{' '.join(shlex.quote(arg) for arg in cmd)}"
+    )
+    return ["-c", full_cmd]
@@ -0,0 +1,615 @@
+#!/usr/bin/env python3
+"""
+rehearsal_daemon.py - 監視フォルダによる無人ワークフロー処理
+
+監視フォルダ（ドロップディレクトリ）をポーリングし、置かれたファイルに応じて
+ワークフローの次のステージを自動で起動する。GUIで人が行っていた操作
+（Whisper待ち、LaTeXファイルの選択、Step 3のクリック）を置き換える。
+
+  *.urls                         → rehearsal-download（1行1URL、# で始まる行はコメント）
+  *_wp.srt（書き込み完了後）      → 字幕チェック → claude -p "/rehearsal ..."
+  *リハーサル記録.tex（同上）     → TeX検査 → キーフレーム抽出 → rehearsal-finalize
+
+リハーサル情報（団体名・指揮者・曲名・著者など）は GUI と同じ settings.yaml の
+値を既定値として使う。外部プロセスは ProcessSupervisor で監督し、各ステージの
+起動・終了と入力ファイルのハッシュを実行ジャーナルに記録するため、デーモンを
+再起動しても同じ入力で同じステージを二重に起動しない。
+
+ステージごとの件数（起動・成功・失敗・スキップ）と処理時間・スループットを
+定期的にログへ出力する（download / finalize の転送速度は帯域スケジューラの
+計測値。優先度と帯域予算は GUI と同じ bandwidth.yaml）。ディスプレイは不要（QtCoreのイベントループのみ使用）。
+
+使用方法:
+  python3 rehearsal_daemon.py --drop ~/rehearsals/inbox [--log-file daemon.log]
+
+作成日: 2026-10-19
+バージョン: 1.0.0
+"""
+
+import re
+import sys
+import time
+import signal
+import logging
+import argparse
+from pathlib import Path
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from PySide6.QtCore import QCoreApplication, QObject, QTimer
+
+from rehearsal_core import (
+    MAX_CONCURRENT_PROCESSES, DOWNLOAD_TIMEOUT_MS, FINALIZE_TIMEOUT_MS,
+    KEYFRAMES_TIMEOUT_MS, KEYFRAMES_SCRIPT,
+    WorkflowStep, RehearsalMetadata, load_settings, build_zsh_command
+)
+from run_journal import JOURNAL_DIR_NAME, JournalState, RunJournal, stage_alive
+from process_supervisor import ProcessSupervisor, SupervisedJob, JobState, signal_tree
+from bandwidth import BandwidthScheduler, load_budgets, transfer_measurable
+from subtitle_check import check_subtitles
+from tex_lint import lint_tex
+from transcript_index import video_for
+
+
+# ==============================================================================
+# 定数
+# ==============================================================================
+
+DEFAULT_POLL_S = 10
+DEFAULT_STATS_INTERVAL_S = 10 * 60
+ANALYZE_TIMEOUT_MS = 60 * 60 * 1000    # Step 2: 1時間（数時間分の字幕の分析）
+
+# ダウンロード失敗時の再試行（回数の上限と、前回の失敗からの待ち時間。失敗のたびに2倍）
+DOWNLOAD_MAX_ATTEMPTS = 3
+DOWNLOAD_RETRY_BACKOFF_S = 5 * 60
+
+URL_LIST_SUFFIX = ".urls"
+URL_LIST_DONE_SUFFIX = ".done"
+RECORD_SUFFIX = "リハーサル記録.tex"
+
+STAGES = ("download", "analyze", "keyframes", "finalize")
+
+ANSI_PATTERN = re.compile(r'\x1b\[[0-9;]*m')
+
+# rehearsal-download が報告する動画ファイル（"[INFO]   Video:      <名前>.mp4 (1.2G)"）
+DOWNLOAD_VIDEO_PATTERN = re.compile(r'\[INFO\]\s+Video:\s+(.+\.mp4)\s+\(')
+
+logger = logging.getLogger("rehearsal_daemon")
+
+
+# ==============================================================================
+# データモデル
+# ==============================================================================
+
+@dataclass
+class StageStats:
+    """ステージごとの件数と処理時間"""
+    started: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    skipped: int = 0
+    busy_seconds: float = 0.0
+    input_bytes: int = 0
+
+    def summary(self, uptime_s: float) -> str:
+        done = self.succeeded + self.failed
+        average_min = self.busy_seconds / done / 60 if done else 0.0
+        hours = max(uptime_s / 3600, 1e-9)
+        return (f"起動 {self.started} / 成功 {self.succeeded} / 失敗 {self.failed} / "
+                f"スキップ {self.skipped} / 平均 {average_min:.1f}分 / "
+                f"{self.succeeded / hours:.2f}件/時 / {self.input_bytes / 1e6 / hours:.1f} MB/時")
+
+
+# ==============================================================================
+# ユーティリティ
+# ==============================================================================
+
+def read_url_list(path: Path) -> List[str]:
+    """URLリスト（1行1URL、# で始まる行はコメント）"""
+    urls = []
+    for line in path.read_text(encoding='utf-8', errors='replace').splitlines():
+        line = line.strip()
+        if line and not line.startswith('#'):
+            urls.append(line.split()[0])
+    return urls
+
+
+def is_new_artifact(journal: RunJournal, state: JournalState, kind: str, path: Path) -> bool:
+    """ジャーナルに記録済みの成果物と異なる（未記録・更新された）ファイルか"""
+    record = state.artifacts.get(kind)
+    if record is None or record['file'] != path.name:
+        return True
+    return journal.verify_artifacts(JournalState(artifacts={kind: record})).get(kind) != 'ok'
+
+
+def rehearsal_prompt(metadata: RehearsalMetadata, base: str, yt: Optional[Path], wp: Path) -> str:
+    """/rehearsal を質問なしで実行するためのプロンプト（前提条件をすべて渡す）"""
+    date = base[:8]
+    if date.isdigit():
+        date_text = f"{date[:4]}年{date[4:6]}月{date[6:]}日"
+    else:
+        date, date_text = time.strftime("%Y%m%d"), metadata.rehearsal_date
+    piece = metadata.piece_name or "曲名"
+    lines = [
+        "/rehearsal",
+        "前提条件の質問は行わず、以下の情報でリハーサル記録を作成して保存してください"
+        "（PDFのコンパイルは不要です）。",
+        f"- YouTube字幕: {yt.name if yt else 'なし（Whisper字幕のみで作成）'}",
+        f"- Whisper字幕: {wp.name}",
+        f"- 日付: {date_text}",
+        f"- 団体名: {metadata.organization}",
+        f"- 指揮者: {metadata.conductor}",
+        f"- 曲目: {metadata.piece_name or '字幕から判断してください'}",
+        f"- 本番日程: {metadata.concert_date or '不明'}",
+        f"- 著者: {metadata.author}",
+        f"- 保存先: {date}_{piece}_{RECORD_SUFFIX}",
+    ]
+    return "\n".join(lines)
+
+
+# ==============================================================================
+# デーモン本体
+# ==============================================================================
+
+class RehearsalDaemon(QObject):
+    """監視フォルダをポーリングしてワークフローのステージを自動起動"""
+
+    def __init__(self, drop_dir: Path, defaults: RehearsalMetadata,
+                 poll_s: int = DEFAULT_POLL_S, stats_interval_s: int = DEFAULT_STATS_INTERVAL_S,
+                 claude_command: str = "claude", skip_precheck: bool = False, parent=None):
+        super().__init__(parent)
+        self.drop_dir = Path(drop_dir).resolve()
+        self.defaults = defaults
+        self.claude_command = claude_command
+        self.skip_precheck = skip_precheck
+
+        self.scheduler = BandwidthScheduler(load_budgets())
+        self.supervisor = ProcessSupervisor(MAX_CONCURRENT_PROCESSES, scheduler=self.scheduler, parent=self)
+        self.supervisor.job_started.connect(self.handle_job_started)
+        self.supervisor.job_output.connect(self.handle_job_output)
+        self.supervisor.job_finished.connect(self.handle_job_finished)
+
+        self.stats: Dict[str, StageStats] = {stage: StageStats() for stage in STAGES}
+        self.started_at = time.monotonic()
+        self.contexts: Dict[str, dict] = {}                   # ジョブ名 -> ジャーナル・入力ファイル
+        self.journals: Dict[str, RunJournal] = {}             # 動画名（拡張子なし） -> ジャーナル
+        self.last_seen: Dict[str, Tuple[int, int]] = {}       # パス -> 前回の (サイズ, 更新時刻)
+        self.given_up: Set[str] = set()                       # 再試行を停止したURLのジャーナル名
+
+        self.poll_timer = QTimer(self)
+        self.poll_timer.timeout.connect(self.poll)
+        self.poll_interval_ms = poll_s * 1000
+        self.stats_timer = QTimer(self)
+        self.stats_timer.timeout.connect(self.log_stats)
+        self.stats_interval_ms = stats_interval_s * 1000
+
+    # --------------------------------------------------------------------------
+    # 起動・終了
+    # --------------------------------------------------------------------------
+
+    def start(self):
+        logger.info(f"監視開始: {self.drop_dir}（{self.poll_interval_ms // 1000}秒ごと）")
+        logger.info(f"既定値: {self.defaults.organization} / {self.defaults.conductor} / "
+                    f"{self.defaults.piece_name or '曲名未設定'} / {self.defaults.author}")
+        if not transfer_measurable():
+            logger.warning("転送量を計測できないため（ss がありません）、帯域の優先度・上限は適用されません")
+        self.recover()
+        self.poll()
+        self.poll_timer.start(self.poll_interval_ms)
+        self.stats_timer.start(self.stats_interval_ms)
+
+    def shutdown(self):
+        """実行中のステージを中断として記録し、プロセスツリーごと終了"""
+        self.poll_timer.stop()
+        self.stats_timer.stop()
+        self.supervisor.job_finished.disconnect()
+        for job in self.supervisor.active_jobs():
+            context = self.contexts.get(job.name)
+            if context and job.state == JobState.RUNNING:
+                context['journal'].record_stage_interrupted(self.stage_of(job), "デーモン終了")
+        self.supervisor.shutdown(3000)
+        self.log_stats()
+        logger.info("監視終了")
+
+    def recover(self):
+        """前回のデーモン・GUIが残した「実行中」のうち、プロセスが存在しないものを中断扱いにする
+
+        帯域スケジューラが一時停止（SIGSTOP）したまま前回のプロセスが終了した
+        場合に備え、記録されているプロセスグループには SIGCONT を送る（PIDと起動時刻が
+        記録と一致する場合のみ。再利用されたPIDの無関係なプロセスには送らない）。
+        """
+        for path in sorted((self.drop_dir / JOURNAL_DIR_NAME).glob("*.journal")):
+            journal = RunJournal(path)
+            for stage, record in journal.replay().running.items():
+                if stage_alive(record):
+                    signal_tree(record['pid'], signal.SIGCONT)
+                else:
+                    journal.record_stage_interrupted(stage, "デーモン起動時に未終了")
+                    logger.warning(f"{path.stem}: 前回の {stage} は終了していません（再実行します）")
+
+    # --------------------------------------------------------------------------
+    # ポーリング
+    # --------------------------------------------------------------------------
+
+    def poll(self):
+        try:
+            self.scan_url_lists()
+            self.scan_subtitles()
+            self.scan_records()
+        except OSError as e:
+            logger.error(f"監視フォルダの走査に失敗しました: {e}")
+
+    def is_stable(self, path: Path) -> bool:
+        """前回のポーリングからサイズ・更新時刻が変わっていなければ書き込み完了とみなす"""
+        st = path.stat()
+        current = (st.st_size, st.st_mtime_ns)
+        previous = self.last_seen.get(str(path))
+        self.last_seen[str(path)] = current
+        return previous == current and st.st_size > 0
+
+    def is_active(self, stage: str, key: str) -> bool:
+        name = f"{stage}:{key}"
+        return any(job.name == name for job in self.supervisor.active_jobs())
+
+    @staticmethod
+    def running_elsewhere(state: JournalState, *stages: str) -> bool:
+        """GUIなど別のプロセスが実行中のステージか"""
+        return any(stage_alive(state.running[s]) for s in stages if s in state.running)
+
+    def journal_for_video(self, base: str) -> RunJournal:
+        """動画（拡張子なしのファイル名）のジャーナル
+
+        ダウンロード時に動画を記録したジャーナル（<動画ID>.journal）があればそれを使い、
+        なければ <動画名>.journal を作る。
+        """
+        if base in self.journals:
+            return self.journals[base]
+        journal_dir = self.drop_dir / JOURNAL_DIR_NAME
+        journal = RunJournal(journal_dir / f"{base}.journal")
+        for path in sorted(journal_dir.glob("*.journal")):
+            video = RunJournal(path).replay().artifacts.get('video')
+            if video and Path(video['file']).stem == base:
+                journal = RunJournal(path)
+                break
+        self.journals[base] = journal
+        return journal
+
+    def scan_url_lists(self):
+        """*.urls: 未ダウンロードのURLを1件ずつダウンロード（同じフォルダで最新の動画を拾うため直列）
+
+        失敗したURLは間隔を空けて DOWNLOAD_MAX_ATTEMPTS 回まで再試行する。
+        再試行を諦めたURLが残るリストは *.done に改名しない。
+        """
+        for list_path in sorted(self.drop_dir.glob("*" + URL_LIST_SUFFIX)):
+            pending = False
+            failed = False
+            for url in read_url_list(list_path):
+                journal = RunJournal.for_rehearsal(self.drop_dir, url)
+                key = journal.path.stem
+                if self.is_active("download", key):
+                    pending = True
+                    continue
+                state = journal.replay()
+                if self.running_elsewhere(state, 'download'):
+                    pending = True
+                    continue
+                if 'download' in state.last_exit:
+                    # 成功、または中断されたが動画は揃っている
+                    exit_code = state.last_exit['download']
+                    if exit_code == 0 or (exit_code is None and 'video' in state.artifacts):
+                        continue
+                    failures = state.failures.get('download', 0)
+                    if failures >= DOWNLOAD_MAX_ATTEMPTS:
+                        failed = True
+                        if key not in self.given_up:
+                            self.given_up.add(key)
+                            logger.error(f"{url}: ダウンロードに{failures}回失敗したため再試行を停止します"
+                                         f"（再試行するには {journal.path.name} を削除）")
+                        continue
+                    if failures:
+                        finished_at = datetime.fromisoformat(state.last_finished['download']).timestamp()
+                        if time.time() - finished_at < DOWNLOAD_RETRY_BACKOFF_S * 2 ** (failures - 1):
+                            pending = True
+                            continue
+                pending = True
+                if not any(job.name.startswith("download:") for job in self.supervisor.active_jobs()):
+                    self.start_download(url, journal)
+
+            if not pending and not failed:
+                done = list_path.with_name(list_path.name + URL_LIST_DONE_SUFFIX)
+                list_path.rename(done)
+                logger.info(f"URLリストを処理しました: {list_path.name} → {done.name}")
+
+    def scan_subtitles(self):
+        """*_wp.srt: 書き込みが完了し、まだ分析していない字幕を分析"""
+        for wp in sorted(self.drop_dir.glob("*_wp.srt")):
+            if not self.is_stable(wp):
+                continue
+            base = wp.name[:-len("_wp.srt")]
+            if self.is_active("analyze", base):
+                continue
+            journal = self.journal_for_video(base)
+            state = journal.replay()
+            if self.running_elsewhere(state, 'analyze'):
+                continue
+            if not is_new_artifact(journal, state, 'wp_srt', wp):
+                continue
+            if state.artifacts.get('tex') or any(self.drop_dir.glob(f"{base[:8]}*{RECORD_SUFFIX}")):
+                # GUIで分析済み（記録ファイルあり）: 字幕だけ記録して再分析しない
+                journal.record_artifact('wp_srt', wp)
+                self.stats['analyze'].skipped += 1
+                continue
+            self.start_analysis(base, wp, journal)
+
+    def scan_records(self):
+        """*リハーサル記録.tex: 書き込みが完了し、まだ仕上げていない記録をPDF化"""
+        for tex in sorted(self.drop_dir.glob("*" + RECORD_SUFFIX)):
+            if not self.is_stable(tex):
+                continue
+            video_name = video_for(tex, 'tex')
+            base = Path(video_name).stem if video_name else tex.stem
+            if any(self.is_active(stage, base) for stage in ("analyze", "keyframes", "finalize")):
+                continue
+            journal = self.journal_for_video(base)
+            state = journal.replay()
+            if self.running_elsewhere(state, 'finalize', 'keyframes'):
+                continue
+            if not is_new_artifact(journal, state, 'tex', tex):
+                continue
+
+            pdf = tex.with_suffix('.pdf')
+            if pdf.exists() and pdf.stat().st_mtime >= tex.stat().st_mtime:
+                # GUIで仕上げ済み
+                journal.record_artifact('tex', tex)
+                self.stats['finalize'].skipped += 1
+                continue
+            video = self.drop_dir / video_name if video_name else None
+            if not self.check_record(base, tex, video, journal):
+                continue
+            if video is not None and video.exists():
+                args = [str(KEYFRAMES_SCRIPT), tex.name, "--video", video.name]
+                self.submit("keyframes", base, sys.executable, args, KEYFRAMES_TIMEOUT_MS, journal,
+                            tex=tex, input_bytes=video.stat().st_size)
+            else:
+                self.start_finalize(base, tex, journal)
+
+    def check_record(self, base: str, tex: Path, video: Optional[Path], journal: RunJournal) -> bool:
+        """リモートコンパイル前のTeX検査（正規化を書き戻してから記録のハッシュを残す）"""
+        report = lint_tex(tex, video if video is not None and video.exists() else None, fix=True)
+        journal.record_artifact('tex', tex)
+        for issue in report.issues:
+            log = {'error': logger.error, 'warn': logger.warning, 'fix': logger.info}[issue.level]
+            log(f"finalize:{base}: {tex.name}:{issue.line}: {issue.message}")
+        journal.append('lint', errors=len(report.errors), warnings=len(report.warnings),
+                       fixes=len(report.fixes))
+        if report.errors:
+            journal.record_step(WorkflowStep.ERROR.name, "TeX検査不合格")
+            self.stats['finalize'].skipped += 1
+            logger.error(f"finalize:{base}: TeX検査でエラーがあるためPDFを生成しません（記録を修正すると再判定）")
+            return False
+        return True
+
+    # --------------------------------------------------------------------------
+    # ステージ起動
+    # --------------------------------------------------------------------------
+
+    def submit(self, stage: str, key: str, program: str, args: List[str],
+               timeout_ms: int, journal: RunJournal, **context):
+        name = f"{stage}:{key}"
+        self.contexts[name] = dict(context, journal=journal, key=key)
+        self.stats[stage].input_bytes += context.get('input_bytes', 0)
+        logger.info(f"{name}: 起動")
+        self.supervisor.submit(name, program, args, timeout_ms=timeout_ms, workdir=str(self.drop_dir))
+
+    def start_download(self, url: str, journal: RunJournal):
+        journal.record_step(WorkflowStep.DOWNLOADING.name, "デーモン")
+        cmd = ["rehearsal-download", url]
+        self.submit("download", journal.path.stem, "zsh", build_zsh_command(cmd),
+                    DOWNLOAD_TIMEOUT_MS, journal, url=url)
+
+    def start_analysis(self, base: str, wp: Path, journal: RunJournal):
+        journal.record_artifact('wp_srt', wp)
+        yt = wp.with_name(base + "_yt.srt")
+        yt = yt if yt.exists() else None
+        video = wp.with_name(base + ".mp4")
+
+        if not self.skip_precheck:
+            report = check_subtitles(wp, yt, video if video.exists() else None)
+            for line in report.summary_lines():
+                logger.info(f"analyze:{base}: {line}")
+            for level, message in report.issues:
+                (logger.error if level == 'fail' else logger.warning)(f"analyze:{base}: {message}")
+            journal.append('precheck', verdict=report.verdict, issues=[m for _, m in report.issues])
+            if report.verdict == 'fail':
+                journal.record_step(WorkflowStep.ERROR.name, "字幕チェック不合格")
+                self.stats['analyze'].skipped += 1
+                logger.error(f"analyze:{base}: 字幕チェック不合格のため分析しません（字幕を差し替えると再判定）")
+                return
+
+        journal.record_step(WorkflowStep.ANALYZING.name, "デーモン")
+        prompt = rehearsal_prompt(self.defaults, base, yt, wp)
+        cmd = [self.claude_command, "-p", prompt, "--permission-mode", "acceptEdits"]
+        self.submit("analyze", base, "zsh", build_zsh_command(cmd), ANALYZE_TIMEOUT_MS, journal,
+                    input_bytes=wp.stat().st_size)
+
+    def start_finalize(self, base: str, tex: Path, journal: RunJournal):
+        journal.record_step(WorkflowStep.FINALIZING.name, "デーモン")
+        cmd = ["rehearsal-finalize", tex.name]
+        self.submit("finalize", base, "zsh", build_zsh_command(cmd), FINALIZE_TIMEOUT_MS, journal,
+                    tex=tex, input_bytes=tex.stat().st_size)
+
+    # --------------------------------------------------------------------------
+    # ジョブのイベント
+    # --------------------------------------------------------------------------
+
+    @staticmethod
+    def stage_of(job: SupervisedJob) -> str:
+        return job.name.split(':', 1)[0]
+
+    def handle_job_started(self, job: SupervisedJob):
+        self.stats[self.stage_of(job)].started += 1
+        context = self.contexts.get(job.name)
+        if context:
+            context['journal'].record_stage_started(self.stage_of(job), job.pid)
+
+    def handle_job_output(self, job: SupervisedJob, output: str):
+        context = self.contexts.get(job.name)
+        for line in output.strip().split('\n'):
+            line = ANSI_PATTERN.sub('', line).strip()
+            if not line:
+                continue
+            match = DOWNLOAD_VIDEO_PATTERN.search(line)
+            if match and context is not None and self.stage_of(job) == "download":
+                context['video'] = match.group(1)
+            if '[ERROR]' in line:
+                logger.error(f"[{job.name}] {line}")
+            elif '[WARN]' in line:
+                logger.warning(f"[{job.name}] {line}")
+            else:
+                logger.info(f"[{job.name}] {line}")
+
+    def handle_job_finished(self, job: SupervisedJob):
+        stage = self.stage_of(job)
+        context = self.contexts.pop(job.name, None)
+        if context is None:
+            return
+        journal: RunJournal = context['journal']
+        journal.record_stage_finished(stage, job.exit_code)
+
+        stats = self.stats[stage]
+        stats.busy_seconds += job.wall_seconds
+        if job.state == JobState.FINISHED:
+            stats.succeeded += 1
+            logger.info(f"{job.name}: 完了 - {job.usage_summary()}")
+        else:
+            stats.failed += 1
+            logger.error(f"{job.name}: {job.state.name} (exit {job.exit_code}) - {job.usage_summary()}")
+
+        if stage == "download":
+            self.finish_download(job, context)
+        elif stage == "analyze":
+            self.finish_analysis(job, context)
+        elif stage == "keyframes":
+            # キーフレームの有無にかかわらずPDFを生成
+            self.start_finalize(context['key'], context['tex'], journal)
+        elif stage == "finalize":
+            self.finish_finalize(job, context)
+
+    def finish_download(self, job: SupervisedJob, context: dict):
+        journal: RunJournal = context['journal']
+        if job.state != JobState.FINISHED:
+            journal.record_step(WorkflowStep.ERROR.name, "ダウンロード失敗")
+            return
+        video = self.downloaded_video(context)
+        if video is None:
+            logger.warning(f"{job.name}: ダウンロードした動画が見つかりません")
+            journal.record_step(WorkflowStep.ERROR.name, "動画なし")
+            return
+        journal.record_artifact('video', video)
+        yt = video.with_name(video.stem + "_yt.srt")
+        if yt.exists():
+            journal.record_artifact('yt_srt', yt)
+        self.journals[video.stem] = journal
+        self.stats['download'].input_bytes += video.stat().st_size
+        journal.record_step(WorkflowStep.WAITING_WHISPER.name, "Whisper処理中")
+        logger.info(f"{job.name}: {video.name} - Whisper字幕を待機します")
+
+    def downloaded_video(self, context: dict) -> Optional[Path]:
+        """このURLの動画ファイル
+
+        rehearsal-download が出力した動画名を優先し、なければ同じ規則（名前に
+        動画IDを含むmp4）で探す。既存の動画はダウンロードし直さず、yt-dlp は
+        更新時刻をアップロード日時にするため、更新時刻では判定できない。
+        """
+        reported = context.get('video')
+        if reported and (self.drop_dir / reported).exists():
+            return self.drop_dir / reported
+        videos = [p for p in self.drop_dir.glob("*.mp4") if context['key'] in p.name]
+        return max(videos, key=lambda p: p.stat().st_mtime) if videos else None
+
+    def finish_analysis(self, job: SupervisedJob, context: dict):
+        journal: RunJournal = context['journal']
+        if job.state != JobState.FINISHED:
+            journal.record_step(WorkflowStep.ERROR.name, "分析失敗")
+            return
+        base = context['key']
+        if not any(self.drop_dir.glob(f"{base[:8]}*{RECORD_SUFFIX}")):
+            logger.warning(f"{job.name}: リハーサル記録（*{RECORD_SUFFIX}）が作成されていません")
+            journal.record_step(WorkflowStep.ERROR.name, "記録ファイルなし")
+
+    def finish_finalize(self, job: SupervisedJob, context: dict):
+        journal: RunJournal = context['journal']
+        tex: Path = context['tex']
+        if job.state != JobState.FINISHED:
+            journal.record_step(WorkflowStep.ERROR.name, "PDF生成失敗")
+            return
+        outputs = [('pdf', tex.with_suffix('.pdf')),
+                   ('youtube_ch', tex.with_name(tex.stem + "_youtube.txt")),
+                   ('mv_ch', tex.with_name(tex.stem + "_movieviewer.txt"))]
+        for kind, path in outputs:
+            if path.exists():
+                journal.record_artifact(kind, path)
+        journal.record_step(WorkflowStep.COMPLETED.name, "デーモン")
+        logger.info(f"{job.name}: ✅ ワークフロー完了: {tex.with_suffix('.pdf').name}")
+
+    # --------------------------------------------------------------------------
+    # 統計
+    # --------------------------------------------------------------------------
+
+    def log_stats(self):
+        uptime = time.monotonic() - self.started_at
+        active = ", ".join(job.name for job in self.supervisor.active_jobs()) or "なし"
+        logger.info(f"[統計] 稼働 {uptime / 3600:.1f}時間 / 実行中: {active}")
+        for stage in STAGES:
+            logger.info(f"[統計] {stage}: {self.stats[stage].summary(uptime)}")
+        for metrics in self.scheduler.metrics():
+            logger.info(f"[統計] 帯域 {metrics.summary()}（一時停止 {metrics.paused_seconds:.0f} s）")
+
+
+# ==============================================================================
+# エントリーポイント
+# ==============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="監視フォルダによる無人ワークフロー処理")
+    parser.add_argument("--drop", required=True, help="監視フォルダ（作業ディレクトリを兼ねる）")
+    parser.add_argument("--poll", type=int, default=DEFAULT_POLL_S, help="ポーリング間隔（秒）")
+    parser.add_argument("--stats-interval", type=int, default=DEFAULT_STATS_INTERVAL_S,
+                        help="統計のログ出力間隔（秒）")
+    parser.add_argument("--log-file", help="ログファイル（既定: 標準エラーのみ）")
+    parser.add_argument("--claude", default="claude", help="Claude Codeのコマンド")
+    parser.add_argument("--skip-precheck", action="store_true", help="分析前の字幕チェックを行わない")
+    args = parser.parse_args()
+
+    handlers: List[logging.Handler] = [logging.StreamHandler()]
+    if args.log_file:
+        handlers.append(logging.FileHandler(args.log_file, encoding='utf-8'))
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s",
+                        handlers=handlers)
+
+    drop_dir = Path(args.drop).expanduser()
+    if not drop_dir.is_dir():
+        logger.error(f"監視フォルダが見つかりません: {drop_dir}")
+        sys.exit(1)
+
+    app = QCoreApplication(sys.argv)
+    daemon = RehearsalDaemon(drop_dir, load_settings() or RehearsalMetadata(),
+                             poll_s=args.poll, stats_interval_s=args.stats_interval,
+                             claude_command=args.claude, skip_precheck=args.skip_precheck)
+
+    # SIGINT/SIGTERMで終了（Qtのイベントループ中もPythonのハンドラが動くよう定期的に制御を戻す）
+    signal.signal(signal.SIGINT, lambda *_: app.quit())
+    signal.signal(signal.SIGTERM, lambda *_: app.quit())
+    wakeup = QTimer()
+    wakeup.timeout.connect(lambda: None)
+    wakeup.start(500)
+
+    daemon.start()
+    code = app.exec()
+    daemon.shutdown()
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
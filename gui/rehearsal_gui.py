@@ -25,130 +25,36 @@ YouTube動画URLから最終PDF・チャプター生成までの3ステップを
 import sys
 import os
 import subprocess
-import yaml
+import time
+import signal
 from pathlib import Path
-from dataclasses import dataclass, field, asdict
 from typing import Optional, List
 from datetime import datetime
-from enum import Enum
 
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QLineEdit, QPushButton, QTextEdit, QGroupBox, QFileDialog,
     QComboBox, QCheckBox, QProgressBar, QTabWidget, QScrollArea,
-    QMessageBox, QSplitter
+    QMessageBox, QSplitter, QListWidget, QListWidgetItem, QInputDialog
 )
-from PySide6.QtCore import Qt, QProcess, QTimer, Signal, Slot
-from PySide6.QtGui import QFont, QColor, QPalette
-
-
-# ==============================================================================
-# 定数
-# ==============================================================================
-
-# 設定ファイルのパス（ホームディレクトリ）
-CONFIG_FILE = Path.home() / ".config" / "rehearsal-workflow" / "settings.yaml"
-
-
-# ==============================================================================
-# データモデル
-# ==============================================================================
-
-class WorkflowStep(Enum):
-    """ワークフロー進行状況"""
-    IDLE = 0
-    DOWNLOADING = 1
-    WAITING_WHISPER = 2
-    ANALYZING = 3
-    FINALIZING = 4
-    COMPLETED = 5
-    ERROR = -1
-
-
-@dataclass
-class RehearsalMetadata:
-    """リハーサル記録メタデータ"""
-    # 必須情報
-    youtube_url: str = ""
-    rehearsal_date: str = ""  # YYYY-MM-DD
-    organization: str = "創価大学 新世紀管弦楽団"
-    conductor: str = "阪本正彦先生"
-    piece_name: str = ""
-    concert_date: str = ""  # YYYY-MM-DD
-    author: str = "ホルン奏者有志"
-
-    # ファイル情報（自動検出）
-    video_file: str = ""
-    yt_srt_file: str = ""
-    wp_srt_file: str = ""
-    tex_file: str = ""
-    pdf_file: str = ""
-    youtube_chapters: str = ""
-    movieviewer_chapters: str = ""
-
-    # ワークフロー状態
-    step: WorkflowStep = WorkflowStep.IDLE
-    step_message: str = ""
-
-    # Whisper設定
-    use_demucs: bool = True  # 音源分離（音楽が大きい場合）
-
-    # 生成時刻（JST）
-    generation_date: str = field(default_factory=lambda: datetime.now().strftime("%Y-%m-%d"))
-    generation_time: str = field(default_factory=lambda: datetime.now().strftime("%H:%M"))
-
-    def to_dict(self):
-        """設定保存用の辞書に変換（保存不要なフィールドを除外）"""
-        data = asdict(self)
-        # ファイル情報とワークフロー状態は保存しない
-        exclude_keys = [
-            'video_file', 'yt_srt_file', 'wp_srt_file',
-            'tex_file', 'pdf_file', 'youtube_chapters', 'movieviewer_chapters',
-            'step', 'step_message', 'generation_date', 'generation_time'
-        ]
-        for key in exclude_keys:
-            data.pop(key, None)
-        return data
-
-    @classmethod
-    def from_dict(cls, data: dict):
-        """辞書から復元"""
-        # stepはEnumなので特別に処理
-        if 'step' in data and isinstance(data['step'], int):
-            data['step'] = WorkflowStep(data['step'])
-        # 存在しないキーは無視
-        valid_keys = {f.name for f in cls.__dataclass_fields__.values()}
-        filtered_data = {k: v for k, v in data.items() if k in valid_keys}
-        return cls(**filtered_data)
-
-
-# ==============================================================================
-# 設定管理
-# ==============================================================================
-
-def save_settings(metadata: RehearsalMetadata):
-    """設定をYAMLファイルに保存"""
-    try:
-        CONFIG_FILE.parent.mkdir(parents=True, exist_ok=True)
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-            yaml.dump(metadata.to_dict(), f, allow_unicode=True, default_flow_style=False)
-        return True
-    except Exception as e:
-        print(f"Error saving settings: {e}")
-        return False
-
-
-def load_settings() -> Optional[RehearsalMetadata]:
-    """設定をYAMLファイルから読み込み"""
-    try:
-        if CONFIG_FILE.exists():
-            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-                data = yaml.safe_load(f)
-                if data:
-                    return RehearsalMetadata.from_dict(data)
-    except Exception as e:
-        print(f"Error loading settings: {e}")
-    return None
+from PySide6.QtCore import Qt, QTimer, Signal, Slot
+from PySide6.QtGui import QFont, QColor, QPalette, QIcon, QPixmap
+
+from rehearsal_core import (
+    CONFIG_FILE, ARTIFACT_FIELDS, MAX_CONCURRENT_PROCESSES, DOWNLOAD_TIMEOUT_MS,
+    FINALIZE_TIMEOUT_MS, KEYFRAMES_TIMEOUT_MS, KEYFRAMES_SCRIPT, STORE_TIMEOUT_MS, WORKSPACE_SCRIPT,
+    PRECHECK_HOLD_MESSAGE, WHISPER_LAUNCH_MARKERS,
+    WorkflowStep, RehearsalMetadata, save_settings, load_settings, build_zsh_command,
+    project_settings_file, load_project_settings
+)
+from run_journal import RunJournal, stage_alive
+from process_supervisor import ProcessSupervisor, SupervisedJob, JobState, signal_tree
+from bandwidth import BandwidthScheduler, StageMetrics, load_budgets, rate_budgets, transfer_measurable
+from transcript_index import TranscriptIndex, SearchHit
+from subtitle_check import PrecheckReport, check_subtitles
+from tex_lint import lint_tex
+from keyframes import DEFAULT_WIDTH, chapter_sections, cached_keyframes
+from workspace import Workspace, load_workspace_settings, save_workspace_settings
 
 
 # ==============================================================================
@@ -198,15 +104,36 @@ class LogViewer(QTextEdit):
 class MetadataInputWidget(QWidget):
     """リハーサル基本情報入力ウィジェット"""
 
-    def __init__(self, metadata: RehearsalMetadata, parent=None):
+    def __init__(self, metadata: RehearsalMetadata, settings_file: Path = CONFIG_FILE, parent=None):
         super().__init__(parent)
         self.metadata = metadata
+        self.settings_file = settings_file  # プロジェクト使用時は <プロジェクト>/.rehearsal/project.yaml
         self.init_ui()
 
     def update_and_save(self, field: str, value):
         """フィールドを更新して自動保存"""
         setattr(self.metadata, field, value)
-        save_settings(self.metadata)
+        save_settings(self.metadata, self.settings_file)
+
+    def load_metadata(self, loaded_metadata: RehearsalMetadata, settings_file: Path):
+        """別の設定ファイル（プロジェクト）のメタデータに切り替えて表示を更新"""
+        self.settings_file = settings_file
+        self.config_label.setText(f"設定ファイル: {settings_file}")
+        # 先にまとめて反映する（入力欄の更新ごとの自動保存で古い値が混ざらない）
+        for key, value in loaded_metadata.to_dict().items():
+            setattr(self.metadata, key, value)
+        self.show_metadata(loaded_metadata)
+
+    def show_metadata(self, loaded_metadata: RehearsalMetadata):
+        """入力欄にメタデータを表示"""
+        self.url_input.setText(loaded_metadata.youtube_url)
+        self.date_input.setText(loaded_metadata.rehearsal_date)
+        self.org_input.setText(loaded_metadata.organization)
+        self.conductor_input.setText(loaded_metadata.conductor)
+        self.piece_input.setText(loaded_metadata.piece_name)
+        self.concert_input.setText(loaded_metadata.concert_date)
+        self.author_input.setText(loaded_metadata.author)
+        self.demucs_checkbox.setChecked(loaded_metadata.use_demucs)
 
     def init_ui(self):
         layout = QVBoxLayout(self)
@@ -337,35 +264,28 @@ class MetadataInputWidget(QWidget):
         layout.addLayout(button_layout)
 
         # 設定ファイルパス表示
-        config_label = QLabel(f"設定ファイル: {CONFIG_FILE}")
-        config_label.setFont(QFont("Arial", 12))
-        config_label.setStyleSheet("QLabel { color: #888; }")
-        layout.addWidget(config_label)
+        self.config_label = QLabel(f"設定ファイル: {self.settings_file}")
+        self.config_label.setFont(QFont("Arial", 12))
+        self.config_label.setStyleSheet("QLabel { color: #888; }")
+        layout.addWidget(self.config_label)
 
         layout.addStretch()
 
     def save_settings_manually(self):
         """手動で設定を保存"""
-        if save_settings(self.metadata):
-            QMessageBox.information(self, "保存完了", f"設定を保存しました。\n\n{CONFIG_FILE}")
+        if save_settings(self.metadata, self.settings_file):
+            QMessageBox.information(self, "保存完了", f"設定を保存しました。\n\n{self.settings_file}")
         else:
             QMessageBox.warning(self, "保存失敗", "設定の保存に失敗しました。")
 
     def load_settings_manually(self):
         """手動で設定を読み込み"""
-        loaded_metadata = load_settings()
+        loaded_metadata = load_settings(self.settings_file)
         if loaded_metadata:
             # 各フィールドを更新
-            self.url_input.setText(loaded_metadata.youtube_url)
-            self.date_input.setText(loaded_metadata.rehearsal_date)
-            self.org_input.setText(loaded_metadata.organization)
-            self.conductor_input.setText(loaded_metadata.conductor)
-            self.piece_input.setText(loaded_metadata.piece_name)
-            self.concert_input.setText(loaded_metadata.concert_date)
-            self.author_input.setText(loaded_metadata.author)
-            self.demucs_checkbox.setChecked(loaded_metadata.use_demucs)
-
-            QMessageBox.information(self, "読み込み完了", f"設定を読み込みました。\n\n{CONFIG_FILE}")
+            self.show_metadata(loaded_metadata)
+
+            QMessageBox.information(self, "読み込み完了", f"設定を読み込みました。\n\n{self.settings_file}")
         else:
             QMessageBox.warning(self, "読み込み失敗", "設定ファイルが見つかりませんでした。")
 
@@ -377,6 +297,8 @@ class WorkflowControlWidget(QWidget):
     step1_clicked = Signal()
     step2_clicked = Signal()
     step3_clicked = Signal()
+    cancel_clicked = Signal()
+    precheck_clicked = Signal()
 
     def __init__(self, metadata: RehearsalMetadata, parent=None):
         super().__init__(parent)
@@ -422,6 +344,18 @@ class WorkflowControlWidget(QWidget):
         step2_info.setStyleSheet("QLabel { color: #dcdcaa; font-size: 18pt; }")
         step2_layout.addWidget(step2_info)
 
+        self.precheck_button = QPushButton("🔍 Whisper字幕の品質チェック")
+        self.precheck_button.setStyleSheet("QPushButton { font-size: 16pt; padding: 6px; }")
+        self.precheck_button.clicked.connect(self.precheck_clicked.emit)
+        self.precheck_button.setEnabled(False)
+        step2_layout.addWidget(self.precheck_button)
+
+        self.precheck_status = QLabel("")
+        self.precheck_status.setFont(font)
+        self.precheck_status.setWordWrap(True)
+        self.precheck_status.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        step2_layout.addWidget(self.precheck_status)
+
         self.step2_button = QPushButton("✅ ステップ2完了（LaTeXファイル選択）")
         self.step2_button.setStyleSheet("QPushButton { font-size: 18pt; padding: 10px; }")
         self.step2_button.clicked.connect(self.step2_clicked.emit)
@@ -462,6 +396,20 @@ class WorkflowControlWidget(QWidget):
         self.progress_bar.setValue(0)
         layout.addWidget(self.progress_bar)
 
+        # 回線を使うステージの転送速度（帯域スケジューラの計測値）
+        self.bandwidth_status = QLabel("")
+        self.bandwidth_status.setFont(font)
+        self.bandwidth_status.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.bandwidth_status.setStyleSheet("QLabel { color: #888; }")
+        layout.addWidget(self.bandwidth_status)
+
+        # 実行中の処理の中止
+        self.cancel_button = QPushButton("⏹ 実行中の処理を中止")
+        self.cancel_button.setStyleSheet("QPushButton { font-size: 18pt; padding: 10px; }")
+        self.cancel_button.clicked.connect(self.cancel_clicked.emit)
+        self.cancel_button.setEnabled(False)
+        layout.addWidget(self.cancel_button)
+
         layout.addStretch()
 
     def update_step1_status(self, status: str, enable_step2: bool = False):
@@ -470,8 +418,15 @@ class WorkflowControlWidget(QWidget):
         self.progress_bar.setValue(1)
         if enable_step2:
             self.step2_button.setEnabled(True)
+            self.precheck_button.setEnabled(True)
             self.step2_status.setText("準備完了（Claude Codeを起動してください）")
 
+    def hold_step2(self, status: str):
+        """Step 2を準備未完了のまま保留（字幕チェックの再実行は可能）"""
+        self.step2_button.setEnabled(False)
+        self.precheck_button.setEnabled(True)
+        self.step2_status.setText(status)
+
     def update_step2_status(self, status: str, enable_step3: bool = False):
         """Step 2ステータス更新"""
         self.step2_status.setText(status)
@@ -480,19 +435,85 @@ class WorkflowControlWidget(QWidget):
             self.step3_button.setEnabled(True)
             self.step3_status.setText("準備完了")
 
+    def update_precheck_status(self, report: PrecheckReport):
+        """字幕チェック結果の表示更新"""
+        labels = {'ok': ("✅ 字幕チェック: 問題なし", "#4ec9b0"),
+                  'warn': ("⚠️ 字幕チェック: 注意あり", "#dcdcaa"),
+                  'fail': ("❌ 字幕チェック: 分析に不適", "#f48771")}
+        text, color = labels[report.verdict]
+        details = [message for _, message in report.issues]
+        self.precheck_status.setText("\n".join([text] + details))
+        self.precheck_status.setStyleSheet(f"QLabel {{ color: {color}; }}")
+
+    def update_bandwidth(self, metrics: List[StageMetrics]):
+        """ステージごとの転送速度の表示更新（実行中のステージのみ）"""
+        active = [m.summary() for m in metrics if m.flows]
+        self.bandwidth_status.setText("📶 " + " / ".join(active) if active else "")
+
     def update_step3_status(self, status: str, completed: bool = False):
         """Step 3ステータス更新"""
         self.step3_status.setText(status)
         if completed:
             self.progress_bar.setValue(3)
 
+    def reset(self):
+        """初期状態（Step 1待ち）に戻す（プロジェクト切り替え時）"""
+        self.step1_button.setEnabled(True)
+        self.step1_status.setText("待機中")
+        self.precheck_button.setEnabled(False)
+        self.precheck_status.setText("")
+        self.step2_button.setEnabled(False)
+        self.step2_status.setText("待機中（Step 1完了後）")
+        self.step3_button.setEnabled(False)
+        self.step3_status.setText("待機中（Step 2完了後）")
+        self.progress_bar.setValue(0)
+
+    def restore_state(self, step: WorkflowStep, tex_ready: bool):
+        """ジャーナルから復元した状態をボタン・ステータスに反映"""
+        if step == WorkflowStep.DOWNLOADING:
+            self.step1_button.setEnabled(False)
+            self.step1_status.setText("実行中（前回セッションから継続）")
+        elif step == WorkflowStep.WAITING_WHISPER:
+            self.step1_button.setEnabled(False)
+            self.update_step1_status("完了（Whisper処理中...）", enable_step2=True)
+        elif step == WorkflowStep.ANALYZING:
+            self.step1_button.setEnabled(False)
+            self.update_step1_status("完了", enable_step2=True)
+            if tex_ready:
+                self.update_step2_status("完了", enable_step3=True)
+        elif step == WorkflowStep.FINALIZING:
+            self.step1_button.setEnabled(False)
+            self.update_step1_status("完了")
+            self.update_step2_status("完了")
+            self.step3_status.setText("実行中（前回セッションから継続）")
+        elif step == WorkflowStep.COMPLETED:
+            self.step1_button.setEnabled(False)
+            self.update_step1_status("完了")
+            self.update_step2_status("完了", enable_step3=True)
+            self.update_step3_status("完了", completed=True)
+        elif step == WorkflowStep.ERROR:
+            # 揃っている成果物から再開可能な最も後のステップを有効化
+            if tex_ready:
+                self.update_step1_status("完了", enable_step2=True)
+                self.update_step2_status("完了", enable_step3=True)
+                self.step3_status.setText("中断（再実行してください）")
+            else:
+                # Step 1の中断・失敗（Whisper未起動の可能性）: 再実行できるようにする
+                self.step1_button.setEnabled(True)
+                self.step1_status.setText("中断（再実行してください）")
+
 
 class FileMonitorWidget(QWidget):
     """生成ファイルモニタリングウィジェット"""
 
-    def __init__(self, metadata: RehearsalMetadata, parent=None):
+    # シグナル（成果物の種類, ファイル名）: 新規検出・更新時のみ発行
+    file_detected = Signal(str, str)
+
+    def __init__(self, metadata: RehearsalMetadata, workdir: Path, parent=None):
         super().__init__(parent)
         self.metadata = metadata
+        self.workdir = workdir  # 監視する作業ディレクトリ（プロジェクト）
+        self.seen_mtimes = {}  # 成果物の種類 -> 最後に通知したmtime_ns
         self.init_ui()
 
         # 定期的にファイル存在チェック
@@ -512,15 +533,16 @@ class FileMonitorWidget(QWidget):
         file_layout = QVBoxLayout()
 
         # ファイル一覧
-        self.file_labels = {
-            'video': QLabel("❌ 動画ファイル: 未検出"),
-            'yt_srt': QLabel("❌ YouTube字幕: 未検出"),
-            'wp_srt': QLabel("❌ Whisper字幕: 未検出"),
-            'tex': QLabel("❌ LaTeXファイル: 未検出"),
-            'pdf': QLabel("❌ PDFファイル: 未検出"),
-            'youtube_ch': QLabel("❌ YouTubeチャプター: 未検出"),
-            'mv_ch': QLabel("❌ Movie Viewerチャプター: 未検出"),
+        self.captions = {
+            'video': "動画ファイル",
+            'yt_srt': "YouTube字幕",
+            'wp_srt': "Whisper字幕",
+            'tex': "LaTeXファイル",
+            'pdf': "PDFファイル",
+            'youtube_ch': "YouTubeチャプター",
+            'mv_ch': "Movie Viewerチャプター",
         }
+        self.file_labels = {kind: QLabel(f"❌ {caption}: 未検出") for kind, caption in self.captions.items()}
 
         for label in self.file_labels.values():
             label.setFont(font)
@@ -530,58 +552,283 @@ class FileMonitorWidget(QWidget):
         group.setLayout(file_layout)
         layout.addWidget(group)
 
+    def mark_detected(self, kind: str, path: Path, caption: str):
+        """検出したファイルをメタデータとラベルに反映し、変化があれば通知"""
+        setattr(self.metadata, ARTIFACT_FIELDS[kind], str(path.name))
+        self.file_labels[kind].setText(f"✅ {caption}: {path.name}")
+
+        mtime_ns = path.stat().st_mtime_ns
+        if self.seen_mtimes.get(kind) != mtime_ns:
+            self.seen_mtimes[kind] = mtime_ns
+            self.file_detected.emit(kind, str(path.name))
+
+    def set_workdir(self, workdir: Path):
+        """監視する作業ディレクトリを切り替え、表示を未検出に戻す"""
+        self.workdir = workdir
+        self.seen_mtimes.clear()
+        for kind, caption in self.captions.items():
+            self.file_labels[kind].setText(f"❌ {caption}: 未検出")
+
     def check_files(self):
         """ファイル存在チェック"""
-        cwd = Path.cwd()
+        cwd = self.workdir
 
-        # 動画ファイル（最新のmp4）
+        # 動画ファイル（最新のmp4、またはジャーナルから復元済みのもの）
         video_files = sorted(cwd.glob("*.mp4"), key=lambda p: p.stat().st_mtime, reverse=True)
         if video_files and not self.metadata.video_file:
             self.metadata.video_file = str(video_files[0].name)
-            self.file_labels['video'].setText(f"✅ 動画ファイル: {video_files[0].name}")
+        if self.metadata.video_file and (cwd / self.metadata.video_file).exists():
+            self.mark_detected('video', cwd / self.metadata.video_file, "動画ファイル")
 
         # YouTube字幕
         if self.metadata.video_file:
             basename = Path(self.metadata.video_file).stem
             yt_srt = cwd / f"{basename}_yt.srt"
             if yt_srt.exists():
-                self.metadata.yt_srt_file = str(yt_srt.name)
-                self.file_labels['yt_srt'].setText(f"✅ YouTube字幕: {yt_srt.name}")
+                self.mark_detected('yt_srt', yt_srt, "YouTube字幕")
 
         # Whisper字幕
         if self.metadata.video_file:
             basename = Path(self.metadata.video_file).stem
             wp_srt = cwd / f"{basename}_wp.srt"
             if wp_srt.exists():
-                self.metadata.wp_srt_file = str(wp_srt.name)
-                self.file_labels['wp_srt'].setText(f"✅ Whisper字幕: {wp_srt.name}")
+                self.mark_detected('wp_srt', wp_srt, "Whisper字幕")
 
         # LaTeXファイル
         tex_files = sorted(cwd.glob("*リハーサル記録.tex"), key=lambda p: p.stat().st_mtime, reverse=True)
         if tex_files:
-            self.metadata.tex_file = str(tex_files[0].name)
-            self.file_labels['tex'].setText(f"✅ LaTeXファイル: {tex_files[0].name}")
+            self.mark_detected('tex', tex_files[0], "LaTeXファイル")
 
         # PDFファイル
         if self.metadata.tex_file:
             pdf_file = cwd / self.metadata.tex_file.replace('.tex', '.pdf')
             if pdf_file.exists():
-                self.metadata.pdf_file = str(pdf_file.name)
-                self.file_labels['pdf'].setText(f"✅ PDFファイル: {pdf_file.name}")
+                self.mark_detected('pdf', pdf_file, "PDFファイル")
 
         # YouTubeチャプター
         if self.metadata.tex_file:
             youtube_ch = cwd / self.metadata.tex_file.replace('.tex', '_youtube.txt')
             if youtube_ch.exists():
-                self.metadata.youtube_chapters = str(youtube_ch.name)
-                self.file_labels['youtube_ch'].setText(f"✅ YouTubeチャプター: {youtube_ch.name}")
+                self.mark_detected('youtube_ch', youtube_ch, "YouTubeチャプター")
 
         # Movie Viewerチャプター
         if self.metadata.tex_file:
             mv_ch = cwd / self.metadata.tex_file.replace('.tex', '_movieviewer.txt')
             if mv_ch.exists():
-                self.metadata.movieviewer_chapters = str(mv_ch.name)
-                self.file_labels['mv_ch'].setText(f"✅ Movie Viewerチャプター: {mv_ch.name}")
+                self.mark_detected('mv_ch', mv_ch, "Movie Viewerチャプター")
+
+
+class TranscriptSearchWidget(QWidget):
+    """過去のリハーサル字幕・記録の全文検索ウィジェット"""
+
+    def __init__(self, root: Path, parent=None):
+        super().__init__(parent)
+        self.root = root  # 既定の検索対象フォルダ
+        self.index: Optional[TranscriptIndex] = None
+        self.indexed_root = ""  # 今回のセッションで索引を更新したフォルダ
+        self.init_ui()
+
+        # 入力が止まってから検索（キー入力ごとの再検索を避ける）
+        self.search_timer = QTimer()
+        self.search_timer.setSingleShot(True)
+        self.search_timer.timeout.connect(self.run_search)
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+
+        # フォント設定
+        font = QFont()
+        font.setPointSize(18)
+
+        # 検索対象フォルダ
+        root_group = QGroupBox("検索対象フォルダ（サブフォルダを含む）")
+        root_group.setFont(font)
+        root_layout = QHBoxLayout()
+        self.root_input = QLineEdit(str(self.root))
+        self.root_input.setFont(font)
+        root_layout.addWidget(self.root_input)
+        browse_button = QPushButton("参照")
+        browse_button.setFont(font)
+        browse_button.clicked.connect(self.browse_root)
+        root_layout.addWidget(browse_button)
+        reindex_button = QPushButton("🔄 索引更新")
+        reindex_button.setFont(font)
+        reindex_button.clicked.connect(lambda: self.update_index(force=True))
+        root_layout.addWidget(reindex_button)
+        root_group.setLayout(root_layout)
+        layout.addWidget(root_group)
+
+        # 検索語
+        self.query_input = QLineEdit()
+        self.query_input.setFont(font)
+        self.query_input.setPlaceholderText("検索語（例: ホルン 音程）")
+        self.query_input.textChanged.connect(lambda: self.search_timer.start(200))
+        layout.addWidget(self.query_input)
+
+        self.status_label = QLabel("字幕（*_yt.srt, *_wp.srt）とリハーサル記録（*.tex）を検索します")
+        self.status_label.setFont(QFont("Arial", 12))
+        self.status_label.setStyleSheet("QLabel { color: #888; }")
+        layout.addWidget(self.status_label)
+
+        # 検索結果（ダブルクリックでタイムスタンプをコピー）
+        self.result_list = QListWidget()
+        self.result_list.setFont(font)
+        self.result_list.setWordWrap(True)
+        self.result_list.itemDoubleClicked.connect(self.copy_timestamp)
+        layout.addWidget(self.result_list)
+
+    def browse_root(self):
+        directory = QFileDialog.getExistingDirectory(self, "検索対象フォルダを選択", self.root_input.text())
+        if directory:
+            self.root_input.setText(directory)
+            self.update_index(force=True)
+
+    def update_index(self, force: bool = False):
+        """検索対象フォルダの索引を差分更新"""
+        root = self.root_input.text().strip()
+        if not root or not Path(root).is_dir():
+            self.status_label.setText("検索対象フォルダが見つかりません")
+            return
+        if not force and root == self.indexed_root:
+            return
+        if self.index is None:
+            self.index = TranscriptIndex()
+
+        started = time.perf_counter()
+        stats = self.index.update([Path(root)])
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.indexed_root = root
+        self.status_label.setText(f"索引更新: {stats.summary()} - {elapsed_ms:.0f} ms")
+
+    def run_search(self):
+        query = self.query_input.text().strip()
+        self.result_list.clear()
+        if not query:
+            return
+        self.update_index()
+        if self.index is None:
+            return
+
+        started = time.perf_counter()
+        hits = self.index.search(query)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        kind_labels = {'yt_srt': "YouTube字幕", 'wp_srt': "Whisper字幕", 'tex': "記録"}
+        for hit in hits:
+            source = hit.video or Path(hit.path).name
+            heading = f" [{hit.label}]" if hit.label else ""
+            item = QListWidgetItem(
+                f"{hit.timestamp}  {source}（{kind_labels.get(hit.kind, hit.kind)}）{heading}\n    {hit.text}"
+            )
+            item.setData(Qt.ItemDataRole.UserRole, hit)
+            self.result_list.addItem(item)
+        self.status_label.setText(f"{len(hits)}件（{elapsed_ms:.1f} ms）")
+
+    def copy_timestamp(self, item: QListWidgetItem):
+        """ダブルクリックした結果のタイムスタンプと動画名をクリップボードへ"""
+        hit: SearchHit = item.data(Qt.ItemDataRole.UserRole)
+        QApplication.clipboard().setText(f"{hit.timestamp} {hit.video}")
+        self.status_label.setText(f"コピーしました: {hit.timestamp} {hit.video}")
+
+
+class KeyframeStripWidget(QWidget):
+    """チャプターごとのキーフレーム一覧ウィジェット"""
+
+    # シグナル
+    generate_clicked = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+
+        self.generate_button = QPushButton("🖼 キーフレーム生成")
+        self.generate_button.setStyleSheet("QPushButton { font-size: 18pt; padding: 10px; }")
+        self.generate_button.clicked.connect(self.generate_clicked.emit)
+        layout.addWidget(self.generate_button)
+
+        self.status_label = QLabel("LaTeXファイル選択後、各チャプターのキーフレームを表示します")
+        self.status_label.setFont(QFont("Arial", 12))
+        self.status_label.setStyleSheet("QLabel { color: #888; }")
+        layout.addWidget(self.status_label)
+
+        # サムネイル一覧
+        self.frame_list = QListWidget()
+        self.frame_list.setViewMode(QListWidget.ViewMode.IconMode)
+        self.frame_list.setResizeMode(QListWidget.ResizeMode.Adjust)
+        self.frame_list.setIconSize(QPixmap(DEFAULT_WIDTH, DEFAULT_WIDTH * 9 // 16).size())
+        self.frame_list.setWordWrap(True)
+        self.frame_list.setSpacing(8)
+        layout.addWidget(self.frame_list)
+
+    def load(self, tex: Path, video: Path):
+        """キャッシュ済みのキーフレームを表示（ffmpegは起動しない）"""
+        self.frame_list.clear()
+        if not tex.exists() or not video.exists():
+            self.status_label.setText("LaTeXファイルまたは動画が見つかりません")
+            return
+        sections = chapter_sections(tex)
+        keyframes = cached_keyframes(video, sections)
+        for frame in keyframes:
+            item = QListWidgetItem(QIcon(QPixmap(str(frame.path))), frame.caption)
+            item.setToolTip(frame.caption)
+            self.frame_list.addItem(item)
+        self.status_label.setText(f"{len(keyframes)}/{len(sections)}チャプター（{video.name}）")
+
+
+class ProjectSelectorWidget(QWidget):
+    """ワークスペースのプロジェクト選択ウィジェット"""
+
+    # シグナル
+    project_selected = Signal(str)
+    new_clicked = Signal()
+    browse_clicked = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        font = QFont()
+        font.setPointSize(16)
+
+        label = QLabel("プロジェクト:")
+        label.setFont(font)
+        layout.addWidget(label)
+
+        self.project_combo = QComboBox()
+        self.project_combo.setFont(font)
+        self.project_combo.setMinimumWidth(240)
+        self.project_combo.activated.connect(
+            lambda index: self.project_selected.emit(self.project_combo.itemText(index)))
+        layout.addWidget(self.project_combo, 1)
+
+        self.new_button = QPushButton("➕ 新規")
+        self.new_button.setFont(font)
+        self.new_button.clicked.connect(self.new_clicked.emit)
+        layout.addWidget(self.new_button)
+
+        browse_button = QPushButton("📂 ワークスペース...")
+        browse_button.setFont(font)
+        browse_button.clicked.connect(self.browse_clicked.emit)
+        layout.addWidget(browse_button)
+
+    def set_projects(self, projects: List[str], current: str, has_workspace: bool):
+        """プロジェクト一覧を更新（ワークスペース未設定時はカレントディレクトリで作業）"""
+        self.project_combo.blockSignals(True)
+        self.project_combo.clear()
+        self.project_combo.addItems(projects)
+        self.project_combo.setCurrentIndex(projects.index(current) if current in projects else -1)
+        self.project_combo.setPlaceholderText(
+            "（プロジェクトを選択）" if has_workspace else "（ワークスペース未設定: カレントディレクトリ）")
+        self.project_combo.setEnabled(has_workspace)
+        self.new_button.setEnabled(has_workspace)
+        self.project_combo.blockSignals(False)
 
 
 # ==============================================================================
@@ -594,17 +841,45 @@ class RehearsalWorkflowGUI(QMainWindow):
     def __init__(self):
         super().__init__()
 
-        # 設定を読み込み（存在すれば）
-        loaded_metadata = load_settings()
-        if loaded_metadata:
-            self.metadata = loaded_metadata
-            print(f"Settings loaded from: {CONFIG_FILE}")
+        # ワークスペース（未設定ならカレントディレクトリで作業）
+        self.workspace: Optional[Workspace] = None
+        self.project = ""
+        self.workdir = Path.cwd()
+        root, project = load_workspace_settings()
+        if root is not None:
+            try:
+                self.workspace = Workspace(root)
+                if project in self.workspace.projects():
+                    self.project = project
+                    self.workdir = self.workspace.project_dir(project)
+            except Exception as e:
+                print(f"Error opening workspace: {e}")
+
+        # 設定を読み込み（プロジェクト使用時はプロジェクトのメタデータ）
+        if self.project:
+            self.metadata = load_project_settings(self.workdir)
+            print(f"Project settings: {self.settings_file()}")
         else:
-            self.metadata = RehearsalMetadata()
-            print("No saved settings found. Using defaults.")
-
-        self.processes: List[QProcess] = []
+            loaded_metadata = load_settings()
+            if loaded_metadata:
+                self.metadata = loaded_metadata
+                print(f"Settings loaded from: {CONFIG_FILE}")
+            else:
+                self.metadata = RehearsalMetadata()
+                print("No saved settings found. Using defaults.")
+
+        # GUIではdownloadとfinalizeが重ならない（プロジェクトの切り替えは処理の終了後）ため、
+        # 優先度は使わず帯域上限と転送速度の計測だけ（優先度はデーモンで効く）
+        self.supervisor = ProcessSupervisor(max_concurrent=MAX_CONCURRENT_PROCESSES,
+                                            scheduler=BandwidthScheduler(rate_budgets(load_budgets())),
+                                            parent=self)
+        self.supervisor.job_started.connect(self.handle_job_started)
+        self.supervisor.job_output.connect(self.handle_job_output)
+        self.supervisor.job_finished.connect(self.handle_job_finished)
+        self.detached_watchers = {}  # stage -> QTimer（前回セッションから継続中のプロセス監視）
+        self.finalize_pending = False  # キーフレーム抽出の完了後にStep 3を開始する
         self.init_ui()
+        self.restore_from_journal()
 
     def init_ui(self):
         self.setWindowTitle("Rehearsal Workflow GUI - リハーサル記録作成")
@@ -621,6 +896,14 @@ class RehearsalWorkflowGUI(QMainWindow):
         left_widget = QWidget()
         left_layout = QVBoxLayout(left_widget)
 
+        # プロジェクト選択（作業ディレクトリ）
+        self.project_widget = ProjectSelectorWidget()
+        self.project_widget.project_selected.connect(self.switch_project)
+        self.project_widget.new_clicked.connect(self.create_project)
+        self.project_widget.browse_clicked.connect(self.choose_workspace)
+        self.refresh_projects()
+        left_layout.addWidget(self.project_widget)
+
         # タブウィジェット
         tabs = QTabWidget()
         tab_font = QFont()
@@ -628,7 +911,7 @@ class RehearsalWorkflowGUI(QMainWindow):
         tabs.setFont(tab_font)
 
         # タブ1: 基本情報
-        self.metadata_widget = MetadataInputWidget(self.metadata)
+        self.metadata_widget = MetadataInputWidget(self.metadata, self.settings_file())
         scroll_area1 = QScrollArea()
         scroll_area1.setWidget(self.metadata_widget)
         scroll_area1.setWidgetResizable(True)
@@ -638,19 +921,33 @@ class RehearsalWorkflowGUI(QMainWindow):
         self.workflow_widget = WorkflowControlWidget(self.metadata)
         self.workflow_widget.step1_clicked.connect(self.execute_step1)
         self.workflow_widget.step2_clicked.connect(self.execute_step2)
+        self.workflow_widget.precheck_clicked.connect(self.gate_step2_on_subtitles)
         self.workflow_widget.step3_clicked.connect(self.execute_step3)
+        self.workflow_widget.cancel_clicked.connect(self.cancel_running_jobs)
+        self.supervisor.bandwidth_sampled.connect(self.workflow_widget.update_bandwidth)
         scroll_area2 = QScrollArea()
         scroll_area2.setWidget(self.workflow_widget)
         scroll_area2.setWidgetResizable(True)
         tabs.addTab(scroll_area2, "🔄 ワークフロー")
 
         # タブ3: ファイルモニター
-        self.file_monitor_widget = FileMonitorWidget(self.metadata)
+        self.file_monitor_widget = FileMonitorWidget(self.metadata, self.workdir)
+        self.file_monitor_widget.file_detected.connect(self.handle_file_detected)
         scroll_area3 = QScrollArea()
         scroll_area3.setWidget(self.file_monitor_widget)
         scroll_area3.setWidgetResizable(True)
         tabs.addTab(scroll_area3, "📁 生成ファイル")
 
+        # タブ4: キーフレーム
+        self.keyframe_widget = KeyframeStripWidget()
+        self.keyframe_widget.generate_clicked.connect(self.start_keyframes)
+        tabs.addTab(self.keyframe_widget, "🖼 キーフレーム")
+
+        # タブ5: 字幕検索
+        self.search_widget = TranscriptSearchWidget(
+            self.workspace.projects_dir if self.workspace else self.workdir)
+        tabs.addTab(self.search_widget, "🔎 字幕検索")
+
         left_layout.addWidget(tabs)
 
         # 右側: ログビューア
@@ -674,15 +971,280 @@ class RehearsalWorkflowGUI(QMainWindow):
 
         # 初期メッセージ
         self.log_viewer.log_info("Rehearsal Workflow GUI 起動")
-        self.log_viewer.log_info("カレントディレクトリ: " + str(Path.cwd()))
+        self.log_viewer.log_info("作業ディレクトリ: " + str(self.workdir))
+        if not transfer_measurable():
+            self.log_viewer.log_warn("転送量を計測できないため（ss がありません）、帯域の優先度・上限は適用されません")
         self.log_viewer.log_step("Step 1から開始してください")
 
+    # --------------------------------------------------------------------------
+    # ワークスペース（プロジェクトの切り替え・共有ストア）
+    # --------------------------------------------------------------------------
+
+    def refresh_projects(self):
+        projects = self.workspace.projects() if self.workspace else []
+        self.project_widget.set_projects(projects, self.project, self.workspace is not None)
+
+    def choose_workspace(self):
+        """ワークスペースのルートを選択"""
+        start = str(self.workspace.root) if self.workspace else str(Path.home())
+        directory = QFileDialog.getExistingDirectory(self, "ワークスペースのフォルダを選択", start)
+        if not directory:
+            return
+        try:
+            workspace = Workspace(Path(directory))
+        except Exception as e:
+            QMessageBox.warning(self, "ワークスペース", f"ワークスペースを開けません:\n{e}")
+            return
+        if self.workspace:
+            self.workspace.close()
+        self.workspace = workspace
+        self.project = ""
+        self.search_widget.root_input.setText(str(workspace.projects_dir))
+        self.log_viewer.log_info(f"ワークスペース: {workspace.root}")
+        projects = workspace.projects()
+        self.refresh_projects()
+        if projects:
+            self.switch_project(projects[0])
+        else:
+            self.create_project()
+
+    def create_project(self):
+        """新しいプロジェクト（リハーサル1件分の作業ディレクトリ）を作成"""
+        if self.workspace is None:
+            return
+        name, ok = QInputDialog.getText(self, "新規プロジェクト", "プロジェクト名（例: 2026-10-19_定期演奏会）:")
+        name = name.strip()
+        if not ok or not name:
+            self.refresh_projects()
+            return
+        try:
+            self.workspace.project_dir(name, create=True)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "新規プロジェクト", str(e))
+            self.refresh_projects()
+            return
+        self.switch_project(name)
+
+    def switch_project(self, name: str):
+        """作業ディレクトリを切り替え、そのプロジェクトのジャーナルから状態を復元"""
+        if self.workspace is None or name == self.project:
+            return
+        if self.supervisor.active_jobs() or self.detached_watchers:
+            QMessageBox.warning(self, "プロジェクト切り替え", "実行中の処理が終わってから切り替えてください")
+            self.refresh_projects()
+            return
+
+        self.project = name
+        self.workdir = self.workspace.project_dir(name)
+        save_workspace_settings(self.workspace.root, name)
+        self.refresh_projects()
+
+        # URL・日付・曲名などはプロジェクトごと（ジャーナルもこのURLで引く）
+        self.metadata_widget.load_metadata(load_project_settings(self.workdir), self.settings_file())
+
+        # 前のプロジェクトの成果物・状態を引き継がない
+        for field_name in ARTIFACT_FIELDS.values():
+            setattr(self.metadata, field_name, "")
+        self.metadata.step = WorkflowStep.IDLE
+        self.metadata.step_message = ""
+        self.file_monitor_widget.set_workdir(self.workdir)
+        self.workflow_widget.reset()
+        self.keyframe_widget.frame_list.clear()
+
+        self.log_viewer.log_step(f"プロジェクト: {name}")
+        self.log_viewer.log_info("作業ディレクトリ: " + str(self.workdir))
+        self.restore_from_journal()
+        self.file_monitor_widget.check_files()
+        self.apply_step_to_ui()
+
+    def settings_file(self) -> Path:
+        """メタデータの保存先（プロジェクト使用時はプロジェクト内）"""
+        return project_settings_file(self.workdir) if self.project else CONFIG_FILE
+
+    def store_artifacts(self, kinds: List[str]):
+        """成果物（動画・字幕）を共有ストアに取り込む（別プロセスでハッシュ計算）"""
+        if self.workspace is None:
+            return
+        files = [getattr(self.metadata, ARTIFACT_FIELDS[kind]) for kind in kinds]
+        files = [name for name in files if name and (self.workdir / name).exists()]
+        if not files:
+            return
+        args = [str(WORKSPACE_SCRIPT), "--root", str(self.workspace.root), "ingest"] + files
+        self.supervisor.submit("store", sys.executable, args,
+                               timeout_ms=STORE_TIMEOUT_MS, workdir=str(self.workdir))
+
+    # --------------------------------------------------------------------------
+    # 実行ジャーナル（状態の永続化・再開）
+    # --------------------------------------------------------------------------
+
+    def current_journal(self) -> Optional[RunJournal]:
+        """現在のリハーサル（YouTube URL）に対応するジャーナル"""
+        if not self.metadata.youtube_url:
+            return None
+        return RunJournal.for_rehearsal(self.workdir, self.metadata.youtube_url)
+
+    def set_step(self, step: WorkflowStep, message: str = ""):
+        """ワークフロー状態を更新してジャーナルに記録"""
+        self.metadata.step = step
+        self.metadata.step_message = message
+        journal = self.current_journal()
+        if journal:
+            journal.record_step(step.name, message)
+
+    def handle_file_detected(self, kind: str, file_name: str):
+        """成果物の検出・更新をジャーナルに記録"""
+        journal = self.current_journal()
+        if journal:
+            try:
+                journal.record_artifact(kind, self.workdir / file_name)
+            except OSError as e:
+                self.log_viewer.log_warn(f"ジャーナル記録失敗: {e}")
+
+        # Whisper字幕が揃ったらAI分析待ちへ（分析を始める前に字幕チェック）
+        if kind == 'wp_srt' and self.metadata.step == WorkflowStep.WAITING_WHISPER:
+            self.set_step(WorkflowStep.ANALYZING, "Whisper完了")
+            self.workflow_widget.update_step1_status("完了（Whisper完了）")
+            self.workflow_widget.hold_step2("字幕チェック中...")
+            # 起動時の復元中に検出した場合もウィンドウ表示後に確認する
+            QTimer.singleShot(0, self.gate_step2_on_subtitles)
+
+    def restore_from_journal(self):
+        """ジャーナルから前回の状態を復元し、実行中だったステージを再確認"""
+        journal = self.current_journal()
+        if journal is None or not journal.exists():
+            return
+
+        started = time.perf_counter()
+        state = journal.replay()
+        status = journal.verify_artifacts(state)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        for kind, record in state.artifacts.items():
+            if status.get(kind) == 'ok':
+                setattr(self.metadata, ARTIFACT_FIELDS[kind], record['file'])
+            else:
+                label = "消失" if status.get(kind) == 'missing' else "変更"
+                self.log_viewer.log_warn(f"成果物が{label}されています: {record['file']}")
+
+        try:
+            self.metadata.step = WorkflowStep[state.step]
+        except KeyError:
+            self.metadata.step = WorkflowStep.IDLE
+        self.metadata.step_message = state.step_message
+
+        self.log_viewer.log_info(
+            f"前回の状態を復元: {self.metadata.step.name} "
+            f"（{state.records}件, {elapsed_ms:.1f} ms）"
+        )
+
+        # 前回セッション以降に現れた成果物（Whisper字幕など）を取り込む
+        self.file_monitor_widget.check_files()
+
+        # 実行中のまま終わっているステージ: 生存していれば監視、なければ成果物で再確認
+        # （PIDが別のプロセスに再利用されていれば終了扱い。無関係なプロセスには触れない）
+        for stage, record in state.running.items():
+            if stage_alive(record):
+                # 帯域スケジューラが一時停止したまま前回のセッションが終了していれば再開
+                signal_tree(record['pid'], signal.SIGCONT)
+                self.log_viewer.log_info(f"{stage}: 前回セッションのプロセス（PID {record['pid']}）を監視します")
+                self.watch_detached_stage(stage, record)
+            else:
+                self.recheck_stage(stage, record)
+
+        # 中断記録のみ残っているステージ（GUI終了時にterminate済み）
+        if self.metadata.step in (WorkflowStep.DOWNLOADING, WorkflowStep.FINALIZING):
+            stage = 'download' if self.metadata.step == WorkflowStep.DOWNLOADING else 'finalize'
+            if stage not in state.running:
+                self.recheck_stage(stage, {})
+
+        self.apply_step_to_ui()
+
+    def apply_step_to_ui(self):
+        """現在のメタデータ状態をワークフローウィジェットに反映"""
+        cwd = self.workdir
+        tex_ready = bool(self.metadata.tex_file) and (cwd / self.metadata.tex_file).exists()
+        video_ready = bool(self.metadata.video_file) and (cwd / self.metadata.video_file).exists()
+        self.workflow_widget.restore_state(self.metadata.step, tex_ready)
+        if (self.metadata.step == WorkflowStep.ANALYZING and not tex_ready
+                and self.metadata.step_message == PRECHECK_HOLD_MESSAGE):
+            self.workflow_widget.hold_step2(f"⚠️ {PRECHECK_HOLD_MESSAGE}（字幕を確認し、再チェックしてください）")
+        if tex_ready and video_ready:
+            self.keyframe_widget.load(cwd / self.metadata.tex_file, cwd / self.metadata.video_file)
+
+    def watch_detached_stage(self, stage: str, record: dict):
+        """前回セッションから継続中のプロセスの終了を監視"""
+        timer = QTimer(self)
+
+        def poll():
+            if not stage_alive(record):
+                timer.stop()
+                self.detached_watchers.pop(stage, None)
+                self.recheck_stage(stage, record)
+                self.apply_step_to_ui()
+                if stage == 'keyframes':
+                    self.start_pending_finalize()
+
+        timer.timeout.connect(poll)
+        timer.start(2000)
+        self.detached_watchers[stage] = timer
+
+    def recheck_stage(self, stage: str, record: dict):
+        """終了コードが得られないステージの結果を成果物から判定
+
+        成果物の検出（Whisper字幕など）で既にこのステージより後へ進んでいれば、
+        終了を記録するだけでステップは戻さない。
+        """
+        journal = self.current_journal()
+        stage_step = {'download': WorkflowStep.DOWNLOADING, 'finalize': WorkflowStep.FINALIZING}.get(stage)
+        if stage_step and self.metadata.step.value > stage_step.value:
+            if journal:
+                journal.record_stage_finished(stage, None)
+            return
+        cwd = self.workdir
+        started_ts = 0.0
+        if record.get('ts'):
+            started_ts = datetime.fromisoformat(record['ts']).timestamp()
+
+        if stage == 'download':
+            # 動画があってもWhisperの起動前に終わっていれば字幕は届かない
+            state = journal.replay() if journal else None
+            launched = state is not None and (state.whisper_launched or state.last_exit.get('download') == 0)
+            ok = launched and bool(self.metadata.video_file) and (cwd / self.metadata.video_file).exists()
+            if journal:
+                journal.record_stage_finished(stage, None)
+            if ok:
+                self.log_viewer.log_info("ダウンロード済みの動画を確認しました（Whisper処理待ち）")
+                self.set_step(WorkflowStep.WAITING_WHISPER, "前回セッションのダウンロードを確認")
+            else:
+                self.log_viewer.log_warn("前回のStep 1は完了していません。再実行してください"
+                                         "（ダウンロード済みの動画はそのまま使われます）")
+                self.set_step(WorkflowStep.ERROR, "Step 1中断")
+
+        elif stage == 'finalize':
+            pdf = cwd / self.metadata.tex_file.replace('.tex', '.pdf') if self.metadata.tex_file else None
+            ok = pdf is not None and pdf.exists() and pdf.stat().st_mtime >= started_ts
+            if journal:
+                journal.record_stage_finished(stage, None)
+            if ok:
+                self.log_viewer.log_success(f"前回のStep 3の成果物を確認しました: {pdf.name}")
+                self.set_step(WorkflowStep.COMPLETED, "前回セッションのPDF生成を確認")
+            else:
+                self.log_viewer.log_warn("前回のStep 3は完了していません。再実行してください")
+                self.set_step(WorkflowStep.ERROR, "Step 3中断")
+
+        elif journal:
+            # キーフレーム等: 結果はキャッシュに残るため、終了として記録するだけ
+            journal.record_stage_finished(stage, None)
+
     def execute_step1(self):
         """Step 1: YouTube動画ダウンロード + Whisper起動"""
         if not self.metadata.youtube_url:
             QMessageBox.warning(self, "入力エラー", "YouTube URLを入力してください")
             return
 
+        # このプロジェクトのURLを確定（再起動・切り替え後も同じジャーナルを引く）
+        save_settings(self.metadata, self.settings_file())
+
         self.log_viewer.log_step("Step 1: YouTube動画ダウンロード + Whisper起動")
         self.log_viewer.log_info(f"URL: {self.metadata.youtube_url}")
 
@@ -693,34 +1255,57 @@ class RehearsalWorkflowGUI(QMainWindow):
         self.workflow_widget.step1_button.setEnabled(False)
         self.workflow_widget.step1_status.setText("実行中...")
 
-        # プロセス起動
-        process = QProcess(self)
-        process.setProcessChannelMode(QProcess.ProcessChannelMode.MergedChannels)
-
-        process.readyReadStandardOutput.connect(
-            lambda: self.handle_process_output(process)
-        )
-        process.finished.connect(
-            lambda exit_code, exit_status: self.handle_step1_finished(exit_code, exit_status)
-        )
-
         # Zshシェルで実行（関数が利用可能な環境）
-        # .zshenvでパス設定、ytdl/whisper-remote関数source、fpathとautoloadを手動設定
-        full_cmd = (
-            f"source ~/.config/zsh/.zshenv && "
-            f"source ~/.config/zsh/functions/ytdl-claude.zsh && "
-            f"source ~/.config/zsh/functions/whisper-remote.zsh && "
-            f"fpath=(~/.config/zsh/functions $fpath) && "
-            f"autoload -Uz rehearsal-download rehearsal-finalize tex2chapters && "
-            f"{' '.join(cmd)}"
-        )
-        process.start("zsh", ["-c", full_cmd])
-
-        self.processes.append(process)
-
-    def handle_process_output(self, process: QProcess):
+        self.set_step(WorkflowStep.DOWNLOADING)
+        self.supervisor.submit("download", "zsh", build_zsh_command(cmd),
+                               timeout_ms=DOWNLOAD_TIMEOUT_MS, workdir=str(self.workdir))
+
+    def handle_job_started(self, job: SupervisedJob):
+        """外部プロセス起動時の処理"""
+        self.workflow_widget.cancel_button.setEnabled(True)
+        journal = self.current_journal()
+        if journal:
+            journal.record_stage_started(job.name, job.pid)
+
+    def handle_job_finished(self, job: SupervisedJob):
+        """外部プロセス終了時の処理（ステップごとの完了処理へ振り分け）"""
+        self.workflow_widget.cancel_button.setEnabled(bool(self.supervisor.active_jobs()))
+        if job.state == JobState.CANCELLED:
+            self.log_viewer.log_warn(f"{job.name}: 中止しました")
+        elif job.state == JobState.TIMED_OUT:
+            self.log_viewer.log_error(f"{job.name}: タイムアウト（{job.timeout_ms // 60000}分）")
+        self.log_viewer.log_info(f"{job.name}: {job.usage_summary()}")
+
+        if job.name == "download":
+            self.handle_step1_finished(job)
+        elif job.name == "finalize":
+            self.handle_step3_finished(job)
+        elif job.name == "keyframes":
+            self.handle_keyframes_finished(job)
+        elif job.name == "store":
+            self.handle_store_finished(job)
+
+    def cancel_running_jobs(self):
+        """実行中の処理を中止（プロセスツリーごと終了）"""
+        jobs = self.supervisor.active_jobs()
+        if not jobs:
+            return
+        names = ", ".join(job.name for job in jobs)
+        reply = QMessageBox.question(self, "中止確認", f"実行中の処理を中止しますか？\n\n{names}")
+        if reply == QMessageBox.StandardButton.Yes:
+            self.log_viewer.log_warn(f"中止要求: {names}")
+            self.supervisor.cancel_all()
+
+    def handle_job_output(self, job: SupervisedJob, output: str):
+        """外部プロセスの出力（Whisperの起動はジャーナルに記録）"""
+        if job.name == "download" and any(marker in output for marker in WHISPER_LAUNCH_MARKERS):
+            journal = self.current_journal()
+            if journal:
+                journal.record_whisper_launched()
+        self.handle_process_output(output)
+
+    def handle_process_output(self, output: str):
         """プロセス出力処理"""
-        output = process.readAllStandardOutput().data().decode('utf-8', errors='ignore')
         for line in output.strip().split('\n'):
             if line:
                 # ANSIカラーコード除去
@@ -740,18 +1325,84 @@ class RehearsalWorkflowGUI(QMainWindow):
                 else:
                     self.log_viewer.append(line_clean)
 
-    def handle_step1_finished(self, exit_code: int, exit_status):
+    def handle_step1_finished(self, job: SupervisedJob):
         """Step 1完了処理"""
-        if exit_code == 0:
+        exit_code = job.exit_code
+        journal = self.current_journal()
+        if journal:
+            journal.record_stage_finished("download", exit_code)
+
+        if job.state == JobState.FINISHED:
+            self.set_step(WorkflowStep.WAITING_WHISPER, "Whisper処理中")
             self.log_viewer.log_success("Step 1完了")
             self.log_viewer.log_info("Whisperが起動しました。完了するまで30分〜2時間かかります")
             self.log_viewer.log_step("Whisper完了後、Step 2に進んでください")
             self.workflow_widget.update_step1_status("完了（Whisper処理中...）", enable_step2=True)
+            self.store_artifacts(['video', 'yt_srt'])
         else:
+            self.set_step(WorkflowStep.ERROR, f"Step 1失敗（終了コード: {exit_code}）")
             self.log_viewer.log_error(f"Step 1失敗（終了コード: {exit_code}）")
             self.workflow_widget.step1_button.setEnabled(True)
             self.workflow_widget.step1_status.setText("エラー発生")
 
+    def run_subtitle_precheck(self) -> Optional[PrecheckReport]:
+        """Whisper字幕の品質チェック（結果をログとステータスに表示）"""
+        cwd = self.workdir
+        if not self.metadata.wp_srt_file or not (cwd / self.metadata.wp_srt_file).exists():
+            self.log_viewer.log_warn("Whisper字幕が見つからないため品質チェックをスキップします")
+            return None
+
+        self.log_viewer.log_step("Whisper字幕の品質チェック")
+        yt = cwd / self.metadata.yt_srt_file if self.metadata.yt_srt_file else None
+        video = cwd / self.metadata.video_file if self.metadata.video_file else None
+        try:
+            report = check_subtitles(cwd / self.metadata.wp_srt_file, yt, video)
+        except (OSError, ValueError) as e:
+            self.log_viewer.log_error(f"字幕チェックに失敗しました: {e}")
+            return None
+
+        for line in report.summary_lines():
+            self.log_viewer.log_info(line)
+        for level, message in report.issues:
+            if level == 'fail':
+                self.log_viewer.log_error(message)
+            else:
+                self.log_viewer.log_warn(message)
+        self.workflow_widget.update_precheck_status(report)
+        return report
+
+    def confirm_subtitle_quality(self) -> bool:
+        """字幕チェックで不適と判定された場合はAI分析に進むか確認"""
+        report = self.run_subtitle_precheck()
+        if report is None or report.verdict != 'fail':
+            return True
+
+        message = "Whisper字幕に問題があります:\n\n"
+        message += "\n".join(f"・{text}" for _, text in report.issues)
+        message += "\n\nこの字幕でAI分析（/rehearsal）に進みますか？"
+        reply = QMessageBox.question(
+            self, "字幕チェック", message,
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            QMessageBox.StandardButton.No
+        )
+        if reply != QMessageBox.StandardButton.Yes:
+            self.log_viewer.log_warn("字幕チェックの結果によりAI分析を保留しました（字幕を確認して再チェックしてください）")
+            return False
+        self.log_viewer.log_warn("字幕チェックの警告を確認のうえ続行します")
+        return True
+
+    def gate_step2_on_subtitles(self):
+        """Whisper字幕の品質チェックを行い、不適なら確認されるまでStep 2を保留"""
+        if self.confirm_subtitle_quality():
+            if self.metadata.step_message == PRECHECK_HOLD_MESSAGE:
+                self.set_step(self.metadata.step, "字幕チェック確認済み")
+            self.workflow_widget.update_step1_status("完了（Whisper完了）", enable_step2=True)
+            self.log_viewer.log_step("Claude Codeで /rehearsal を実行してください")
+        else:
+            if self.metadata.step == WorkflowStep.ANALYZING:
+                self.set_step(WorkflowStep.ANALYZING, PRECHECK_HOLD_MESSAGE)
+            self.workflow_widget.hold_step2(f"⚠️ {PRECHECK_HOLD_MESSAGE}（字幕を確認し、再チェックしてください）")
+
     def execute_step2(self):
         """Step 2: LaTeXファイル選択"""
         self.log_viewer.log_step("Step 2: LaTeXファイル選択")
@@ -761,24 +1412,144 @@ class RehearsalWorkflowGUI(QMainWindow):
         file_path, _ = QFileDialog.getOpenFileName(
             self,
             "LaTeXファイルを選択",
-            str(Path.cwd()),
+            str(self.workdir),
             "LaTeX Files (*.tex)"
         )
 
         if file_path:
             self.metadata.tex_file = Path(file_path).name
             self.log_viewer.log_success(f"選択: {self.metadata.tex_file}")
+            self.set_step(WorkflowStep.ANALYZING, "LaTeXファイル選択済み")
+            journal = self.current_journal()
+            if journal:
+                journal.record_artifact('tex', Path(file_path))
             self.workflow_widget.update_step2_status("完了", enable_step3=True)
             self.log_viewer.log_step("Step 3に進んでください")
+            self.start_keyframes()
+            self.store_artifacts(['wp_srt'])
         else:
             self.log_viewer.log_warn("ファイルが選択されませんでした")
 
+    def start_keyframes(self):
+        """チャプターごとのキーフレーム抽出（別プロセス、キャッシュ済みなら即終了）"""
+        cwd = self.workdir
+        if not self.metadata.tex_file or not self.metadata.video_file:
+            self.log_viewer.log_warn("キーフレーム抽出にはLaTeXファイルと動画が必要です")
+            return
+        if not (cwd / self.metadata.video_file).exists():
+            self.log_viewer.log_warn(f"動画が見つかりません: {self.metadata.video_file}")
+            return
+        if any(job.name == "keyframes" for job in self.supervisor.active_jobs()):
+            return
+
+        self.log_viewer.log_step("キーフレーム抽出")
+        self.keyframe_widget.generate_button.setEnabled(False)
+        self.keyframe_widget.status_label.setText("抽出中...")
+        args = [str(KEYFRAMES_SCRIPT), self.metadata.tex_file, "--video", self.metadata.video_file]
+        self.supervisor.submit("keyframes", sys.executable, args,
+                               timeout_ms=KEYFRAMES_TIMEOUT_MS, workdir=str(cwd))
+
+    def handle_keyframes_finished(self, job: SupervisedJob):
+        """キーフレーム抽出完了処理"""
+        journal = self.current_journal()
+        if journal:
+            journal.record_stage_finished("keyframes", job.exit_code)
+
+        self.keyframe_widget.generate_button.setEnabled(True)
+        cwd = self.workdir
+        self.keyframe_widget.load(cwd / self.metadata.tex_file, cwd / self.metadata.video_file)
+        if job.state == JobState.FINISHED:
+            self.log_viewer.log_success("キーフレーム抽出完了（Step 3のPDFに掲載されます）")
+        elif job.state == JobState.CANCELLED and self.finalize_pending:
+            # 中止ボタンで抽出を止めた場合は、待っていたStep 3も開始しない
+            self.finalize_pending = False
+            self.log_viewer.log_warn("キーフレーム抽出を中止したため、Step 3を開始しませんでした")
+            self.workflow_widget.step3_button.setEnabled(True)
+            self.workflow_widget.step3_status.setText("中止しました")
+        else:
+            self.log_viewer.log_warn("キーフレーム抽出に失敗しました（PDFはサムネイルなしで生成されます）")
+        self.start_pending_finalize()
+
+    def handle_store_finished(self, job: SupervisedJob):
+        """共有ストアへの取り込み完了処理"""
+        journal = self.current_journal()
+        if journal:
+            journal.record_stage_finished("store", job.exit_code)
+
+        if job.state == JobState.FINISHED:
+            self.log_viewer.log_success("共有ストアへの取り込み完了")
+        else:
+            self.log_viewer.log_warn("共有ストアへの取り込みに失敗しました（作業ディレクトリのファイルはそのまま使えます）")
+
+    def confirm_tex_lint(self) -> bool:
+        """リモートコンパイル前にLaTeXファイルを検査（タイムスタンプは正規化して書き戻す）"""
+        cwd = self.workdir
+        tex = cwd / self.metadata.tex_file
+        video = cwd / self.metadata.video_file if self.metadata.video_file else None
+        self.log_viewer.log_step("LaTeXファイルの検査")
+        try:
+            report = lint_tex(tex, video, fix=True)
+        except OSError as e:
+            self.log_viewer.log_error(f"LaTeXファイルの検査に失敗しました: {e}")
+            return True
+
+        for issue in report.fixes:
+            self.log_viewer.log_info(f"正規化 {issue.line}行目: {issue.message}")
+        for issue in report.warnings:
+            self.log_viewer.log_warn(f"{issue.line}行目: {issue.message}")
+        for issue in report.errors:
+            self.log_viewer.log_error(f"{issue.line}行目: {issue.message}")
+        for line in report.summary_lines():
+            self.log_viewer.log_info(line)
+        if not report.errors:
+            return True
+
+        message = "LaTeXファイルに問題があります:\n\n"
+        message += "\n".join(f"・{issue.line}行目: {issue.message}" for issue in report.errors[:10])
+        if len(report.errors) > 10:
+            message += f"\n・ほか {len(report.errors) - 10}件"
+        message += "\n\nこのままPDF生成（リモートコンパイル）を実行しますか？"
+        reply = QMessageBox.question(
+            self, "LaTeXファイルの検査", message,
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            QMessageBox.StandardButton.No
+        )
+        if reply != QMessageBox.StandardButton.Yes:
+            self.log_viewer.log_warn("検査結果によりStep 3を中断しました（LaTeXファイルを修正してください）")
+            return False
+        self.log_viewer.log_warn("検査のエラーを無視して続行します")
+        return True
+
     def execute_step3(self):
         """Step 3: PDF生成 + チャプター抽出"""
         if not self.metadata.tex_file:
             QMessageBox.warning(self, "エラー", "LaTeXファイルが選択されていません")
             return
+        if not self.confirm_tex_lint():
+            return
+
+        # PDFに掲載する <記録>_keyframes.tex ができるまでリモートコンパイルを待つ
+        if self.keyframes_running():
+            self.finalize_pending = True
+            self.log_viewer.log_info("キーフレーム抽出の完了後にPDF生成を開始します")
+            self.workflow_widget.step3_button.setEnabled(False)
+            self.workflow_widget.step3_status.setText("キーフレーム抽出の完了待ち...")
+            return
+        self.start_finalize()
 
+    def keyframes_running(self) -> bool:
+        """キーフレーム抽出が実行中か（前回セッションから継続中のものを含む）"""
+        return ('keyframes' in self.detached_watchers
+                or any(job.name == "keyframes" for job in self.supervisor.active_jobs()))
+
+    def start_pending_finalize(self):
+        """キーフレーム抽出を待っていたStep 3を開始"""
+        if self.finalize_pending and not self.keyframes_running():
+            self.finalize_pending = False
+            self.start_finalize()
+
+    def start_finalize(self):
+        """rehearsal-finalize を起動"""
         self.log_viewer.log_step("Step 3: PDF生成 + チャプター抽出")
         self.log_viewer.log_info(f"ファイル: {self.metadata.tex_file}")
 
@@ -789,34 +1560,20 @@ class RehearsalWorkflowGUI(QMainWindow):
         self.workflow_widget.step3_button.setEnabled(False)
         self.workflow_widget.step3_status.setText("実行中...")
 
-        # プロセス起動
-        process = QProcess(self)
-        process.setProcessChannelMode(QProcess.ProcessChannelMode.MergedChannels)
-
-        process.readyReadStandardOutput.connect(
-            lambda: self.handle_process_output(process)
-        )
-        process.finished.connect(
-            lambda exit_code, exit_status: self.handle_step3_finished(exit_code, exit_status)
-        )
-
         # Zshシェルで実行（関数が利用可能な環境）
-        # .zshenvでパス設定、ytdl/whisper-remote関数source、fpathとautoloadを手動設定
-        full_cmd = (
-            f"source ~/.config/zsh/.zshenv && "
-            f"source ~/.config/zsh/functions/ytdl-claude.zsh && "
-            f"source ~/.config/zsh/functions/whisper-remote.zsh && "
-            f"fpath=(~/.config/zsh/functions $fpath) && "
-            f"autoload -Uz rehearsal-download rehearsal-finalize tex2chapters && "
-            f"{' '.join(cmd)}"
-        )
-        process.start("zsh", ["-c", full_cmd])
+        self.set_step(WorkflowStep.FINALIZING)
+        self.supervisor.submit("finalize", "zsh", build_zsh_command(cmd),
+                               timeout_ms=FINALIZE_TIMEOUT_MS, workdir=str(self.workdir))
 
-        self.processes.append(process)
-
-    def handle_step3_finished(self, exit_code: int, exit_status):
+    def handle_step3_finished(self, job: SupervisedJob):
         """Step 3完了処理"""
-        if exit_code == 0:
+        exit_code = job.exit_code
+        journal = self.current_journal()
+        if journal:
+            journal.record_stage_finished("finalize", exit_code)
+
+        if job.state == JobState.FINISHED:
+            self.set_step(WorkflowStep.COMPLETED)
             self.log_viewer.log_success("Step 3完了")
             self.log_viewer.log_success("✅ ワークフロー完了！")
             self.log_viewer.log_info("")
@@ -840,17 +1597,23 @@ class RehearsalWorkflowGUI(QMainWindow):
                 f"Movie Viewerチャプター: {self.metadata.movieviewer_chapters}"
             )
         else:
+            self.set_step(WorkflowStep.ERROR, f"Step 3失敗（終了コード: {exit_code}）")
             self.log_viewer.log_error(f"Step 3失敗（終了コード: {exit_code}）")
             self.workflow_widget.step3_button.setEnabled(True)
             self.workflow_widget.step3_status.setText("エラー発生")
 
     def closeEvent(self, event):
         """ウィンドウクローズ時の処理"""
-        # 実行中のプロセスを終了
-        for process in self.processes:
-            if process.state() == QProcess.ProcessState.Running:
-                process.terminate()
-                process.waitForFinished(3000)
+        # 実行中のプロセスを終了（中断としてジャーナルに記録し、次回起動時に再確認）
+        journal = self.current_journal()
+        self.supervisor.job_finished.disconnect()
+        for job in self.supervisor.active_jobs():
+            if journal:
+                journal.record_stage_interrupted(job.name, "GUI終了")
+        # 全プロセスツリーに同時にSIGTERMを送り、猶予は全体で3秒
+        self.supervisor.shutdown(3000)
+        if self.workspace:
+            self.workspace.close()
 
         event.accept()
 
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+run_journal.py - リハーサル単位の実行ジャーナル
+
+ワークフローのステージ遷移・外部プロセスの起動/終了・成果物のハッシュを
+追記専用（append-only）のJSON Linesファイルに記録する。各レコードは
+書き込みごとに fsync されるため、GUIを閉じたりクラッシュした場合でも
+直前までの状態が失われない。
+
+再起動時は replay() でジャーナルを先頭から読み直し、ワークフロー状態を
+再構築する（数百行程度なので数ミリ秒）。成果物は stat（サイズ・更新時刻）で
+照合し、ハッシュの再計算は変更が検出された場合のみ行う。
+実行中だったプロセスは PID と起動時刻の組で照合する（再起動後のPID再利用対策）。
+
+ジャーナルの配置:
+  <作業ディレクトリ>/.rehearsal/<動画ID>.journal
+
+レコード形式（1行1レコード）:
+  {"ts": "...", "event": "step", "step": "WAITING_WHISPER", "message": "..."}
+  {"ts": "...", "event": "artifact", "kind": "wp_srt", "file": "...", "size": ..., "mtime_ns": ..., "sha256": "..."}
+  {"ts": "...", "event": "stage_started", "stage": "download", "pid": 12345, "proc_start": "..."}
+  {"ts": "...", "event": "stage_finished", "stage": "download", "exit_code": 0}
+
+作成日: 2026-10-19
+バージョン: 1.0.0
+"""
+
+import os
+import re
+import sys
+import json
+import hashlib
+import subprocess
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+from datetime import datetime
+
+
+# ==============================================================================
+# 定数
+# ==============================================================================
+
+# ジャーナル格納ディレクトリ（作業ディレクトリ直下）
+JOURNAL_DIR_NAME = ".rehearsal"
+
+# これより大きいファイルは先頭・末尾のみをハッシュする（動画ファイル対策）
+FULL_HASH_LIMIT = 64 * 1024 * 1024
+SAMPLE_SIZE = 4 * 1024 * 1024
+
+
+# ==============================================================================
+# ユーティリティ
+# ==============================================================================
+
+def journal_key(youtube_url: str) -> str:
+    """YouTube URLからジャーナルのキー（動画ID）を求める
+
+    rehearsal-download と同じ規則で動画IDを抽出する。
+    抽出できない場合は "default" を返す。
+    """
+    match = re.search(r'youtu\.be/([^?&/]+)', youtube_url)
+    if not match:
+        match = re.search(r'[?&]v=([^&]+)', youtube_url)
+    if match:
+        return re.sub(r'[^A-Za-z0-9_-]', '_', match.group(1))
+    return "default"
+
+
+def file_digest(path: Path) -> str:
+    """ファイルのSHA-256ダイジェストを計算
+
+    FULL_HASH_LIMIT を超えるファイルはサイズ + 先頭・末尾 SAMPLE_SIZE バイトのみを
+    ハッシュする（数GBの動画でも一瞬で終わる）。同一性の判定用途に限る。
+    """
+    h = hashlib.sha256()
+    size = path.stat().st_size
+    with open(path, 'rb') as f:
+        if size <= FULL_HASH_LIMIT:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(chunk)
+        else:
+            h.update(str(size).encode())
+            h.update(f.read(SAMPLE_SIZE))
+            f.seek(size - SAMPLE_SIZE)
+            h.update(f.read(SAMPLE_SIZE))
+    return h.hexdigest()
+
+
+def pid_alive(pid: int) -> bool:
+    """プロセスが生存しているか確認"""
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def process_start_time(pid: int) -> Optional[str]:
+    """プロセスの起動時刻（PIDの再利用を見分けるための識別子）
+
+    Linuxでは /proc/<pid>/stat の22番目のフィールド（起動後のクロック数）、
+    それ以外では ps の起動時刻。取得できなければ None。
+    """
+    if pid <= 0:
+        return None
+    if sys.platform.startswith('linux'):
+        try:
+            with open(f"/proc/{pid}/stat", 'r') as f:
+                stat = f.read()
+        except OSError:
+            return None
+        # comm（2番目）は空白や括弧を含み得るため、最後の ')' 以降を分割する
+        fields = stat[stat.rfind(')') + 2:].split()
+        return fields[19] if len(fields) > 19 else None
+    try:
+        result = subprocess.run(["ps", "-o", "lstart=", "-p", str(pid)],
+                                capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def stage_alive(record: dict) -> bool:
+    """stage_started レコードのプロセスが、記録したものと同じまま生存しているか
+
+    起動時刻が記録されていれば照合し、OS再起動などでPIDが別のプロセスに
+    再利用されている場合は終了したものとみなす。
+    """
+    pid = record.get('pid', 0)
+    if not pid_alive(pid):
+        return False
+    started = record.get('proc_start')
+    return started is None or process_start_time(pid) in (None, started)
+
+
+# ==============================================================================
+# 状態モデル
+# ==============================================================================
+
+@dataclass
+class JournalState:
+    """ジャーナルから再構築したワークフロー状態"""
+    step: str = "IDLE"                                      # WorkflowStep名
+    step_message: str = ""
+    artifacts: Dict[str, dict] = field(default_factory=dict)  # kind -> レコード
+    running: Dict[str, dict] = field(default_factory=dict)    # stage -> 起動レコード
+    last_exit: Dict[str, Optional[int]] = field(default_factory=dict)  # stage -> 終了コード
+    last_finished: Dict[str, str] = field(default_factory=dict)        # stage -> 終了時刻（ISO）
+    failures: Dict[str, int] = field(default_factory=dict)             # stage -> 連続失敗回数（0以外で終了）
+    whisper_launched: bool = False                          # 最後のdownloadがWhisperを起動済みか
+    records: int = 0
+
+    def apply(self, record: dict):
+        """1レコードを状態に適用"""
+        event = record.get('event')
+        if event == 'step':
+            self.step = record.get('step', self.step)
+            self.step_message = record.get('message', '')
+        elif event == 'artifact':
+            self.artifacts[record['kind']] = record
+        elif event == 'artifact_removed':
+            self.artifacts.pop(record['kind'], None)
+        elif event == 'stage_started':
+            self.running[record['stage']] = record
+            if record['stage'] == 'download':
+                self.whisper_launched = False
+        elif event == 'whisper_launched':
+            self.whisper_launched = True
+        elif event in ('stage_finished', 'stage_interrupted'):
+            stage = record['stage']
+            exit_code = record.get('exit_code')
+            self.running.pop(stage, None)
+            self.last_exit[stage] = exit_code
+            self.last_finished[stage] = record.get('ts', '')
+            # 中断・終了コード不明（None）は失敗に数えない
+            if exit_code == 0:
+                self.failures[stage] = 0
+            elif exit_code is not None:
+                self.failures[stage] = self.failures.get(stage, 0) + 1
+        self.records += 1
+
+
+# ==============================================================================
+# ジャーナル本体
+# ==============================================================================
+
+class RunJournal:
+    """追記専用・fsync付きの実行ジャーナル"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.workdir = self.path.parent.parent
+
+    @classmethod
+    def for_rehearsal(cls, workdir: Path, youtube_url: str) -> "RunJournal":
+        """作業ディレクトリとURLからジャーナルを開く"""
+        key = journal_key(youtube_url)
+        return cls(Path(workdir) / JOURNAL_DIR_NAME / f"{key}.journal")
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def append(self, event: str, **fields):
+        """レコードを追記してfsync"""
+        record = {'ts': datetime.now().isoformat(timespec='milliseconds'), 'event': event}
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, line.encode('utf-8'))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        return record
+
+    def record_step(self, step: str, message: str = ""):
+        """ステージ遷移を記録"""
+        return self.append('step', step=step, message=message)
+
+    def record_artifact(self, kind: str, path: Path):
+        """成果物をハッシュ付きで記録"""
+        path = Path(path)
+        st = path.stat()
+        return self.append(
+            'artifact', kind=kind, file=path.name,
+            size=st.st_size, mtime_ns=st.st_mtime_ns, sha256=file_digest(path)
+        )
+
+    def record_stage_started(self, stage: str, pid: int):
+        """外部プロセスの起動を記録（PIDの再利用を見分けるため起動時刻も記録）"""
+        return self.append('stage_started', stage=stage, pid=pid, proc_start=process_start_time(pid))
+
+    def record_stage_finished(self, stage: str, exit_code: Optional[int]):
+        """外部プロセスの終了を記録"""
+        return self.append('stage_finished', stage=stage, exit_code=exit_code)
+
+    def record_whisper_launched(self):
+        """rehearsal-download がWhisperを起動したことを記録（中断時の再判定用）"""
+        return self.append('whisper_launched')
+
+    def record_stage_interrupted(self, stage: str, reason: str = ""):
+        """外部プロセスの中断（GUI終了など）を記録"""
+        return self.append('stage_interrupted', stage=stage, exit_code=None, reason=reason)
+
+    def replay(self) -> JournalState:
+        """ジャーナルを読み直して状態を再構築
+
+        クラッシュで途中までしか書かれなかった末尾行は無視する。
+        """
+        state = JournalState()
+        if not self.path.exists():
+            return state
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                state.apply(record)
+        return state
+
+    def verify_artifacts(self, state: JournalState) -> Dict[str, str]:
+        """記録済み成果物を現在のファイルと照合
+
+        Returns:
+            kind -> "ok" | "missing" | "changed"
+        """
+        result = {}
+        for kind, record in state.artifacts.items():
+            path = self.workdir / record['file']
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                result[kind] = 'missing'
+                continue
+            if st.st_size == record['size'] and st.st_mtime_ns == record['mtime_ns']:
+                result[kind] = 'ok'
+            elif file_digest(path) == record['sha256']:
+                result[kind] = 'ok'
+            else:
+                result[kind] = 'changed'
+        return result
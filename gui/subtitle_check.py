@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+subtitle_check.py - Whisper字幕の品質事前チェック
+
+Step 2（Claude AI分析 + リモートコンパイル）に進む前に、*_wp.srt が
+分析に使える状態かを数十ミリ秒で判定する。音楽の上でWhisperを走らせると
+起こりがちな以下の問題を検出する。
+
+  - 途中で途切れている（最終キューが動画の終わりより大幅に手前）
+  - カバー率が極端に低い／長い空白区間がある（ギャップのヒストグラム）
+  - 同じ行の繰り返し（ハルシネーション）
+  - YouTube字幕との時刻ずれ（発話区間の相互相関から推定）
+
+計算はすべて CueTable（NumPy配列）上のベクトル演算で行う。
+
+使用方法（コマンドライン）:
+  python3 subtitle_check.py <file_wp.srt> [--yt file_yt.srt] [--video file.mp4]
+  python3 subtitle_check.py --self-check    # 合成字幕で時刻ずれ推定を確認
+
+作成日: 2026-10-19
+バージョン: 1.0.0
+"""
+
+import sys
+import argparse
+import subprocess
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from cue_table import CueTable, load_cues
+from subtitles import format_timestamp
+
+
+# ==============================================================================
+# 定数（判定しきい値）
+# ==============================================================================
+
+# 途切れ: 最終キューの終了時刻 / 基準の長さ
+TRUNCATION_FAIL_RATIO = 0.85
+TRUNCATION_WARN_RATIO = 0.95
+
+# カバー率（音楽部分は字幕が付かないため低めに設定）
+COVERAGE_FAIL = 0.05
+COVERAGE_WARN = 0.15
+
+# 空白区間
+LONG_GAP_WARN_MS = 15 * 60 * 1000
+
+# 繰り返し: 同一テキストが REPEAT_RUN_MIN 回以上連続するキューの割合
+REPEAT_RUN_MIN = 3
+REPETITION_FAIL = 0.30
+REPETITION_WARN = 0.10
+
+# YouTube字幕との時刻ずれ
+DRIFT_BIN_MS = 100
+DRIFT_MAX_LAG_MS = 30 * 1000
+DRIFT_SEGMENT_MS = 10 * 60 * 1000
+DRIFT_MIN_ACTIVE_MS = 60 * 1000   # 区間ごとのずれを推定するのに必要な発話時間（両方の字幕とも）
+DRIFT_WARN_MS = 2000
+
+# ギャップのヒストグラムの区切り（ミリ秒）
+GAP_BINS_MS = [0, 1000, 5000, 30000, 120000, 600000, np.inf]
+GAP_BIN_LABELS = ["<1秒", "1-5秒", "5-30秒", "30秒-2分", "2-10分", "10分以上"]
+
+
+# ==============================================================================
+# データモデル
+# ==============================================================================
+
+@dataclass
+class PrecheckReport:
+    """字幕チェックの結果"""
+    wp_path: str
+    cue_count: int = 0
+    reference_ms: Optional[int] = None       # 基準の長さ（動画 or YouTube字幕）
+    reference_source: str = ""
+    last_end_ms: int = 0
+    coverage: float = 0.0
+    gap_histogram: List[Tuple[str, int]] = field(default_factory=list)
+    longest_gap: Tuple[int, int] = (0, 0)    # (開始ms, 長さms)
+    repetition_rate: float = 0.0
+    top_repeats: List[Tuple[str, int]] = field(default_factory=list)
+    drift_ms: Optional[int] = None           # Whisper - YouTube（正: Whisperが遅い）
+    drift_spread_ms: Optional[int] = None    # 区間ごとのずれの幅
+    issues: List[Tuple[str, str]] = field(default_factory=list)  # (fail|warn, メッセージ)
+
+    @property
+    def verdict(self) -> str:
+        levels = {level for level, _ in self.issues}
+        if 'fail' in levels:
+            return 'fail'
+        if 'warn' in levels:
+            return 'warn'
+        return 'ok'
+
+    def add_issue(self, level: str, message: str):
+        self.issues.append((level, message))
+
+    def summary_lines(self) -> List[str]:
+        """GUIログ・コマンドライン用の要約"""
+        lines = [f"キュー数: {self.cue_count} / 最終時刻: {format_timestamp(self.last_end_ms)}"]
+        if self.reference_ms:
+            lines.append(f"基準の長さ: {format_timestamp(self.reference_ms)}（{self.reference_source}）")
+        lines.append(f"カバー率: {self.coverage:.1%} / 繰り返し率: {self.repetition_rate:.1%}")
+        lines.append("ギャップ分布: " + ", ".join(f"{label} {count}" for label, count in self.gap_histogram))
+        if self.longest_gap[1]:
+            lines.append(f"最長ギャップ: {format_timestamp(self.longest_gap[0])} から "
+                         f"{self.longest_gap[1] / 60000:.1f}分")
+        if self.drift_ms is not None:
+            lines.append(f"YouTube字幕とのずれ: {self.drift_ms:+d} ms（区間差 {self.drift_spread_ms} ms）")
+        for text, count in self.top_repeats:
+            lines.append(f"繰り返し行: 「{text}」 x{count}")
+        return lines
+
+
+# ==============================================================================
+# 個別の指標
+# ==============================================================================
+
+def coverage_ms(table: CueTable) -> int:
+    """キュー区間の和集合の長さ（重なりは1回だけ数える）"""
+    if not len(table):
+        return 0
+    prev_max = np.concatenate(([0], table.max_end[:-1])).astype(np.int64)
+    begin = np.maximum(table.starts.astype(np.int64), prev_max)
+    return int(np.clip(table.ends.astype(np.int64) - begin, 0, None).sum())
+
+
+def gaps(table: CueTable, reference_ms: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+    """空白区間の (開始ms, 長さms)（先頭・末尾を含む）"""
+    if not len(table):
+        return np.array([0]), np.array([reference_ms or 0])
+    starts = table.starts.astype(np.int64)
+    max_end = table.max_end.astype(np.int64)
+    gap_start = np.concatenate(([0], max_end))
+    gap_end = np.concatenate((starts, [max(reference_ms or 0, int(max_end[-1]))]))
+    lengths = np.clip(gap_end - gap_start, 0, None)
+    return gap_start, lengths
+
+
+def text_hashes(table: CueTable) -> np.ndarray:
+    """各キュー本文のハッシュ（空白を除いて比較）"""
+    text = table.text
+    offsets = table.offsets
+    return np.fromiter(
+        (hash(text[offsets[i]:offsets[i + 1]].tobytes().replace(b' ', b'')) for i in range(len(table))),
+        dtype=np.int64, count=len(table)
+    )
+
+
+def repetition(table: CueTable) -> Tuple[float, List[Tuple[str, int]]]:
+    """同一テキストが連続するキューの割合と、主な繰り返し行"""
+    n = len(table)
+    if n == 0:
+        return 0.0, []
+    h = text_hashes(table)
+
+    # 連続する同一テキストのラン（開始位置と長さ）
+    run_starts = np.flatnonzero(np.concatenate(([True], h[1:] != h[:-1])))
+    run_lengths = np.diff(np.concatenate((run_starts, [n])))
+    long_runs = run_lengths >= REPEAT_RUN_MIN
+    rate = float(run_lengths[long_runs].sum()) / n
+
+    # 長いランを作っている行を出現数の多い順に
+    top = []
+    if long_runs.any():
+        run_hashes = h[run_starts[long_runs]]
+        values, counts = np.unique(run_hashes, return_counts=True)
+        for value in values[np.argsort(-counts)][:3]:
+            mask = h == value
+            first = int(np.flatnonzero(mask)[0])
+            top.append((table.text_at(first), int(mask.sum())))
+    return rate, top
+
+
+def activity(table: CueTable, bins: int) -> np.ndarray:
+    """DRIFT_BIN_MS 単位の発話区間（キューがあれば1）"""
+    delta = np.zeros(bins + 1, dtype=np.int32)
+    s = np.clip(table.starts // DRIFT_BIN_MS, 0, bins)
+    e = np.clip((table.ends + DRIFT_BIN_MS - 1) // DRIFT_BIN_MS, 0, bins)
+    np.add.at(delta, s, 1)
+    np.add.at(delta, e, -1)
+    return (np.cumsum(delta[:-1]) > 0).astype(np.float32)
+
+
+def best_lag_ms(a: np.ndarray, b: np.ndarray) -> Optional[int]:
+    """a を何ms遅らせると b に最も一致するか（FFTによる相互相関）"""
+    max_lag = DRIFT_MAX_LAG_MS // DRIFT_BIN_MS
+    if a.sum() == 0 or b.sum() == 0:
+        return None
+    a = a - a.mean()
+    b = b - b.mean()
+    size = 1 << int(np.ceil(np.log2(len(a) + len(b))))
+    corr = np.fft.irfft(np.fft.rfft(b, size) * np.conj(np.fft.rfft(a, size)), size)
+    lags = np.concatenate((np.arange(0, max_lag + 1), np.arange(-max_lag, 0)))
+    window = np.concatenate((corr[:max_lag + 1], corr[-max_lag:]))
+    return int(lags[int(np.argmax(window))]) * DRIFT_BIN_MS
+
+
+def drift(wp: CueTable, yt: CueTable) -> Tuple[Optional[int], Optional[int]]:
+    """全体のずれと、区間ごとのずれの幅（ms）"""
+    total_ms = max(wp.duration_ms, yt.duration_ms)
+    if not len(wp) or not len(yt) or total_ms == 0:
+        return None, None
+    bins = total_ms // DRIFT_BIN_MS + 1
+    a, b = activity(yt, bins), activity(wp, bins)
+    overall = best_lag_ms(a, b)
+
+    segment_bins = DRIFT_SEGMENT_MS // DRIFT_BIN_MS
+    bounds = list(range(0, bins, segment_bins)) + [bins]
+    # 半区間に満たない末尾は直前の区間に含める（数秒の区間では相関が定まらない）
+    if len(bounds) > 2 and bins - bounds[-2] < segment_bins // 2:
+        del bounds[-2]
+    min_active = DRIFT_MIN_ACTIVE_MS // DRIFT_BIN_MS
+    lags = []
+    for begin, end in zip(bounds, bounds[1:]):
+        seg_a, seg_b = a[begin:end], b[begin:end]
+        if seg_a.sum() < min_active or seg_b.sum() < min_active:
+            continue
+        lag = best_lag_ms(seg_a, seg_b)
+        if lag is not None:
+            lags.append(lag)
+    spread = (max(lags) - min(lags)) if len(lags) >= 2 else 0
+    return overall, spread
+
+
+def probe_duration_ms(video: Path) -> Optional[int]:
+    """ffprobeで動画の長さを取得（使えなければNone）"""
+    try:
+        out = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", str(video)],
+            capture_output=True, text=True, timeout=30
+        ).stdout.strip()
+        return int(float(out) * 1000)
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return None
+
+
+# ==============================================================================
+# チェック本体
+# ==============================================================================
+
+def check_subtitles(wp_path: Path, yt_path: Optional[Path] = None,
+                    video_path: Optional[Path] = None) -> PrecheckReport:
+    """Whisper字幕の品質をチェック"""
+    report = PrecheckReport(wp_path=str(wp_path))
+    wp = load_cues(Path(wp_path))
+    yt = load_cues(Path(yt_path)) if yt_path and Path(yt_path).exists() else None
+
+    report.cue_count = len(wp)
+    report.last_end_ms = wp.duration_ms
+    if video_path and Path(video_path).exists():
+        report.reference_ms = probe_duration_ms(Path(video_path))
+        report.reference_source = "動画"
+    if report.reference_ms is None and yt is not None and len(yt):
+        report.reference_ms = yt.duration_ms
+        report.reference_source = "YouTube字幕"
+
+    if not len(wp):
+        report.add_issue('fail', "Whisper字幕にキューがありません")
+        return report
+
+    # 途切れ
+    if report.reference_ms:
+        ratio = report.last_end_ms / report.reference_ms
+        if ratio < TRUNCATION_FAIL_RATIO:
+            report.add_issue('fail', f"字幕が途中で途切れています（最終 {format_timestamp(report.last_end_ms)}、"
+                                     f"{report.reference_source} {format_timestamp(report.reference_ms)} の {ratio:.0%}）")
+        elif ratio < TRUNCATION_WARN_RATIO:
+            report.add_issue('warn', f"字幕の終わりが早めです（{report.reference_source}の {ratio:.0%}）")
+
+    # カバー率・ギャップ
+    span = report.reference_ms or report.last_end_ms
+    report.coverage = coverage_ms(wp) / span if span else 0.0
+    if report.coverage < COVERAGE_FAIL:
+        report.add_issue('fail', f"カバー率が極端に低いです（{report.coverage:.1%}）")
+    elif report.coverage < COVERAGE_WARN:
+        report.add_issue('warn', f"カバー率が低いです（{report.coverage:.1%}）")
+
+    gap_start, gap_len = gaps(wp, report.reference_ms)
+    counts, _ = np.histogram(gap_len[gap_len > 0], bins=GAP_BINS_MS)
+    report.gap_histogram = list(zip(GAP_BIN_LABELS, (int(c) for c in counts)))
+    longest = int(np.argmax(gap_len))
+    report.longest_gap = (int(gap_start[longest]), int(gap_len[longest]))
+    if report.longest_gap[1] >= LONG_GAP_WARN_MS:
+        report.add_issue('warn', f"{format_timestamp(report.longest_gap[0])} から "
+                                 f"{report.longest_gap[1] / 60000:.0f}分間字幕がありません")
+
+    # 繰り返し（ハルシネーション）
+    report.repetition_rate, report.top_repeats = repetition(wp)
+    if report.repetition_rate >= REPETITION_FAIL:
+        report.add_issue('fail', f"同じ行の繰り返しが多すぎます（{report.repetition_rate:.0%}）")
+    elif report.repetition_rate >= REPETITION_WARN:
+        report.add_issue('warn', f"同じ行の繰り返しがあります（{report.repetition_rate:.0%}）")
+
+    # YouTube字幕とのずれ
+    if yt is not None:
+        report.drift_ms, report.drift_spread_ms = drift(wp, yt)
+        if report.drift_ms is not None and abs(report.drift_ms) >= DRIFT_WARN_MS:
+            report.add_issue('warn', f"YouTube字幕と {report.drift_ms:+d} ms ずれています")
+        if report.drift_spread_ms is not None and report.drift_spread_ms >= 2 * DRIFT_WARN_MS:
+            report.add_issue('warn', f"区間によってずれ方が異なります（幅 {report.drift_spread_ms} ms）")
+
+    return report
+
+
+# ==============================================================================
+# 自己診断
+# ==============================================================================
+
+def _synthetic_table(starts: np.ndarray, ends: np.ndarray) -> CueTable:
+    """時刻だけを持つキュー表（ずれの推定は本文を使わない）"""
+    return CueTable(starts.astype(np.int32), ends.astype(np.int32),
+                    np.zeros(len(starts) + 1, np.int64), np.zeros(0, np.uint8))
+
+
+def self_check(trials: int = 50) -> bool:
+    """一様にずらした合成字幕で、区間ごとのずれの幅が0になることを確認
+
+    長さを区間（DRIFT_SEGMENT_MS）の倍数から数秒はみ出させ、短い末尾区間が
+    ずれの幅を誤って広げないことを確かめる。
+    """
+    rng = np.random.default_rng(0)
+    shift_ms = 2500
+    failures = 0
+    for _ in range(trials):
+        total = int(rng.integers(2, 7)) * DRIFT_SEGMENT_MS
+        starts = np.cumsum(rng.integers(1500, 9000, total // 1500))
+        starts = starts[starts < total - 3000]
+        ends = starts + rng.integers(800, 3000, len(starts))
+        starts = np.append(starts, total - 2000)
+        ends = np.append(ends, total + int(rng.integers(200, 6000)))
+        yt = _synthetic_table(starts, ends)
+        wp = _synthetic_table(starts + shift_ms, ends + shift_ms)
+        overall, spread = drift(wp, yt)
+        if overall != shift_ms or spread > DRIFT_BIN_MS:
+            failures += 1
+            print(f"[ERROR] 長さ {format_timestamp(int(ends[-1]))}: ずれ {overall} ms, 幅 {spread} ms")
+    if failures:
+        print(f"[ERROR] 一様なずれ {shift_ms} ms の推定に失敗: {failures}/{trials}件")
+        return False
+    print(f"[SUCCESS] 一様なずれ {shift_ms} ms: 全体・区間ごとの推定が一致（{trials}件、幅 ≈ 0）")
+    return True
+
+
+# ==============================================================================
+# コマンドライン
+# ==============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Whisper字幕の品質事前チェック")
+    parser.add_argument("wp_srt", nargs="?", help="Whisper字幕（*_wp.srt）")
+    parser.add_argument("--yt", help="YouTube字幕（*_yt.srt）")
+    parser.add_argument("--video", help="動画ファイル（長さの基準、ffprobeを使用）")
+    parser.add_argument("--self-check", action="store_true", help="合成字幕で時刻ずれの推定を確認")
+    args = parser.parse_args()
+
+    if args.self_check:
+        sys.exit(0 if self_check() else 1)
+    if not args.wp_srt:
+        parser.print_help()
+        sys.exit(1)
+
+    wp = Path(args.wp_srt)
+    yt = Path(args.yt) if args.yt else Path(str(wp).replace("_wp.srt", "_yt.srt"))
+    report = check_subtitles(wp, yt if yt.exists() else None, Path(args.video) if args.video else None)
+
+    for line in report.summary_lines():
+        print(f"[INFO] {line}")
+    for level, message in report.issues:
+        print(f"[{'ERROR' if level == 'fail' else 'WARN'}] {message}")
+    print(f"[INFO] 判定: {report.verdict}")
+    sys.exit(1 if report.verdict == 'fail' else 0)
+
+
+if __name__ == "__main__":
+    main()
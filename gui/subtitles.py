@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+subtitles.py - SRT字幕ファイルの読み込み
+
+YouTube自動生成字幕（*_yt.srt）とWhisper字幕（*_wp.srt）を
+キュー単位（開始・終了ミリ秒 + テキスト）で読み込む。
+
+SRT形式:
+  1
+  00:11:35,959 --> 00:11:38,120
+  ホルンはもう少し柔らかく
+
+作成日: 2026-10-19
+バージョン: 1.0.0
+"""
+
+import re
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+
+# ==============================================================================
+# 定数
+# ==============================================================================
+
+# タイミング行: 00:11:35,959 --> 00:11:38,120（ミリ秒区切りは , または .）
+TIMING_PATTERN = re.compile(
+    r'(\d+):(\d{2}):(\d{2})[,.](\d{1,3})\s*-->\s*(\d+):(\d{2}):(\d{2})[,.](\d{1,3})'
+)
+
+
+# ==============================================================================
+# データモデル
+# ==============================================================================
+
+@dataclass
+class SrtCue:
+    """字幕キュー"""
+    index: int
+    start_ms: int
+    end_ms: int
+    text: str
+
+
+# ==============================================================================
+# 時刻表記
+# ==============================================================================
+
+def to_ms(hours: str, minutes: str, seconds: str, millis: str = "0") -> int:
+    """時・分・秒・ミリ秒の文字列をミリ秒に変換"""
+    return ((int(hours) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(millis.ljust(3, '0'))
+
+
+def format_timestamp(ms: int) -> str:
+    """ミリ秒を HH:MM:SS.mmm 形式に変換（TeX記録と同じ表記）"""
+    seconds, millis = divmod(int(ms), 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{millis:03d}"
+
+
+# ==============================================================================
+# 読み込み
+# ==============================================================================
+
+def iter_srt_text(content: str) -> Iterator[SrtCue]:
+    """SRT文字列からキューを順に取り出す"""
+    lines = content.lstrip('\ufeff').replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    number = 0
+    i = 0
+    while i < len(lines):
+        match = TIMING_PATTERN.search(lines[i])
+        if not match:
+            i += 1
+            continue
+        start_ms = to_ms(*match.group(1, 2, 3, 4))
+        end_ms = to_ms(*match.group(5, 6, 7, 8))
+
+        # 本文: 次の空行まで
+        i += 1
+        text_lines = []
+        while i < len(lines) and lines[i].strip():
+            text_lines.append(lines[i].strip())
+            i += 1
+
+        number += 1
+        yield SrtCue(number, start_ms, end_ms, ' '.join(text_lines))
+
+
+def parse_srt(path: Path, encoding: Optional[str] = None) -> List[SrtCue]:
+    """SRTファイルを読み込んでキューのリストを返す"""
+    raw = Path(path).read_bytes()
+    if encoding is None:
+        try:
+            content = raw.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            content = raw.decode('cp932', errors='replace')
+    else:
+        content = raw.decode(encoding, errors='replace')
+    return list(iter_srt_text(content))
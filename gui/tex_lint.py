@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+tex_lint.py - リハーサル記録TeXのコンパイル前チェックとタイムスタンプの正規化
+
+tex2chapters は見出しの [HH:MM:SS[.mmm]] を狭い正規表現で読み、それ以外
+（時が1桁、ミリ秒が3桁でない、区切りが「~」など）は何も言わずに読み飛ばす。
+またTeXの構文エラーはリモートの luatex-pdf（1〜3分）から戻って初めて分かる。
+ここでは記録ファイルを1行ずつ1回だけ読み、コンパイル前に以下を検査する。
+
+  - 見出しのタイムスタンプの書式（時・分・秒の範囲を含む）
+  - タイムスタンプの単調増加（前の見出しより前に戻っていないか）
+  - 動画の長さ（ffprobe）または字幕の最終時刻を超えるタイムスタンプ
+  - 波括弧の対応（\\{ \\} と % コメントは除く）
+
+修正可能な書式の揺れは正規化する（--fix でファイルに書き戻す）:
+  [0:11:35.9]          → [00:11:35.900]
+  [5:00 ~ 42:10]       → [00:05:00〜00:42:10]
+
+使用方法（コマンドライン）:
+  python3 tex_lint.py <リハーサル記録.tex> [--video file.mp4] [--fix]
+
+作成日: 2026-10-19
+バージョン: 1.0.0
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from cue_table import load_cues
+from subtitles import format_timestamp
+from subtitle_check import probe_duration_ms
+from tex_record import SECTION_PATTERN, TIMESTAMP, parse_timestamp, read_braced
+from transcript_index import video_for
+
+
+# ==============================================================================
+# 定数
+# ==============================================================================
+
+# 範囲の区切り（正規化後は HH:MM:SS[.mmm] または HH:MM:SS[.mmm]〜HH:MM:SS[.mmm]）
+RANGE_SEPARATOR = '〜'
+
+# 見出し中のタイムスタンプらしき [...]（数字:数字 を含む角括弧）
+CANDIDATE_PATTERN = re.compile(r'\[([^\[\]]*\d\s*:\s*\d[^\[\]]*)\]')
+
+# 揺れを許容した書式（区切りは 〜 ~ ～ - – —）
+LOOSE_POINT_PATTERN = re.compile(r'^\s*(' + TIMESTAMP + r')\s*$')
+LOOSE_RANGE_PATTERN = re.compile(
+    r'^\s*(' + TIMESTAMP + r')\s*[〜~～\-–—]\s*(' + TIMESTAMP + r')\s*$'
+)
+
+# 波括弧の走査（エスケープ、コメント開始、括弧）
+BRACE_TOKEN_PATTERN = re.compile(r'\\.|[{}%]')
+
+# 長さの許容誤差（動画の長さは秒単位で丸められて書かれることがある）
+DURATION_TOLERANCE_MS = 1000
+
+# 字幕の最終時刻は動画の長さより短い（最後の演奏に字幕がない）ため余裕を持たせる
+SRT_END_MARGIN_MS = 60 * 1000
+
+
+# ==============================================================================
+# データモデル
+# ==============================================================================
+
+@dataclass
+class LintIssue:
+    """検査結果1件"""
+    line: int           # 行番号（1始まり）
+    level: str          # error | warn | fix
+    message: str
+
+
+@dataclass
+class LintReport:
+    """検査結果"""
+    path: str
+    headings: int = 0
+    timestamps: int = 0
+    duration_ms: Optional[int] = None        # 基準の長さ（動画 or 字幕）
+    duration_source: str = ""
+    fixed: bool = False                      # 正規化をファイルに書き戻した
+    elapsed_ms: float = 0.0
+    issues: List[LintIssue] = field(default_factory=list)
+
+    def add_issue(self, line: int, level: str, message: str):
+        self.issues.append(LintIssue(line, level, message))
+
+    @property
+    def errors(self) -> List[LintIssue]:
+        return [i for i in self.issues if i.level == 'error']
+
+    @property
+    def warnings(self) -> List[LintIssue]:
+        return [i for i in self.issues if i.level == 'warn']
+
+    @property
+    def fixes(self) -> List[LintIssue]:
+        return [i for i in self.issues if i.level == 'fix']
+
+    def summary_lines(self) -> List[str]:
+        """GUIログ・コマンドライン用の要約"""
+        lines = [f"見出し: {self.headings} / タイムスタンプ: {self.timestamps}（{self.elapsed_ms:.1f} ms）"]
+        if self.duration_ms:
+            lines.append(f"基準の長さ: {format_timestamp(self.duration_ms)}（{self.duration_source}）")
+        lines.append(f"エラー: {len(self.errors)} / 警告: {len(self.warnings)} / "
+                     f"正規化: {len(self.fixes)}{'（書き戻し済み）' if self.fixed else ''}")
+        return lines
+
+
+# ==============================================================================
+# タイムスタンプ
+# ==============================================================================
+
+def normalize_timestamp(text: str) -> Optional[str]:
+    """タイムスタンプを HH:MM:SS[.mmm] に正規化（範囲外の値は None）
+
+    ミリ秒が書かれていれば3桁にそろえ、なければ付けない。
+    MM:SS のみの場合は分が60以上でもよい（75:30 → 01:15:30）。
+    """
+    text = text.strip().replace(',', '.')
+    main, _, frac = text.partition('.')
+    parts = [int(p) for p in main.split(':')]
+    if parts[-1] >= 60 or (len(parts) == 3 and parts[1] >= 60):
+        return None
+    ms = parse_timestamp(text)
+    seconds, millis = divmod(ms, 1000)
+    hours, rest = divmod(seconds, 3600)
+    if hours > 99:
+        return None
+    normalized = f"{hours:02d}:{rest // 60:02d}:{rest % 60:02d}"
+    return normalized + f".{millis:03d}" if frac else normalized
+
+
+def normalize_bracket(content: str) -> Tuple[Optional[str], Optional[int], Optional[int]]:
+    """角括弧の中身を正規化し、(正規化した中身, 開始ms, 終了ms) を返す
+
+    書式が読めない・値が範囲外の場合は (None, None, None)。
+    """
+    match = LOOSE_RANGE_PATTERN.match(content) or LOOSE_POINT_PATTERN.match(content)
+    if not match:
+        return None, None, None
+    values = [normalize_timestamp(t) for t in match.groups() if t is not None]
+    if None in values:
+        return None, None, None
+    start_ms = parse_timestamp(values[0])
+    end_ms = parse_timestamp(values[1]) if len(values) > 1 else None
+    return RANGE_SEPARATOR.join(values), start_ms, end_ms
+
+
+# ==============================================================================
+# 基準の長さ
+# ==============================================================================
+
+def find_reference(tex_path: Path, video_path: Optional[Path] = None) -> Tuple[Optional[int], str]:
+    """タイムスタンプの上限（動画の長さ、なければ字幕の最終時刻）"""
+    tex_path = Path(tex_path)
+    if video_path is None:
+        name = video_for(tex_path, 'tex')
+        video_path = tex_path.parent / name if name else None
+    if video_path is None:
+        return None, ""
+
+    video_path = Path(video_path)
+    if video_path.exists():
+        duration = probe_duration_ms(video_path)
+        if duration:
+            return duration, "動画"
+
+    srt_ends = []
+    for suffix in ("_wp.srt", "_yt.srt"):
+        srt = video_path.with_name(video_path.stem + suffix)
+        if srt.exists():
+            try:
+                srt_ends.append(load_cues(srt).duration_ms)
+            except (OSError, ValueError):
+                continue
+    if srt_ends and max(srt_ends) > 0:
+        return max(srt_ends), "字幕"
+    return None, ""
+
+
+# ==============================================================================
+# 検査本体
+# ==============================================================================
+
+def scan_braces(line: str) -> Tuple[List[Tuple[str, int]], int]:
+    """1行分の波括弧（エスケープを除く）と、コメント開始位置（なければ行末）"""
+    braces = []
+    for token in BRACE_TOKEN_PATTERN.finditer(line):
+        ch = token.group()
+        if ch == '%':
+            return braces, token.start()
+        if ch in '{}':
+            braces.append((ch, token.start()))
+    return braces, len(line)
+
+
+def lint_tex(tex_path: Path, video_path: Optional[Path] = None, fix: bool = False) -> LintReport:
+    """リハーサル記録TeXを1回の走査で検査（fix=True なら正規化を書き戻す）"""
+    started = time.perf_counter()
+    tex_path = Path(tex_path)
+    report = LintReport(path=str(tex_path))
+    report.duration_ms, report.duration_source = find_reference(tex_path, video_path)
+    limit_ms = None
+    if report.duration_ms:
+        margin = SRT_END_MARGIN_MS if report.duration_source == "字幕" else DURATION_TOLERANCE_MS
+        limit_ms = report.duration_ms + margin
+
+    open_braces: List[int] = []          # 閉じていない { の行番号
+    previous: Optional[Tuple[int, int]] = None     # (行番号, 開始ms)
+    section_range: Optional[Tuple[int, int]] = None
+    output: List[str] = []
+    changed = False
+
+    try:
+        with open(tex_path, 'r', encoding='utf-8', newline='') as f:
+            for lineno, line in enumerate(f, 1):
+                braces, comment_at = scan_braces(line)
+                for ch, _ in braces:
+                    if ch == '{':
+                        open_braces.append(lineno)
+                    elif open_braces:
+                        open_braces.pop()
+                    else:
+                        report.add_issue(lineno, 'error', "対応する { のない } があります")
+
+                code = line[:comment_at]
+                replacements = []
+                for match in SECTION_PATTERN.finditer(code):
+                    report.headings += 1
+                    heading, end = read_braced(code, match.end())
+                    if match.group(1) == 'section':
+                        section_range = None
+                    if end < 0:
+                        report.add_issue(lineno, 'warn', "見出しが複数行にわたっています（tex2chapters が読み飛ばします）")
+
+                    candidates = list(CANDIDATE_PATTERN.finditer(heading))
+                    if not candidates:
+                        if '*' not in match.group():
+                            report.add_issue(lineno, 'warn', "見出しにタイムスタンプがありません")
+                        continue
+                    candidate = candidates[-1]
+                    if '[' in heading[:candidate.start()]:
+                        report.add_issue(lineno, 'warn', "見出しに [ が複数あります（tex2chapters が読み飛ばします）")
+
+                    raw = candidate.group(1)
+                    normalized, start_ms, end_ms = normalize_bracket(raw)
+                    if normalized is None:
+                        report.add_issue(lineno, 'error', f"タイムスタンプの書式が不正です: [{raw}]")
+                        continue
+                    report.timestamps += 1
+
+                    if normalized != raw:
+                        report.add_issue(lineno, 'fix', f"[{raw}] → [{normalized}]")
+                        replacements.append((match.end() + candidate.start(1), raw, normalized))
+
+                    # 範囲と単調増加
+                    if end_ms is not None and end_ms < start_ms:
+                        report.add_issue(lineno, 'error', f"範囲の終了が開始より前です: [{normalized}]")
+                    if previous and start_ms < previous[1]:
+                        report.add_issue(lineno, 'error',
+                                         f"タイムスタンプが前の見出し（{previous[0]}行目 "
+                                         f"{format_timestamp(previous[1])}）より前に戻っています")
+                    previous = (lineno, start_ms)
+
+                    if match.group(1) == 'section':
+                        section_range = (start_ms, end_ms) if end_ms is not None else None
+                    elif section_range and not section_range[0] <= start_ms <= section_range[1]:
+                        report.add_issue(lineno, 'warn', "タイムスタンプが親セクションの範囲外です")
+
+                    # 基準の長さ
+                    last_ms = end_ms if end_ms is not None else start_ms
+                    if limit_ms and last_ms > limit_ms:
+                        level = 'error' if report.duration_source == "動画" else 'warn'
+                        report.add_issue(lineno, level,
+                                         f"タイムスタンプ {format_timestamp(last_ms)} が{report.duration_source}の"
+                                         f"長さ {format_timestamp(report.duration_ms)} を超えています")
+
+                for offset, raw, normalized in reversed(replacements):
+                    line = line[:offset] + normalized + line[offset + len(raw):]
+                    changed = True
+                output.append(line)
+    except UnicodeDecodeError as e:
+        report.add_issue(0, 'error', f"UTF-8として読めません: {e}")
+        return report
+
+    for lineno in open_braces:
+        report.add_issue(lineno, 'error', "閉じていない { があります")
+    report.issues.sort(key=lambda issue: issue.line)
+
+    if fix and changed:
+        tmp = tex_path.with_name(tex_path.name + ".tmp")
+        with open(tmp, 'w', encoding='utf-8', newline='') as f:
+            f.writelines(output)
+        os.replace(tmp, tex_path)
+        report.fixed = True
+
+    report.elapsed_ms = (time.perf_counter() - started) * 1000
+    return report
+
+
+# ==============================================================================
+# コマンドライン
+# ==============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="リハーサル記録TeXのコンパイル前チェック")
+    parser.add_argument("tex", help="リハーサル記録（*.tex）")
+    parser.add_argument("--video", help="動画ファイル（既定: TeXと同じ日付の *.mp4）")
+    parser.add_argument("--fix", action="store_true", help="タイムスタンプの正規化をファイルに書き戻す")
+    args = parser.parse_args()
+
+    tex = Path(args.tex)
+    if not tex.exists():
+        print(f"[ERROR] ファイルが見つかりません: {tex}")
+        sys.exit(1)
+
+    report = lint_tex(tex, Path(args.video) if args.video else None, fix=args.fix)
+    for issue in report.issues:
+        label = {'error': "ERROR", 'warn': "WARN", 'fix': "FIX" if report.fixed else "INFO"}[issue.level]
+        print(f"[{label}] {tex.name}:{issue.line}: {issue.message}")
+    for line in report.summary_lines():
+        print(f"[INFO] {line}")
+    if report.fixes and not report.fixed:
+        print("[INFO] --fix で正規化を書き戻せます")
+    sys.exit(1 if report.errors else 0)
+
+
+if __name__ == "__main__":
+    main()
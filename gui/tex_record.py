@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+tex_record.py - リハーサル記録TeXファイルの読み込み
+
+/rehearsal が生成するリハーサル記録（*リハーサル記録.tex）から、
+タイムスタンプ付きの section/subsection/subsubsection と本文を取り出す。
+
+入力形式（TeXファイル内）:
+  \\section{曲名・楽章 [00:05:00〜00:42:10]}
+  \\subsection{タイトル [HH:MM:SS.mmm]}
+  \\subsubsection{タイトル [HH:MM:SS.mmm]}
+
+作成日: 2026-10-19
+バージョン: 1.0.0
+"""
+
+import re
+from pathlib import Path
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+
+# ==============================================================================
+# 定数
+# ==============================================================================
+
+# セクションコマンド（tex2chapters と同じ3レベル）
+SECTION_PATTERN = re.compile(r'\\(section|subsection|subsubsection)\*?\{')
+
+# タイムスタンプ: [H]H:MM:SS[.mmm] または MM:SS[.mmm]
+TIMESTAMP = r'(?:\d{1,2}:)?\d{1,2}:\d{2}(?:[.,]\d{1,3})?'
+
+# 見出し末尾の [開始] または [開始〜終了]
+HEADING_TIME_PATTERN = re.compile(
+    r'\[\s*(' + TIMESTAMP + r')\s*(?:[〜~～-]\s*(' + TIMESTAMP + r'))?\s*\]'
+)
+
+# 本文の簡易プレーンテキスト化
+COMMENT_PATTERN = re.compile(r'(?<!\\)%.*$')
+COMMAND_PATTERN = re.compile(r'\\[A-Za-z@]+\*?(?:\[[^\]]*\])?')
+
+
+# ==============================================================================
+# データモデル
+# ==============================================================================
+
+@dataclass
+class TexSection:
+    """タイムスタンプ付きセクション"""
+    level: str                 # section / subsection / subsubsection
+    title: str                 # タイムスタンプを除いた見出し
+    start_ms: Optional[int]    # 見出しのタイムスタンプ（なければNone）
+    end_ms: Optional[int]      # 範囲指定（〜）の終了時刻
+    line: int                  # 見出しの行番号（1始まり）
+    body: str = ""             # 次の見出しまでの本文（プレーンテキスト）
+
+
+# ==============================================================================
+# ユーティリティ
+# ==============================================================================
+
+def parse_timestamp(text: str) -> int:
+    """HH:MM:SS[.mmm] / MM:SS[.mmm] をミリ秒に変換"""
+    text = text.replace(',', '.')
+    main, _, frac = text.partition('.')
+    parts = [int(p) for p in main.split(':')]
+    while len(parts) < 3:
+        parts.insert(0, 0)
+    hours, minutes, seconds = parts
+    return ((hours * 60 + minutes) * 60 + seconds) * 1000 + int(frac[:3].ljust(3, '0'))
+
+
+def read_braced(text: str, start: int) -> Tuple[str, int]:
+    """text[start] の直後から対応する } までを返す（エスケープ \\{ \\} は無視）
+
+    Returns:
+        (中身, 閉じ括弧の次の位置)。閉じていなければ位置は -1
+    """
+    depth = 1
+    i = start
+    while i < len(text):
+        ch = text[i]
+        if ch == '\\':
+            i += 2
+            continue
+        if ch == '{':
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:i], i + 1
+        i += 1
+    return text[start:], -1
+
+
+def plain_text(tex: str) -> str:
+    """TeX断片をおおまかなプレーンテキストに変換（検索用）"""
+    lines = [COMMENT_PATTERN.sub('', line) for line in tex.split('\n')]
+    text = COMMAND_PATTERN.sub(' ', '\n'.join(lines))
+    text = text.replace('{', '').replace('}', '').replace('~', ' ')
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+# ==============================================================================
+# 読み込み
+# ==============================================================================
+
+def parse_sections(content: str) -> List[TexSection]:
+    """TeX文字列からセクション一覧を取り出す"""
+    sections: List[TexSection] = []
+    body_start = None
+    line, counted = 1, 0    # 行番号は前の見出しからの改行数だけ数え進める
+
+    for match in SECTION_PATTERN.finditer(content):
+        heading, end = read_braced(content, match.end())
+        if sections and body_start is not None:
+            sections[-1].body = plain_text(content[body_start:match.start()])
+
+        start_ms = end_ms = None
+        title = heading
+        time_match = HEADING_TIME_PATTERN.search(heading)
+        if time_match:
+            start_ms = parse_timestamp(time_match.group(1))
+            if time_match.group(2):
+                end_ms = parse_timestamp(time_match.group(2))
+            title = (heading[:time_match.start()] + heading[time_match.end():]).strip()
+
+        line += content.count('\n', counted, match.start())
+        counted = match.start()
+        sections.append(TexSection(match.group(1), title, start_ms, end_ms, line))
+        body_start = end if end >= 0 else len(content)
+
+    if sections and body_start is not None:
+        tail = content[body_start:]
+        tail = tail.split('\\end{document}', 1)[0]
+        sections[-1].body = plain_text(tail)
+    return sections
+
+
+def read_sections(path: Path) -> List[TexSection]:
+    """TeXファイルからセクション一覧を取り出す"""
+    return parse_sections(Path(path).read_text(encoding='utf-8', errors='replace'))
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+transcript_index.py - 過去のリハーサル字幕・記録の全文検索インデックス
+
+各リハーサルの *_yt.srt / *_wp.srt の全キューと、*リハーサル記録.tex の
+各セクションを SQLite FTS5（trigramトークナイザ）で索引化する。
+trigram は文字3-gram単位なので、分かち書きなしの日本語でも部分一致で検索できる
+（2文字以下の検索語は LIKE による走査にフォールバック）。
+
+インデックスはファイルのサイズ・更新時刻で差分更新し、変更・追加・削除された
+ファイルだけを入れ替える。各ヒットにはタイムスタンプと動画ファイル名が付く。
+
+使用方法（コマンドライン）:
+  python3 transcript_index.py [--root DIR ...] 検索語
+
+作成日: 2026-10-19
+バージョン: 1.0.0
+"""
+
+import os
+import sys
+import sqlite3
+import argparse
+import unicodedata
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from subtitles import parse_srt, format_timestamp
+from tex_record import read_sections
+
+
+# ==============================================================================
+# 定数
+# ==============================================================================
+
+# インデックスファイル（設定ファイルと同じディレクトリ）
+DEFAULT_INDEX_FILE = Path.home() / ".config" / "rehearsal-workflow" / "transcript_index.sqlite3"
+
+# 索引対象: (サフィックス, 種類)
+SOURCE_SUFFIXES = [
+    ("_yt.srt", "yt_srt"),
+    ("_wp.srt", "wp_srt"),
+    ("リハーサル記録.tex", "tex"),
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    kind TEXT NOT NULL,
+    video TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    source_id INTEGER NOT NULL REFERENCES sources(id),
+    start_ms INTEGER,
+    end_ms INTEGER,
+    label TEXT NOT NULL,
+    text TEXT NOT NULL,
+    norm TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS segments_source ON segments(source_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(
+    norm, content='segments', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS segments_ai AFTER INSERT ON segments BEGIN
+    INSERT INTO segments_fts(rowid, norm) VALUES (new.id, new.norm);
+END;
+CREATE TRIGGER IF NOT EXISTS segments_ad AFTER DELETE ON segments BEGIN
+    INSERT INTO segments_fts(segments_fts, rowid, norm) VALUES ('delete', old.id, old.norm);
+END;
+"""
+
+
+# ==============================================================================
+# データモデル
+# ==============================================================================
+
+@dataclass
+class SearchHit:
+    """検索結果1件"""
+    path: str
+    kind: str
+    video: str
+    start_ms: Optional[int]
+    end_ms: Optional[int]
+    label: str          # TeXの場合はセクション見出し
+    text: str
+
+    @property
+    def timestamp(self) -> str:
+        return format_timestamp(self.start_ms) if self.start_ms is not None else "--:--:--.---"
+
+
+@dataclass
+class UpdateStats:
+    """差分更新の結果"""
+    added: int = 0
+    updated: int = 0
+    removed: int = 0
+    unchanged: int = 0
+    segments: int = 0
+
+    def summary(self) -> str:
+        return (f"追加 {self.added} / 更新 {self.updated} / 削除 {self.removed} / "
+                f"変更なし {self.unchanged}（{self.segments}件を索引化）")
+
+
+# ==============================================================================
+# ユーティリティ
+# ==============================================================================
+
+def normalize(text: str) -> str:
+    """検索用の正規化（全角英数・半角カナの統一、小文字化）"""
+    return unicodedata.normalize('NFKC', text).lower()
+
+
+def source_kind(name: str) -> Optional[str]:
+    """ファイル名から索引対象の種類を判定"""
+    for suffix, kind in SOURCE_SUFFIXES:
+        if name.endswith(suffix):
+            return kind
+    return None
+
+
+def video_for(path: Path, kind: str) -> str:
+    """字幕・記録ファイルに対応する動画ファイル名を推定"""
+    if kind in ('yt_srt', 'wp_srt'):
+        return path.name[:-len("_yt.srt")] + ".mp4"  # _yt.srt / _wp.srt は同じ長さ
+    # TeX: 同じディレクトリで日付（YYYYMMDD）が一致する動画
+    date = path.name[:8]
+    if date.isdigit():
+        for candidate in sorted(path.parent.glob(f"{date}*.mp4")):
+            return candidate.name
+    return ""
+
+
+def scan_sources(roots: Iterable[Path]) -> Dict[str, os.stat_result]:
+    """ルート以下の索引対象ファイルを列挙（隠しディレクトリは除外）"""
+    found = {}
+    for root in roots:
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+            for name in filenames:
+                if source_kind(name):
+                    path = os.path.join(dirpath, name)
+                    found[os.path.abspath(path)] = os.stat(path)
+    return found
+
+
+# ==============================================================================
+# インデックス本体
+# ==============================================================================
+
+class TranscriptIndex:
+    """SQLite FTS5 による字幕・記録の全文検索インデックス"""
+
+    def __init__(self, db_path: Path = DEFAULT_INDEX_FILE):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def update(self, roots: Iterable[Path]) -> UpdateStats:
+        """ルート以下を走査し、変更のあったファイルだけ再索引化"""
+        roots = [Path(r).resolve() for r in roots]
+        stats = UpdateStats()
+        found = scan_sources(roots)
+
+        known = {}
+        for source_id, path, size, mtime_ns in self.conn.execute(
+                "SELECT id, path, size, mtime_ns FROM sources"):
+            if any(path.startswith(str(root) + os.sep) for root in roots):
+                known[path] = (source_id, size, mtime_ns)
+
+        with self.conn:
+            for path, (source_id, _, _) in known.items():
+                if path not in found:
+                    self.remove_source(source_id)
+                    stats.removed += 1
+
+            for path, st in found.items():
+                entry = known.get(path)
+                if entry and entry[1] == st.st_size and entry[2] == st.st_mtime_ns:
+                    stats.unchanged += 1
+                    continue
+                if entry:
+                    self.remove_source(entry[0])
+                    stats.updated += 1
+                else:
+                    stats.added += 1
+                stats.segments += self.add_source(Path(path), st)
+        return stats
+
+    def remove_source(self, source_id: int):
+        self.conn.execute("DELETE FROM segments WHERE source_id = ?", (source_id,))
+        self.conn.execute("DELETE FROM sources WHERE id = ?", (source_id,))
+
+    def add_source(self, path: Path, st: os.stat_result) -> int:
+        """1ファイルを索引化して件数を返す"""
+        kind = source_kind(path.name)
+        cursor = self.conn.execute(
+            "INSERT INTO sources (path, kind, video, size, mtime_ns) VALUES (?, ?, ?, ?, ?)",
+            (str(path), kind, video_for(path, kind), st.st_size, st.st_mtime_ns)
+        )
+        source_id = cursor.lastrowid
+
+        rows = []
+        if kind == 'tex':
+            for section in read_sections(path):
+                text = f"{section.title} {section.body}".strip()
+                rows.append((source_id, section.start_ms, section.end_ms, section.title, text, normalize(text)))
+        else:
+            for cue in parse_srt(path):
+                if cue.text:
+                    rows.append((source_id, cue.start_ms, cue.end_ms, "", cue.text, normalize(cue.text)))
+
+        self.conn.executemany(
+            "INSERT INTO segments (source_id, start_ms, end_ms, label, text, norm) VALUES (?, ?, ?, ?, ?, ?)",
+            rows
+        )
+        return len(rows)
+
+    def search(self, query: str, limit: int = 200) -> List[SearchHit]:
+        """検索（空白区切りの語はすべて含むものを返す）"""
+        terms = [t for t in normalize(query).split() if t]
+        if not terms:
+            return []
+
+        # 3文字以上の語はFTS5、2文字以下の語はLIKEで絞り込み
+        long_terms = [t for t in terms if len(t) >= 3]
+        short_terms = [t for t in terms if len(t) < 3]
+
+        sql = ("SELECT sources.path, sources.kind, sources.video, segments.start_ms, "
+               "segments.end_ms, segments.label, segments.text FROM ")
+        params: List = []
+        conditions = []
+        if long_terms:
+            sql += ("segments_fts JOIN segments ON segments.id = segments_fts.rowid "
+                    "JOIN sources ON sources.id = segments.source_id ")
+            conditions.append("segments_fts MATCH ?")
+            params.append(' AND '.join('"' + t.replace('"', '""') + '"' for t in long_terms))
+        else:
+            sql += "segments JOIN sources ON sources.id = segments.source_id "
+        for term in short_terms:
+            conditions.append("segments.norm LIKE ? ESCAPE '\\'")
+            escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params.append(f"%{escaped}%")
+
+        sql += "WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY sources.video, sources.kind, segments.start_ms LIMIT ?"
+        params.append(limit)
+
+        return [SearchHit(*row) for row in self.conn.execute(sql, params)]
+
+
+# ==============================================================================
+# コマンドライン
+# ==============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="リハーサル字幕・記録の全文検索")
+    parser.add_argument("query", help="検索語（空白区切りでAND検索）")
+    parser.add_argument("--root", action="append", default=None,
+                        help="索引対象ディレクトリ（複数指定可、既定: カレントディレクトリ）")
+    parser.add_argument("--index", default=str(DEFAULT_INDEX_FILE), help="インデックスファイル")
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    index = TranscriptIndex(Path(args.index))
+    stats = index.update([Path(r) for r in (args.root or [os.getcwd()])])
+    print(f"[INFO] インデックス更新: {stats.summary()}", file=sys.stderr)
+
+    for hit in index.search(args.query, args.limit):
+        label = f" [{hit.label}]" if hit.label else ""
+        print(f"{hit.timestamp}  {hit.video or Path(hit.path).name}{label}  {hit.text}")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+"""
+workspace.py - 複数プロジェクトのワークスペースと共有ストア
+
+GUIとスクリプトはすべてのファイルをカレントディレクトリに置く前提のため、
+1つのディレクトリで扱えるリハーサルは1件だけで、同じ動画を複数の団体の
+記録に使うとディレクトリごとに複製されていた。ワークスペースでは
+
+  <ルート>/
+    projects/<プロジェクト名>/        - プロジェクトごとの作業ディレクトリ
+    .store/objects/ab/cdef....mp4     - 内容のSHA-256を名前にした共有オブジェクト
+    .store/statcache.sqlite3          - (パス, サイズ, 更新時刻, デバイス, inode) → SHA-256
+
+動画・音声・字幕はストアに1つだけ置き、各プロジェクトのファイルはその
+リフリンク（対応するファイルシステムのみ、コピーオンライト）またはハードリンクにする。
+データはコピーしない（ストアとプロジェクトは同じファイルシステムに置く）。
+
+リフリンクはプロジェクトのファイルと別の inode なので、ストアのオブジェクトだけを
+読み取り専用にし、プロジェクトのファイルは元の権限と更新時刻のまま置き換える。
+ハードリンクはプロジェクトのファイルとオブジェクトが同じ inode を共有するため、
+  - 権限は変えない（プロジェクトのファイルが読み取り専用にならないように）
+  - 重複をリンクに置き換えたファイルの更新時刻は、先に取り込んだ側のものになる
+  - その場での書き換えはオブジェクトと他のプロジェクトのリンクにも及ぶ
+手で修正されることのある字幕（COPY_SUFFIXES）はハードリンクせず、リフリンクが
+使えなければストアにはコピーを置き、プロジェクトのファイルは置き換えない。
+
+SHA-256はファイル全体から計算する（内容でオブジェクトを共有するため、
+run_journal.file_digest のような先頭・末尾だけのハッシュは使えない）。
+統計キャッシュにより変更のないファイルはハッシュし直さないため、数TBの
+アーカイブでも走査は stat だけで済む。ハードリンクは (デバイス, inode) が同じなので、
+別のプロジェクトに置いたリンクもハッシュし直さない（inode 番号はファイルシステムごとに
+独立しているため、デバイスも合わせて照合する）。
+
+使用方法（コマンドライン）:
+  python3 workspace.py --root ~/rehearsals projects
+  python3 workspace.py --root ~/rehearsals new <プロジェクト名>
+  python3 workspace.py --root ~/rehearsals ingest <ファイル> ...
+  python3 workspace.py --root ~/rehearsals link <ファイル> <プロジェクト名>
+  python3 workspace.py --root ~/rehearsals scan [--project 名前]
+  python3 workspace.py --root ~/rehearsals status
+
+作成日: 2026-10-19
+バージョン: 1.0.0
+"""
+
+import os
+import sys
+import stat
+import time
+import shutil
+import sqlite3
+import hashlib
+import argparse
+import subprocess
+import yaml
+from pathlib import Path
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+
+# ==============================================================================
+# 定数
+# ==============================================================================
+
+# 前回使ったワークスペースとプロジェクト
+WORKSPACE_SETTINGS_FILE = Path.home() / ".config" / "rehearsal-workflow" / "workspace.yaml"
+
+PROJECTS_DIR_NAME = "projects"
+STORE_DIR_NAME = ".store"
+OBJECTS_DIR_NAME = "objects"
+STAT_CACHE_NAME = "statcache.sqlite3"
+
+# ストアで共有するファイル（動画・音声・字幕）
+STORED_SUFFIXES = {".mp4", ".mkv", ".webm", ".m4a", ".mp3", ".wav", ".flac", ".srt"}
+
+# リフリンクできない場合、ハードリンクせずコピーするファイル（小さく、手で修正されることがある）
+COPY_SUFFIXES = {".srt"}
+
+HASH_CHUNK_SIZE = 4 * 1024 * 1024
+
+# 走査時、更新からこの秒数が経っていないファイルは書き込み中とみなして取り込まない
+SCAN_MIN_AGE_S = 60
+
+# Linux の FICLONE ioctl（btrfs / XFS などのリフリンク）
+FICLONE = 0x40049409
+
+# スキーマを変えたら上げる（古いキャッシュは作り直す）
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    dev INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    shared INTEGER NOT NULL DEFAULT 0   -- ストアのオブジェクトと内容を共有済み
+);
+CREATE INDEX IF NOT EXISTS files_inode ON files(dev, inode);
+CREATE INDEX IF NOT EXISTS files_sha256 ON files(sha256);
+"""
+
+
+# ==============================================================================
+# データモデル
+# ==============================================================================
+
+@dataclass
+class ScanStats:
+    """走査・取り込みの結果"""
+    files: int = 0
+    stored: int = 0          # 新しくストアに入れた
+    linked: int = 0          # 既存のオブジェクトへのリンクに置き換えた（重複を解消）
+    unchanged: int = 0
+    skipped: int = 0         # 書き込み中の可能性があるため保留
+    hashed_bytes: int = 0
+    saved_bytes: int = 0
+
+    def summary(self) -> str:
+        return (f"{self.files}ファイル: 新規 {self.stored} / 重複解消 {self.linked} / "
+                f"変更なし {self.unchanged} / 保留 {self.skipped}"
+                f"（ハッシュ {self.hashed_bytes / 1e9:.2f} GB、削減 {self.saved_bytes / 1e9:.2f} GB）")
+
+
+# ==============================================================================
+# ユーティリティ
+# ==============================================================================
+
+def hash_file(path: Path) -> str:
+    """ファイル全体のSHA-256"""
+    h = hashlib.sha256()
+    buffer = bytearray(HASH_CHUNK_SIZE)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                return h.hexdigest()
+            h.update(view[:n])
+
+
+def clone_file(source: Path, dest: Path, hardlink: bool = True) -> str:
+    """source の内容を dest に置く（リフリンク、できなければハードリンク）
+
+    hardlink=False の場合はハードリンクの代わりにコピーする（COPY_SUFFIXES）。
+    リフリンク・コピーの dest は書き込み可能（読み取り専用のオブジェクトから作っても）。
+
+    Returns:
+        "reflink" / "hardlink" / "copy"
+    """
+    try:
+        if sys.platform == 'darwin':
+            # APFS の clonefile（権限も複製されるため書き込み可能に戻す）
+            subprocess.run(["cp", "-c", str(source), str(dest)], check=True, capture_output=True)
+            os.chmod(dest, os.stat(dest).st_mode | stat.S_IWUSR)
+            return "reflink"
+        import fcntl
+        with open(source, 'rb') as src, open(dest, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return "reflink"
+    except (OSError, ImportError, subprocess.SubprocessError):
+        if dest.exists():
+            dest.unlink()
+    if not hardlink:
+        shutil.copyfile(source, dest)
+        return "copy"
+    os.link(source, dest)
+    return "hardlink"
+
+
+def load_workspace_settings() -> Tuple[Optional[Path], str]:
+    """前回のワークスペースのルートとプロジェクト名"""
+    try:
+        if WORKSPACE_SETTINGS_FILE.exists():
+            with open(WORKSPACE_SETTINGS_FILE, 'r', encoding='utf-8') as f:
+                data = yaml.safe_load(f) or {}
+            root = data.get('root')
+            return (Path(root) if root else None), data.get('project', "")
+    except Exception as e:
+        print(f"Error loading workspace settings: {e}")
+    return None, ""
+
+
+def save_workspace_settings(root: Path, project: str):
+    try:
+        WORKSPACE_SETTINGS_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(WORKSPACE_SETTINGS_FILE, 'w', encoding='utf-8') as f:
+            yaml.dump({'root': str(root), 'project': project}, f, allow_unicode=True)
+    except Exception as e:
+        print(f"Error saving workspace settings: {e}")
+
+
+# ==============================================================================
+# 統計キャッシュ
+# ==============================================================================
+
+class StatCache:
+    """(パス, サイズ, 更新時刻, デバイス, inode) → (SHA-256, 共有済みか) のキャッシュ"""
+
+    def __init__(self, db_path: Path):
+        self.conn = sqlite3.connect(str(db_path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            # キャッシュなので作り直す（次回の走査で一度だけハッシュし直す）
+            self.conn.executescript("DROP INDEX IF EXISTS files_inode; DROP TABLE IF EXISTS files;")
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def lookup(self, path: Path, st: os.stat_result) -> Optional[Tuple[str, bool]]:
+        """変更のないファイルの (ハッシュ, 共有済みか)。同じ (デバイス, inode) の別パス（ハードリンク）も含む"""
+        row = self.conn.execute(
+            "SELECT size, mtime_ns, dev, inode, sha256, shared FROM files WHERE path = ?", (str(path),)
+        ).fetchone()
+        if row and row[:4] == (st.st_size, st.st_mtime_ns, st.st_dev, st.st_ino):
+            return row[4], bool(row[5])
+        row = self.conn.execute(
+            "SELECT sha256, shared FROM files WHERE dev = ? AND inode = ? AND size = ? AND mtime_ns = ? LIMIT 1",
+            (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+        ).fetchone()
+        if row:
+            self.put(path, st, row[0], bool(row[1]))
+            return row[0], bool(row[1])
+        return None
+
+    def put(self, path: Path, st: os.stat_result, digest: str, shared: bool = False):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO files (path, size, mtime_ns, dev, inode, sha256, shared) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (str(path), st.st_size, st.st_mtime_ns, st.st_dev, st.st_ino, digest, int(shared))
+        )
+
+    def paths_for(self, digest: str) -> List[str]:
+        return [row[0] for row in self.conn.execute(
+            "SELECT path FROM files WHERE sha256 = ? ORDER BY path", (digest,))]
+
+    def prune(self, prefix: str, seen: set) -> int:
+        """prefix 以下で今回見つからなかったパスを削除"""
+        stale = [row[0] for row in self.conn.execute(
+            "SELECT path FROM files WHERE substr(path, 1, ?) = ?", (len(prefix), prefix))
+            if row[0] not in seen]
+        self.conn.executemany("DELETE FROM files WHERE path = ?", ((p,) for p in stale))
+        return len(stale)
+
+
+# ==============================================================================
+# ワークスペース
+# ==============================================================================
+
+class Workspace:
+    """プロジェクトごとの作業ディレクトリと、内容アドレスの共有ストア"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root).expanduser().resolve()
+        self.projects_dir = self.root / PROJECTS_DIR_NAME
+        self.store_dir = self.root / STORE_DIR_NAME
+        self.objects_dir = self.store_dir / OBJECTS_DIR_NAME
+        self.projects_dir.mkdir(parents=True, exist_ok=True)
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.cache = StatCache(self.store_dir / STAT_CACHE_NAME)
+
+    def close(self):
+        self.cache.close()
+
+    # --------------------------------------------------------------------------
+    # プロジェクト
+    # --------------------------------------------------------------------------
+
+    def projects(self) -> List[str]:
+        return sorted(p.name for p in self.projects_dir.iterdir()
+                      if p.is_dir() and not p.name.startswith('.'))
+
+    def project_dir(self, name: str, create: bool = False) -> Path:
+        """プロジェクトの作業ディレクトリ"""
+        if not name or name.startswith('.') or os.sep in name or name in ('..',):
+            raise ValueError(f"プロジェクト名が不正です: {name!r}")
+        path = self.projects_dir / name
+        if create:
+            path.mkdir(exist_ok=True)
+        return path
+
+    # --------------------------------------------------------------------------
+    # ストア
+    # --------------------------------------------------------------------------
+
+    def object_path(self, digest: str, suffix: str) -> Path:
+        return self.objects_dir / digest[:2] / (digest[2:] + suffix.lower())
+
+    def digest(self, path: Path) -> str:
+        """ファイルのSHA-256（キャッシュがあれば計算しない）"""
+        st = path.stat()
+        cached = self.cache.lookup(path, st)
+        if cached:
+            return cached[0]
+        digest = hash_file(path)
+        with self.cache.conn:
+            self.cache.put(path, st, digest)
+        return digest
+
+    def ingest(self, path: Path, stats: Optional[ScanStats] = None) -> Path:
+        """ファイルをストアに入れ、元の場所をストアへのリンクにしてオブジェクトのパスを返す
+
+        同じ内容のオブジェクトがなければ元のファイルをストアにリフリンク（できなければ
+        ハードリンク）し、あればファイルをそのオブジェクトへのリンクに置き換える。
+        置き換えたファイルは、リフリンクなら元の権限・更新時刻を保つ（ハードリンクは
+        オブジェクトと inode を共有するため、更新時刻は先に取り込んだ側のものになる）。
+        """
+        stats = stats if stats is not None else ScanStats()
+        path = Path(path).resolve()
+        st = path.stat()
+        hardlink = path.suffix.lower() not in COPY_SUFFIXES
+        stats.files += 1
+        with self.cache.conn:
+            cached = self.cache.lookup(path, st)
+            if cached:
+                digest, shared = cached
+            else:
+                digest, shared = hash_file(path), False
+                stats.hashed_bytes += st.st_size
+            obj = self.object_path(digest, path.suffix)
+
+            if not obj.exists():
+                obj.parent.mkdir(exist_ok=True)
+                tmp = obj.with_name(obj.name + ".tmp")
+                if tmp.exists():
+                    tmp.unlink()
+                method = clone_file(path, tmp, hardlink)
+                os.replace(tmp, obj)
+                if method != "hardlink":
+                    # 別の inode なのでプロジェクトのファイルの権限は変わらない
+                    os.chmod(obj, 0o444)
+                self.cache.put(obj, obj.stat(), digest, shared=True)
+                self.cache.put(path, path.stat(), digest, shared=True)
+                stats.stored += 1
+                return obj
+
+            obj_st = obj.stat()
+            if shared or (obj_st.st_dev, obj_st.st_ino) == (st.st_dev, st.st_ino):
+                if not shared:
+                    self.cache.put(path, st, digest, shared=True)
+                stats.unchanged += 1
+                return obj
+
+            # 同じ内容が既にある: リンクに置き換えて重複を解消
+            tmp = path.with_name(f".{path.name}.link")
+            if tmp.exists():
+                tmp.unlink()
+            method = clone_file(obj, tmp, hardlink)
+            if method == "copy":
+                # リフリンクできない字幕: 置き換えても容量は減らないため元のファイルのまま
+                tmp.unlink()
+                self.cache.put(path, st, digest, shared=True)
+                stats.unchanged += 1
+                return obj
+            if method == "reflink":
+                os.chmod(tmp, stat.S_IMODE(st.st_mode))
+                os.utime(tmp, ns=(st.st_atime_ns, st.st_mtime_ns))
+            os.replace(tmp, path)
+            self.cache.put(path, path.stat(), digest, shared=True)
+            stats.linked += 1
+            stats.saved_bytes += st.st_size
+            return obj
+
+    def link(self, path: Path, project: str, name: str = "") -> Path:
+        """ファイル（の内容）を別のプロジェクトにも置く（コピーせずリンク）"""
+        obj = self.ingest(path)
+        dest = self.project_dir(project, create=True) / (name or Path(path).name)
+        digest = self.digest(obj)
+        if dest.exists():
+            if self.digest(dest) == digest:
+                return dest
+            raise FileExistsError(f"別の内容のファイルがあります: {dest}")
+        with self.cache.conn:
+            clone_file(obj, dest, hardlink=dest.suffix.lower() not in COPY_SUFFIXES)
+            self.cache.put(dest, dest.stat(), digest, shared=True)
+        return dest
+
+    def scan(self, project: str = "", min_age_s: float = SCAN_MIN_AGE_S) -> ScanStats:
+        """プロジェクト（省略時は全プロジェクト）の動画・音声・字幕をストアに取り込む"""
+        stats = ScanStats()
+        root = self.project_dir(project) if project else self.projects_dir
+        now = time.time()
+        seen = set()
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+            for name in filenames:
+                if name.startswith('.') or os.path.splitext(name)[1].lower() not in STORED_SUFFIXES:
+                    continue
+                path = Path(dirpath) / name
+                seen.add(str(path))
+                if now - path.stat().st_mtime < min_age_s:
+                    stats.skipped += 1
+                    continue
+                self.ingest(path, stats)
+        with self.cache.conn:
+            self.cache.prune(str(root) + os.sep, seen)
+        return stats
+
+    def find(self, path: Path) -> List[str]:
+        """同じ内容のファイル（ストアを除く）の一覧"""
+        digest = self.digest(Path(path).resolve())
+        return [p for p in self.cache.paths_for(digest) if not p.startswith(str(self.store_dir) + os.sep)]
+
+    def usage(self) -> Tuple[int, int]:
+        """ストアのオブジェクト数と合計サイズ"""
+        count = size = 0
+        for dirpath, _, filenames in os.walk(self.objects_dir):
+            for name in filenames:
+                count += 1
+                size += os.stat(os.path.join(dirpath, name)).st_size
+        return count, size
+
+
+# ==============================================================================
+# コマンドライン
+# ==============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="複数プロジェクトのワークスペースと共有ストア")
+    parser.add_argument("--root", help="ワークスペースのルート（既定: 前回のワークスペース）")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("projects", help="プロジェクト一覧")
+    new = commands.add_parser("new", help="プロジェクトを作成")
+    new.add_argument("name")
+    ingest = commands.add_parser("ingest", help="ファイルをストアに取り込む")
+    ingest.add_argument("files", nargs="+")
+    link = commands.add_parser("link", help="ファイルを別のプロジェクトにも置く")
+    link.add_argument("file")
+    link.add_argument("project")
+    scan = commands.add_parser("scan", help="プロジェクトの動画・音声・字幕を取り込む")
+    scan.add_argument("--project", default="")
+    scan.add_argument("--min-age", type=float, default=SCAN_MIN_AGE_S, help="書き込み中とみなす秒数")
+    commands.add_parser("status", help="ストアの使用量")
+    args = parser.parse_args()
+
+    root = Path(args.root) if args.root else load_workspace_settings()[0]
+    if root is None:
+        print("[ERROR] ワークスペースのルートを --root で指定してください")
+        sys.exit(1)
+    workspace = Workspace(root)
+
+    try:
+        if args.command == "projects":
+            for name in workspace.projects():
+                print(name)
+        elif args.command == "new":
+            print(f"[SUCCESS] {workspace.project_dir(args.name, create=True)}")
+        elif args.command == "ingest":
+            stats = ScanStats()
+            for file in args.files:
+                obj = workspace.ingest(Path(file), stats)
+                print(f"[INFO] {Path(file).name} → {obj.relative_to(workspace.root)}")
+            print(f"[SUCCESS] {stats.summary()}")
+        elif args.command == "link":
+            dest = workspace.link(Path(args.file), args.project)
+            print(f"[SUCCESS] {dest}")
+        elif args.command == "scan":
+            started = time.perf_counter()
+            stats = workspace.scan(args.project, args.min_age)
+            print(f"[SUCCESS] {stats.summary()}（{time.perf_counter() - started:.2f} s）")
+        elif args.command == "status":
+            count, size = workspace.usage()
+            free = shutil.disk_usage(workspace.root).free
+            print(f"[INFO] プロジェクト: {len(workspace.projects())}")
+            print(f"[INFO] オブジェクト: {count}件 / {size / 1e9:.2f} GB（空き {free / 1e9:.0f} GB）")
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+    finally:
+        workspace.close()
+
+
+if __name__ == "__main__":
+    main()